@@ -1,561 +1,1374 @@
-import customtkinter as ctk
-import json
-from tkinter import filedialog
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-
-ctk.set_appearance_mode("Dark")
-ctk.set_default_color_theme("blue")
-
-
-class GasPlanningApp(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-
-        self.title("Tec40-45 Gas Planning Sheet")
-        self.geometry("1000x1150")
-
-        self.sections = {}
-
-        # --- General Info ---
-        general_frame = ctk.CTkFrame(self)
-        general_frame.pack(padx=10, pady=10, fill="x")
-        self.sections['General Info'] = self.add_entry_row(
-            general_frame, ["Max Depth", "Gas Mix", "Bottom Time", "Gradient Factor (Lo/Hi)", "Total Back Gas Req (CUFT/PSI)", "Deco Gas Req (CUFT)",]
-        )
-
-        # --- Gas Reserve / Rock Bottom ---
-        reserve_frame = ctk.CTkFrame(self)
-        reserve_frame.pack(padx=10, pady=10, fill="x")
-        self.sections['Gas Reserve / Rock Bottom'] = self.add_entry_row(
-            reserve_frame, ["First Gas Switch Depth", "Gas Reserve Volume For Two Divers (CUFT)", "Rock Bottom Pressure (PSI) [Total/Per Tank]"]
-        )
-        self.sections['Gas Reserve (Emergency)'] = self.add_table(
-            reserve_frame, "Gas Reserve (Emergency)",
-            ["Depth", "ATA", "Emergency SAC", "Time", "Gas Volume"], rows=3
-        )
-
-        # Max Depth → Gas Reserve Emergency Row 1
-        max_depth_entry = self.sections['General Info'][0][1]
-        row1_depth_entry = self.sections['Gas Reserve (Emergency)'][0][1][0][0]
-        row1_ata_entry   = self.sections['Gas Reserve (Emergency)'][0][1][1][0]  # ATA column
-
-        def update_row1_depth(event=None):
-            try:
-                val = max_depth_entry.get()
-                float(val)
-                row1_depth_entry.delete(0, "end")
-                row1_depth_entry.insert(0, val)
-
-                # Update ATA automatically
-                ata_val = float(val) / 33 + 1
-                row1_ata_entry.delete(0, "end")
-                row1_ata_entry.insert(0, f"{ata_val:.2f}")
-            except ValueError:
-                pass
-
-        max_depth_entry.bind("<KeyRelease>", update_row1_depth)
-
-        # References
-        max_depth_entry   = self.sections['General Info'][0][1]       # Max Depth
-        first_gas_entry   = self.sections['Gas Reserve / Rock Bottom'][0][1]  # First Gas Switch Depth
-        row2_depth_entry  = self.sections['Gas Reserve (Emergency)'][1][1][0][0]  # Row 2 Depth
-        row2_ata_entry    = self.sections['Gas Reserve (Emergency)'][1][1][1][0]  # Row 2 ATA
-
-        def update_row2_midpoint(event=None):
-            try:
-                max_depth = float(max_depth_entry.get())
-                first_gas = float(first_gas_entry.get())
-                midpoint = (max_depth + first_gas) / 2
-                row2_depth_entry.delete(0, "end")
-                row2_depth_entry.insert(0, f"{midpoint:.1f}")
-                # Update ATA
-                ata_val = midpoint / 33 + 1
-                row2_ata_entry.delete(0, "end")
-                row2_ata_entry.insert(0, f"{ata_val:.2f}")
-            except ValueError:
-                # If either field is empty/non-numeric, keep (A)
-                row2_depth_entry.delete(0, "end")
-                row2_depth_entry.insert(0, "(A)")
-                row2_ata_entry.delete(0, "end")
-
-        # Bind both Max Depth and First Gas
-        max_depth_entry.bind("<KeyRelease>", update_row2_midpoint)
-        first_gas_entry.bind("<KeyRelease>", update_row2_midpoint)
-
-
-        row1_depth_entry = self.sections['Gas Reserve (Emergency)'][0][1][0][0]  # Row 1 Depth
-        row2_depth_entry = self.sections['Gas Reserve (Emergency)'][1][1][0][0]  # Row 2 Depth
-        row2_ata_entry   = self.sections['Gas Reserve (Emergency)'][1][1][1][0]  # Row 2 ATA
-        row3_depth_entry = self.sections['Gas Reserve (Emergency)'][2][1][0][0]  # Row 3 Depth
-        row3_ata_entry   = self.sections['Gas Reserve (Emergency)'][2][1][1][0]  # Row 3 ATA
-        first_gas_entry  = self.sections['Gas Reserve / Rock Bottom'][0][1]       # First Gas Switch Depth
-
-        def update_row3_depth(event=None):
-            try:
-                val = first_gas_entry.get()
-                float(val)  # ensures it's numeric
-                # Update Row 3
-                row3_depth_entry.delete(0, "end")
-                row3_depth_entry.insert(0, val)
-                ata_val = float(val) / 33 + 1
-                row3_ata_entry.delete(0, "end")
-                row3_ata_entry.insert(0, f"{ata_val:.2f}")
-
-                # Update Row 2 if it currently contains (A)
-                if row2_depth_entry.get() == "(A)":
-                    try:
-                        depth1 = float(row1_depth_entry.get())
-                        depth3 = float(val)
-                        midpoint = (depth1 + depth3) / 2
-                        row2_depth_entry.delete(0, "end")
-                        row2_depth_entry.insert(0, f"{midpoint:.1f}")
-                        # Update ATA for Row 2
-                        ata_val2 = midpoint / 33 + 1
-                        row2_ata_entry.delete(0, "end")
-                        row2_ata_entry.insert(0, f"{ata_val2:.2f}")
-                    except ValueError:
-                        pass  # in case Row 1 is still empty
-            except ValueError:
-                pass
-
-        first_gas_entry.bind("<KeyRelease>", update_row3_depth)
-
-        # Update Gas Reserve for Two Divers
-        row3_gas_entry = self.sections['Gas Reserve (Emergency)'][2][1][4][0]  # Row 3 Gas Volume
-        two_divers_entry = self.sections['Gas Reserve / Rock Bottom'][1][1]     # Gas Reserve Volume For Two Divers
-
-        def update_two_diver_reserve(event=None):
-            try:
-                val = float(row3_gas_entry.get())
-                two_divers_entry.delete(0, "end")
-                two_divers_entry.insert(0, f"{val*2:.1f}")
-            except ValueError:
-                two_divers_entry.delete(0, "end")
-
-        # Bind callback to Row 3 Gas Volume changes
-        row3_gas_entry.bind("<KeyRelease>", update_two_diver_reserve)
-
-        # --- Bottom Gas Requirements ---
-        bottom_frame = ctk.CTkFrame(self)
-        bottom_frame.pack(padx=10, pady=10, fill="x")
-        self.sections['Bottom Gas Requirements'] = self.add_table(
-            bottom_frame, "Bottom Gas Requirements",
-            ["Depth", "ATA", "SAC", "Time", "Gas Volume"], rows=1
-        )
-
-        # --- Deco Stops ---
-        deco_frame = ctk.CTkFrame(self)
-        deco_frame.pack(padx=10, pady=10, fill="x")
-        self.sections['Deco Stops'] = self.add_table(
-            deco_frame, "Deco Stops", ["Depth", "Time"], rows=6,
-            default_depths=["70", "60", "50", "40", "30", "20"]
-        )
-
-        # --- Deco Gas Requirements ---
-        deco_gas_frame = ctk.CTkFrame(self)
-        deco_gas_frame.pack(padx=10, pady=10, fill="x")
-        self.sections['Deco Gas Requirements'] = self.add_table(
-            deco_gas_frame, "Deco Gas Requirements",
-            ["Depth", "ATA", "SAC", "Time", "Gas Volume"], rows=7,
-            default_depths=["70", "60", "50", "40", "30", "20"],
-            default_atas=["3.1", "2.8", "2.5", "2.2", "1.9", "1.6"],
-            default_sac=[".6", ".6", ".6", ".6", ".6", ".6"],
-            default_total=["", "", "", "", "", "", "Total"]
-        )
-
-        # --- Sync Deco Stops -> Deco Gas Requirements (time), recalc gas + total ---
-        deco_stops = self.sections['Deco Stops']                 # 6 rows
-        deco_gas   = self.sections['Deco Gas Requirements']      # 7 rows (last = total)
-
-        def recalc_deco_total():
-            total = 0.0
-            for row in deco_gas[:6]:  # sum first 6 rows
-                gv = row[1][4][0]     # Gas Volume entry
-                try:
-                    total += float(gv.get())
-                except ValueError:
-                    pass
-
-            total_entry = deco_gas[6][1][4][0]  # row 7 Gas Volume cell
-            # it's readonly (set in add_table), so temporarily enable, write, then lock
-            try:
-                total_entry.configure(state="normal")
-            except Exception:
-                pass
-            total_entry.delete(0, "end")
-            total_entry.insert(0, f"{total:.2f}")
-            try:
-                total_entry.configure(state="readonly")
-            except Exception:
-                pass
-
-        # Build per-row callback to mirror Time and compute gas
-        def make_sync_and_calc(i):
-            src_time = deco_stops[i][1][1][0]   # Deco Stops: Time (col 1)
-            dst_time = deco_gas[i][1][3][0]     # Deco Gas Req: Time (col 3)
-            ata      = deco_gas[i][1][1][0]     # ATA
-            sac      = deco_gas[i][1][2][0]     # SAC
-            gas      = deco_gas[i][1][4][0]     # Gas Volume
-
-            def callback(event=None):
-                # mirror time
-                dst_time.delete(0, "end")
-                dst_time.insert(0, src_time.get())
-
-                # GV = ATA * SAC * Time
-                try:
-                    ata_val  = float(ata.get())
-                    sac_val  = float(sac.get())
-                    time_val = float(dst_time.get())
-                    value = ata_val * sac_val * time_val
-                    gas.delete(0, "end")
-                    gas.insert(0, f"{value:.2f}")
-                except ValueError:
-                    gas.delete(0, "end")
-
-                recalc_deco_total()
-            return callback
-
-        # Bind all 6 stop rows
-        for i in range(6):
-            deco_stops[i][1][1][0].bind("<KeyRelease>", make_sync_and_calc(i))
-
-        # --- Buttons ---
-        button_frame = ctk.CTkFrame(self)
-        button_frame.pack(pady=15)
-        ctk.CTkButton(button_frame, text="Save", command=self.save_to_json).pack(side="left", padx=10)
-        ctk.CTkButton(button_frame, text="Load", command=self.load_from_json).pack(side="left", padx=10)
-        ctk.CTkButton(button_frame, text="Clear All", command=self.clear_all_entries).pack(side="left", padx=10)
-        ctk.CTkButton(button_frame, text="Export to PDF", command=self.export_to_pdf).pack(side="left", padx=10)
-
-    def add_entry_row(self, parent, labels):
-        entries = []
-        row = ctk.CTkFrame(parent)
-        row.pack(pady=5, fill="x")
-        for label in labels:
-            frame = ctk.CTkFrame(row)
-            frame.pack(side="left", padx=5, expand=True, fill="x")
-            lbl = ctk.CTkLabel(frame, text=label)
-            lbl.pack(anchor="w")
-            entry = ctk.CTkEntry(frame)
-            entry.pack(fill="x")
-            entries.append((label, entry))
-        return entries
-
-    def add_table(self, parent, title, headers, rows=5, default_depths=None,
-                  default_atas=None, default_sac=None, default_total=None):
-        table_entries = []
-        ctk.CTkLabel(parent, text=title, font=("Arial", 14, "bold")).pack(anchor="w", pady=(10, 5))
-        table = ctk.CTkFrame(parent)
-        table.pack()
-
-        # Headers
-        for h in headers:
-            ctk.CTkLabel(table, text=h, width=100).grid(row=0, column=headers.index(h), padx=5, pady=2)
-
-        # Rows
-        for r in range(1, rows + 1):
-            row_entries = []
-            for c, h in enumerate(headers):
-                entry = ctk.CTkEntry(table, width=100)
-                entry.grid(row=r, column=c, padx=5, pady=2)
-
-                default_val = ""
-                if default_depths and c == 0 and r <= len(default_depths):
-                    entry.insert(0, default_depths[r - 1])
-                    default_val = default_depths[r - 1]
-                if default_atas and c == 1 and r <= len(default_atas):
-                    entry.insert(0, default_atas[r - 1])
-                    default_val = default_atas[r - 1]
-                if default_sac and c == 2 and r <= len(default_sac):
-                    entry.insert(0, default_sac[r - 1])
-                    default_val = default_sac[r - 1]
-                if default_total and c == 3 and r <= len(default_total):
-                    entry.insert(0, default_total[r - 1])
-                    default_val = default_total[r - 1]
-
-                row_entries.append((entry, default_val))
-            table_entries.append((headers, row_entries))
-
-        # Automatic calculations
-        if title in ["Deco Gas Requirements", "Bottom Gas Requirements"]:
-            gas_volume_entries = []
-            total_entry = None
-
-            if title == "Deco Gas Requirements":
-                gas_volume_entries = [row[1][4][0] for row in table_entries[:6]]
-                total_entry = table_entries[6][1][4][0]
-                total_entry.configure(state="readonly")
-
-            for i, row in enumerate(table_entries):
-                depth_entry = row[1][0][0]
-                ata_entry = row[1][1][0]
-                sac_entry = row[1][2][0]
-                time_entry = row[1][3][0]
-                gv_entry = row[1][4][0]
-
-                # Depth → ATA
-                def make_ata_callback(depth, ata):
-                    def callback(event=None):
-                        try:
-                            depth_val = float(depth.get())
-                            ata_val = depth_val / 33 + 1
-                            ata.delete(0, "end")
-                            ata.insert(0, f"{ata_val:.2f}")
-                        except ValueError:
-                            ata.delete(0, "end")
-                    return callback
-
-                depth_entry.bind("<KeyRelease>", make_ata_callback(depth_entry, ata_entry))
-
-                # ATA × SAC × Time → Gas Volume
-                def make_gv_callback(ata, sac, time, gv):
-                    def callback(event=None):
-                        try:
-                            value = float(ata.get()) * float(sac.get()) * float(time.get())
-                            gv.delete(0, "end")
-                            gv.insert(0, f"{value:.2f}")
-                        except ValueError:
-                            gv.delete(0, "end")
-                        if total_entry and gv in gas_volume_entries:
-                            update_total()
-                    return callback
-
-                ata_entry.bind("<KeyRelease>", make_gv_callback(ata_entry, sac_entry, time_entry, gv_entry))
-                sac_entry.bind("<KeyRelease>", make_gv_callback(ata_entry, sac_entry, time_entry, gv_entry))
-                time_entry.bind("<KeyRelease>", make_gv_callback(ata_entry, sac_entry, time_entry, gv_entry))
-
-            # Function to update Deco Gas sum row
-            if title == "Deco Gas Requirements":
-                def update_total():
-                    total = 0
-                    for e in gas_volume_entries:
-                        try:
-                            total += float(e.get())
-                        except ValueError:
-                            pass
-                    total_entry.configure(state="normal")
-                    total_entry.delete(0, "end")
-                    total_entry.insert(0, f"{total:.2f}")
-                    total_entry.configure(state="readonly")
-
-        # Auto midpoint calculation for Gas Reserve (Emergency)
-        if title == "Gas Reserve (Emergency)" and len(table_entries) >= 3:
-            row2_depth_entry = table_entries[1][1][0][0]  # row 2, column 0 = Depth
-            row2_depth_entry.delete(0, "end")
-            row2_depth_entry.insert(0, "(A)")
-            row3_time_entry = table_entries[2][1][3][0]  # row 3, column index 3 = Time
-            row3_time_entry.delete(0, "end")
-            row3_time_entry.insert(0, "Total Per Diver")
-
-
-            # --- Auto midpoint depth (Row 2) ---
-            def update_row2_depth(event=None):
-                try:
-                    depth1 = float(table_entries[0][1][0][0].get())
-                    depth3 = float(table_entries[2][1][0][0].get())
-                    midpoint = (depth1 + depth3) / 2
-                    row2_depth = table_entries[1][1][0][0]
-                    row2_depth.delete(0, "end")
-                    row2_depth.insert(0, f"{midpoint:.1f}")
-
-                    # --- Update ATA for row 2 ---
-                    ata_entry = table_entries[1][1][1][0]  # row 2, ATA column
-                    ata_val = midpoint / 33 + 1
-                    ata_entry.delete(0, "end")
-                    ata_entry.insert(0, f"{ata_val:.2f}")
-
-                    # --- Trigger Gas Volume recalculation for row 2 ---
-                    sac_entry  = table_entries[1][1][2][0]
-                    time_entry = table_entries[1][1][3][0]
-                    gas_entry  = table_entries[1][1][4][0]
-                    try:
-                        gas_val = ata_val * float(sac_entry.get()) * float(time_entry.get())
-                        gas_entry.delete(0, "end")
-                        gas_entry.insert(0, f"{gas_val:.1f}")
-                    except ValueError:
-                        gas_entry.delete(0, "end")
-
-                    # --- Update row 3 total ---
-                    update_row3_total()
-
-                except ValueError:
-                    pass
-
-            table_entries[0][1][0][0].bind("<KeyRelease>", update_row2_depth)
-            table_entries[2][1][0][0].bind("<KeyRelease>", update_row2_depth)
-
-            # --- Auto ATA from Depth for all rows ---
-            for row in table_entries:
-                depth_entry = row[1][0][0]
-                ata_entry = row[1][1][0]
-
-                def make_ata_callback(depth, ata):
-                    def callback(event=None):
-                        try:
-                            depth_val = float(depth.get())
-                            ata_val = depth_val / 33 + 1
-                            ata.delete(0, "end")
-                            ata.insert(0, f"{ata_val:.2f}")
-                        except ValueError:
-                            ata.delete(0, "end")
-                    return callback
-
-                depth_entry.bind("<KeyRelease>", make_ata_callback(depth_entry, ata_entry))
-
-            # --- Row 3 = total of Row 1 + Row 2 ---
-            def update_row3_total():
-                try:
-                    row1_val = float(table_entries[0][1][4][0].get())
-                except ValueError:
-                    row1_val = 0
-                try:
-                    row2_val = float(table_entries[1][1][4][0].get())
-                except ValueError:
-                    row2_val = 0
-
-                total = row1_val + row2_val
-                row3_gas = table_entries[2][1][4][0]
-                row3_gas.configure(state="normal")
-                row3_gas.delete(0, "end")
-                row3_gas.insert(0, f"{total:.1f}")
-                row3_gas.configure(state="readonly")
-
-            # --- Update Gas Reserve for Two Divers ---
-                two_divers_entry = self.sections['Gas Reserve / Rock Bottom'][1][1]  # your existing reference
-                two_divers_entry.delete(0, "end")
-                two_divers_entry.insert(0, f"{total*2:.1f}")
-
-            # --- Auto Gas Volume for rows 1 & 2 ---
-            def make_gas_calc_callback(row):
-                ata_entry   = row[1][1][0]
-                sac_entry   = row[1][2][0]
-                time_entry  = row[1][3][0]
-                gas_entry   = row[1][4][0]
-
-                def callback(event=None):
-                    try:
-                        ata_val  = float(ata_entry.get())
-                        sac_val  = float(sac_entry.get())
-                        time_val = float(time_entry.get())
-                        gas_val  = ata_val * sac_val * time_val
-                        gas_entry.delete(0, "end")
-                        gas_entry.insert(0, f"{gas_val:.1f}")
-                    except ValueError:
-                        gas_entry.delete(0, "end")
-                    # always update row 3 after row 1 or 2 changes
-                    update_row3_total()
-                return callback
-
-            # Attach callbacks for rows 1 & 2
-            for row in table_entries[:2]:
-                for entry in [row[1][1][0], row[1][2][0], row[1][3][0]]:
-                    entry.bind("<KeyRelease>", make_gas_calc_callback(row))
-
-        return table_entries
-
-    def save_to_json(self):
-        data = {}
-        for section, widgets in self.sections.items():
-            if all(isinstance(w, tuple) and isinstance(w[1], list) for w in widgets):
-                data[section] = [[e.get() for e, default in row_entries] for headers, row_entries in widgets]
-            else:
-                data[section] = [e.get() for label, e in widgets]
-
-        file_path = filedialog.asksaveasfilename(defaultextension=".json",
-                                                 filetypes=[("JSON Files", "*.json")])
-        if file_path:
-            with open(file_path, "w") as f:
-                json.dump(data, f, indent=4)
-
-    def load_from_json(self):
-        file_path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
-        if file_path:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-            for section, widgets in self.sections.items():
-                values = data.get(section)
-                if values:
-                    if all(isinstance(w, tuple) and isinstance(w[1], list) for w in widgets):
-                        for (headers, row_entries), row_values in zip(widgets, values):
-                            for (e, default), v in zip(row_entries, row_values):
-                                e.delete(0, "end")
-                                e.insert(0, v)
-                    else:
-                        for (label, e), v in zip(widgets, values):
-                            e.delete(0, "end")
-                            e.insert(0, v)
-
-    def export_to_pdf(self):
-        file_path = filedialog.asksaveasfilename(defaultextension=".pdf",
-                                                 filetypes=[("PDF Files", "*.pdf")])
-        if not file_path:
-            return
-
-        doc = SimpleDocTemplate(file_path, pagesize=letter,
-                                leftMargin=20, rightMargin=20, topMargin=20, bottomMargin=20)
-        elements = []
-        styles = getSampleStyleSheet()
-        spacer = Spacer(1, 6)
-
-        for section, widgets in self.sections.items():
-            elements.append(Paragraph(section, styles['Heading2']))
-            data = []
-            if all(isinstance(w, tuple) and isinstance(w[1], list) for w in widgets):
-                headers, _ = widgets[0]
-                data.append(headers)
-                for headers, row_entries in widgets:
-                    data.append([e.get() for e, default in row_entries])
-            else:
-                data.append(["", ""])
-                for label, e in widgets:
-                    data.append([label, e.get()])
-
-            page_width = 8.5 * 72 - 40
-            num_cols = len(data[0])
-            col_width = page_width / num_cols
-
-            table = Table(data, colWidths=[col_width]*num_cols, hAlign='LEFT')
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.grey),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-                ('FONTSIZE', (0,0), (-1,-1), 8),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 1),
-                ('TOPPADDING', (0,0), (-1,-1), 1)
-            ]))
-            elements.append(table)
-            elements.append(spacer)
-
-        doc.build(elements)
-
-    def clear_all_entries(self):
-        for section, widgets in self.sections.items():
-            if all(isinstance(w, tuple) and isinstance(w[1], list) for w in widgets):
-                for row_idx, (headers, row_entries) in enumerate(widgets):
-                    for col_idx, (e, default) in enumerate(row_entries):
-                        # Special handling for Gas Reserve (Emergency)
-                        if section == "Gas Reserve (Emergency)":
-                            if row_idx == 1 and col_idx == 0:  # Row 2 Depth
-                                e.delete(0, "end")
-                                e.insert(0, "(A)")
-                                continue
-                            if row_idx == 2 and col_idx == 3:  # Row 3 Time ("Total Per Diver")
-                                continue
-                            if row_idx == 2 and col_idx == 4:  # Row 3 Gas Volume
-                                e.delete(0, "end")
-                                continue
-                        # Default clear for other entries
-                        e.delete(0, "end")
-                        e.insert(0, default)
-            else:
-                for label, e in widgets:
-                    e.delete(0, "end")
-
-if __name__ == "__main__":
-    app = GasPlanningApp()
-    app.mainloop()
+import time
+STARTED = time.perf_counter()  # --startup-time counts from here
+
+import customtkinter as ctk
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import environment
+import gas_engine as engine
+import deco_engine
+import plan_schema
+import sweep
+from cell_graph import plan_graph
+from ui_scheduler import UpdateScheduler, write_entry
+from profiling import Profiler
+from table_model import TableModel
+
+# ReportLab (pdf_export), the process-pool modules and SQLite are imported on
+# first use, so they don't slow down the window appearing.  NumPy, gas_engine
+# and cell_graph stay eager: __init__ recovers the autosave and builds the cell
+# graph (the sheet's working copy that every handler and section reads) before
+# the first frame, and the sheet layout constants come from gas_engine.
+
+IMPORTED = time.perf_counter()
+
+ctk.set_appearance_mode("Dark")
+ctk.set_default_color_theme("blue")
+
+DEPTH_UNITS_KEY = (engine.ENVIRONMENT, engine.DEPTH_UNITS)
+
+
+class GasPlanningApp(ctk.CTk):
+    def __init__(self, autosave_path=None):
+        # autosave_path: the journal to recover from and write to (default: the
+        # user's ~/.tec_gas_planning/autosave.journal)
+        super().__init__()
+
+        self.title("Tec40-45 Gas Planning Sheet")
+        self.geometry("1000x1150")
+
+        self.sections = {}   # entry-row sections: [(label, entry)]
+        self.entries = {}    # (section, index) -> entry
+        self.tables = {}     # table sections -> VirtualTable
+        self.updates = UpdateScheduler(self)
+
+        # Opt-in profiling: TEC_GAS_PROFILE=1 at startup, or switched on in the F12 debug panel
+        self.profiler = Profiler(enabled=os.environ.get("TEC_GAS_PROFILE") == "1")
+        self.instrument()
+        # Autosave journal (TEC_GAS_AUTOSAVE=0 turns it off): the last session's sheet comes back
+        plan = engine.empty_plan()
+        self.autosave = None
+        if os.environ.get("TEC_GAS_AUTOSAVE") != "0":
+            import autosave
+            autosave_path = autosave_path or autosave.DEFAULT_PATH
+            try:
+                plan = autosave.recover(autosave_path) or plan
+            except plan_schema.PlanFormatError as exc:
+                # Start from a blank sheet; the snapshot below replaces the bad journal
+                print(f"Autosave {autosave_path} not recovered: {exc}", file=sys.stderr)
+            self.autosave = autosave.Autosaver(autosave_path)
+            self.autosave.snapshot(plan)
+        # The dependency graph is the sheet's working copy; sections are built from it.
+        # Derived cells start out recomputed, as after a Load
+        graph = plan_graph(plan)
+        graph.recompute()
+        self.set_graph(graph)
+        self.bind("<F12>", lambda event: self.open_profiler())
+
+        # --- Section frames: packed now, filled in one per idle pass (see build_next_section)
+        # so the window paints before the entries exist ---
+        general_frame = ctk.CTkFrame(self)
+        general_frame.pack(padx=10, pady=10, fill="x")
+        reserve_frame = ctk.CTkFrame(self)
+        reserve_frame.pack(padx=10, pady=10, fill="x")
+        bottom_frame = ctk.CTkFrame(self)
+        bottom_frame.pack(padx=10, pady=10, fill="x")
+        deco_frame = ctk.CTkFrame(self)
+        deco_frame.pack(padx=10, pady=10, fill="x")
+        deco_gas_frame = ctk.CTkFrame(self)
+        deco_gas_frame.pack(padx=10, pady=10, fill="x")
+
+        self.build_steps = [
+            # --- General Info ---
+            (engine.GENERAL_INFO, lambda: self.add_entry_row(general_frame, engine.GENERAL_INFO_LABELS)),
+            # --- Environment (water, altitude, depth units) ---
+            (engine.ENVIRONMENT, lambda: self.add_entry_row(general_frame, engine.ENVIRONMENT_LABELS)),
+            # --- Gas Reserve / Rock Bottom ---
+            (engine.RESERVE, lambda: self.add_entry_row(reserve_frame, engine.RESERVE_LABELS)),
+            # Row 3 Gas Volume is the derived total, so it stays read-only
+            (engine.EMERGENCY, lambda: self.add_table(
+                reserve_frame, engine.EMERGENCY, readonly=[(2, engine.GAS)])),
+            # --- Bottom Gas Requirements (one row per bottom segment) ---
+            (engine.BOTTOM_GAS, lambda: self.add_table(
+                bottom_frame, engine.BOTTOM_GAS, resize=lambda n: self.resize_tables(bottom_rows=n))),
+            # --- Deco Stops ---
+            (engine.DECO_STOPS, lambda: self.add_table(
+                deco_frame, engine.DECO_STOPS, resize=lambda n: self.resize_tables(stops=n))),
+            # --- Deco Gas Requirements (follows Deco Stops, total in the last row) ---
+            (engine.DECO_GAS, lambda: self.add_table(
+                deco_gas_frame, engine.DECO_GAS, readonly=[(-1, c) for c in (engine.GAS, engine.CNS, engine.OTU)])),
+        ]
+        self.after_idle(self.build_next_section)
+
+        # --- Buttons ---
+        button_frame = ctk.CTkFrame(self)
+        button_frame.pack(pady=15)
+        ctk.CTkButton(button_frame, text="Save", command=self.save_to_json).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="Load", command=self.load_from_json).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="Clear All", command=self.clear_all_entries).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="Export to PDF", command=self.export_to_pdf).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="Export Plans to PDF", command=self.export_plans_to_pdf).pack(side="left", padx=10)
+
+        tools_frame = ctk.CTkFrame(self)
+        tools_frame.pack(pady=(0, 15))
+        ctk.CTkButton(tools_frame, text="Calculate Deco", command=self.calculate_deco).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="Optimize Deco", command=self.open_optimizer).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="What-If Sweep", command=self.open_sweep).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="Reserve Analysis", command=self.open_reserve_analysis).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="Team Gas", command=self.open_team).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="Dive Logs", command=self.open_dive_logs).pack(side="left", padx=10)
+        ctk.CTkButton(tools_frame, text="Plan Library", command=self.open_library).pack(side="left", padx=10)
+        self.library = None
+
+    def add_entry_row(self, parent, labels):
+        entries = []
+        for i, label in enumerate(labels):
+            if i % 6 == 0:
+                # Long rows (General Info with its oxygen totals) wrap
+                row = ctk.CTkFrame(parent)
+                row.pack(pady=5, fill="x")
+            frame = ctk.CTkFrame(row)
+            frame.pack(side="left", padx=5, expand=True, fill="x")
+            lbl = ctk.CTkLabel(frame, text=label)
+            lbl.pack(anchor="w")
+            entry = ctk.CTkEntry(frame)
+            entry.pack(fill="x")
+            entries.append((label, entry))
+        return entries
+
+    def add_table(self, parent, section, readonly=(), resize=None):
+        headers = engine.TABLES[section][0]
+        title_row = ctk.CTkFrame(parent, fg_color="transparent")
+        title_row.pack(fill="x", pady=(10, 5))
+        ctk.CTkLabel(title_row, text=section, font=("Arial", 14, "bold")).pack(side="left")
+        rows = self.table_rows(section)
+        table = VirtualTable(parent, headers, rows, self.updates, readonly=readonly,
+                             on_edit=lambda r, c, text: self.on_cell_edit((section, r, c), text))
+        table.pack()
+        if resize is not None:
+            # Growable tables: rows are added or removed at the end
+            ctk.CTkButton(title_row, text="- Row", width=60,
+                          command=lambda: resize(len(table.model) - 1)).pack(side="right", padx=5)
+            ctk.CTkButton(title_row, text="+ Row", width=60,
+                          command=lambda: resize(len(table.model) + 1)).pack(side="right", padx=5)
+        return table
+
+    def table_rows(self, section):
+        # Current rows of a table section, from the graph
+        text = self.graph.text
+        return [[text[(section, r, c)] for c in range(len(engine.TABLES[section][0]))]
+                for r in range(self.sizes[section])]
+
+    def instrument(self):
+        # Keystroke handler, every cell formula (see set_graph) and the idle write flush report to the profiler
+        profiler = self.profiler
+        self.on_cell_edit = profiler.wrap("on_cell_edit", self.on_cell_edit)
+
+        flush = self.updates.flush
+
+        def counted_flush():
+            pending, written = len(self.updates.pending), self.updates.written
+            flush()
+            if pending:
+                profiler.count("widget writes per flush", self.updates.written - written)
+
+        self.updates.flush = profiler.wrap("UpdateScheduler.flush", counted_flush)
+
+    def set_graph(self, graph):
+        self.graph = graph
+        for key, formula in graph.formulas.items():
+            formula.fn = self.profiler.wrap(f"formula {cell_name(key)}", formula.fn)
+        # Row counts of the table sections
+        stops = max(key[1] for key in graph.text if key[0] == engine.DECO_STOPS) + 1
+        self.sizes = {
+            engine.EMERGENCY: engine.TABLES[engine.EMERGENCY][1],
+            engine.BOTTOM_GAS: max(key[1] for key in graph.text if key[0] == engine.BOTTOM_GAS) + 1,
+            engine.DECO_STOPS: stops,
+            engine.DECO_GAS: stops + 1,
+        }
+
+    def resize_tables(self, stops=None, bottom_rows=None):
+        # Rows are added blank (deco rows with the default SAC) or dropped from the end
+        if stops is not None:
+            stops = max(stops, engine.N_STOPS)
+        if bottom_rows is not None:
+            bottom_rows = max(bottom_rows, 1)
+        self.set_plan(engine.normalize_plan(self.get_plan(), stops, bottom_rows), recalc=True)
+
+    def open_profiler(self):
+        ProfilerWindow(self)
+
+    def build_next_section(self):
+        if self.build_steps:
+            self.build_section(*self.build_steps.pop(0))
+            self.after_idle(self.build_next_section)
+
+    def link_deco_tables(self):
+        # Deco Stops and Deco Gas rows line up, so they scroll together
+        stops, deco = self.tables[engine.DECO_STOPS], self.tables[engine.DECO_GAS]
+        stops.linked, deco.linked = [deco], [stops]
+
+    def finish_building(self):
+        # Anything that reads or writes the whole sheet needs every section
+        while self.build_steps:
+            self.build_section(*self.build_steps.pop(0))
+
+    def build_section(self, section, build):
+        # Tables take their rows from the graph; entry rows catch up with edits
+        # made to other sections while this one was pending
+        if section in engine.TABLES:
+            self.tables[section] = build()
+        else:
+            self.sections[section] = build()
+            for i, (label, entry) in enumerate(self.sections[section]):
+                key = (section, i)
+                self.entries[key] = entry
+                if entry.get() != self.graph.text[key]:
+                    write_entry(entry, self.graph.text[key])
+                # Derived fields: the dependency graph recomputes only the cells an edit affects
+                entry.bind("<KeyRelease>", lambda event, key=key, entry=entry: self.on_cell_edit(key, entry.get()))
+                if key == DEPTH_UNITS_KEY:
+                    # Converting every depth is a commit, not a keystroke
+                    for sequence in ("<Return>", "<FocusOut>"):
+                        entry.bind(sequence, lambda event, entry=entry: self.commit_depth_units(entry.get()))
+        if not self.build_steps:
+            self.link_deco_tables()
+            self.event_generate("<<SheetReady>>")
+
+    def show(self, key, text):
+        # Put a cell's text in its entry or table; sections not built yet read the graph later
+        if len(key) == 2:
+            if key in self.entries:
+                self.updates.write(self.entries[key], text)
+        elif key[0] in self.tables:
+            self.tables[key[0]].set_cell(key[1], key[2], text)
+
+    def cell_widget(self, key):
+        """The entry showing a cell, scrolling its table to it if needed."""
+        self.finish_building()
+        if len(key) == 2:
+            return self.entries[key]
+        return self.tables[key[0]].cell_widget(key[1], key[2])
+
+    def get_plan(self):
+        self.finish_building()
+        self.updates.flush()
+        data = {}
+        for section in engine.SECTION_ORDER:
+            if section in self.tables:
+                data[section] = self.tables[section].model.rows()
+            else:
+                data[section] = [e.get() for label, e in self.sections[section]]
+        # Depth Units being typed only count once committed
+        data[engine.ENVIRONMENT][engine.DEPTH_UNITS] = self.graph.text[DEPTH_UNITS_KEY]
+        return data
+
+    def set_plan(self, data, recalc=False):
+        # recalc=True treats changed values as edits, so dependent cells follow them.
+        # Otherwise (Load, Clear All) the plan's values are taken as they are and every
+        # derived cell is then recomputed, so fields a file left blank or stale (the
+        # oxygen columns and O2 Warnings of older plans) are filled in
+        self.finish_building()
+        self.updates.flush()
+        # Tables take the plan's row counts (sections the plan leaves out keep theirs)
+        bottom_rows, stops = engine.table_sizes(data)
+        if not data.get(engine.BOTTOM_GAS):
+            bottom_rows = self.sizes[engine.BOTTOM_GAS]
+        if not (data.get(engine.DECO_STOPS) or data.get(engine.DECO_GAS)):
+            stops = self.sizes[engine.DECO_STOPS]
+        if (bottom_rows, stops) != (self.sizes[engine.BOTTOM_GAS], self.sizes[engine.DECO_STOPS]):
+            current = engine.normalize_plan(self.get_plan(), stops, bottom_rows)
+            self.set_graph(plan_graph(current))
+            for section, table in self.tables.items():
+                table.set_rows(self.table_rows(section))
+        values = {}
+        for key in self.graph.text:
+            value = data.get(key[0])
+            try:
+                for i in key[1:]:
+                    value = value[i]
+            except (IndexError, TypeError):
+                continue
+            values[key] = str(value)
+        if recalc:
+            changes = [(key, v) for key, v in values.items() if v != self.graph.text[key]]
+            changes += self.graph.update(values)
+        else:
+            # Only cells that differ from the sheet are assigned and redrawn
+            changes = [(key, v) for key, v in values.items() if v != self.graph.text[key]]
+            for key, value in changes:
+                self.graph.assign(key, value)
+            changes += self.graph.recompute()
+        for key, value in dict(changes).items():
+            self.show(key, value)
+        self.updates.flush()
+        if self.autosave is not None:
+            self.autosave.snapshot(self.get_plan())
+
+    def on_cell_edit(self, key, text):
+        if key == DEPTH_UNITS_KEY:
+            return   # applied by commit_depth_units on Return / focus out
+        changes = self.graph.set(key, text)
+        for changed, value in changes:
+            self.show(changed, value)
+        if self.autosave is not None:
+            self.autosave.record([(key, text)] + changes)
+        # Derived cells the keystroke changed; the entries actually rewritten are
+        # counted per idle flush ("widget writes per flush", see instrument)
+        self.profiler.count("cell changes per keystroke", len(changes))
+
+    def depth_units(self):
+        try:
+            return environment.parse_units(self.graph.text[DEPTH_UNITS_KEY])
+        except ValueError:
+            return environment.FEET
+
+    def commit_depth_units(self, text):
+        # Return / focus out in Depth Units: a different unit converts every depth on
+        # the sheet in one pass.  Blank or unrecognised text changes nothing and the
+        # field goes back to the current units.
+        try:
+            units = environment.parse_units(text) if text.strip() else None
+        except ValueError:
+            units = None
+        if units is None or units == self.depth_units():
+            self.show(DEPTH_UNITS_KEY, self.graph.text[DEPTH_UNITS_KEY])
+            self.updates.flush()
+            return
+        self.set_plan(engine.convert_depth_units(self.get_plan(), units), recalc=True)
+
+    def destroy(self):
+        if self.autosave is not None:
+            self.autosave.close()
+        super().destroy()
+
+    def calculate_deco(self):
+        plan = self.get_plan()
+        try:
+            plan = deco_engine.fill_plan(plan, deco_engine.schedule_for_plan(plan))
+        except ValueError as exc:
+            messagebox.showerror("Calculate Deco", str(exc))
+            return
+        self.set_plan(plan, recalc=True)
+
+    def save_to_json(self):
+        data = self.get_plan()
+
+        file_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON Files", "*.json")])
+        if file_path:
+            plan_schema.write_plan(file_path, data)
+            # Saved plans are indexed in the library too
+            try:
+                self.get_library().add(data, os.path.basename(file_path), os.path.abspath(file_path))
+            except Exception as exc:
+                messagebox.showwarning("Plan Library", f"Plan saved, but not added to the library:\n{exc}")
+
+    def load_from_json(self):
+        file_path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
+        if file_path:
+            with self.profiler.phase("load_from_json: read file"):
+                with open(file_path, "r") as f:
+                    text = f.read()
+            with self.profiler.phase("load_from_json: parse and validate"):
+                try:
+                    data = plan_schema.loads(text)
+                except plan_schema.PlanFormatError as exc:
+                    messagebox.showerror("Load", f"{os.path.basename(file_path)}: {exc}")
+                    return
+            with self.profiler.phase("load_from_json: set_plan"):
+                self.set_plan(data)
+
+    def export_to_pdf(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".pdf",
+                                                 filetypes=[("PDF Files", "*.pdf")])
+        if not file_path:
+            return
+
+        # Snapshot the entries here; rendering happens on a worker thread
+        with self.profiler.phase("export_to_pdf: import ReportLab"):
+            import pdf_export
+        with self.profiler.phase("export_to_pdf: read entries"):
+            plan = self.get_plan()
+        with self.profiler.phase("export_to_pdf: build tables"):
+            tables = pdf_export.plan_tables(plan)
+        render = self.profiler.wrap("export_to_pdf: render (worker thread)", pdf_export.write_pdf)
+        ExportWindow(self, lambda progress, cancel: render(file_path, tables, progress, cancel))
+
+    def export_plans_to_pdf(self):
+        plan_paths = filedialog.askopenfilenames(filetypes=[("JSON Files", "*.json")])
+        if not plan_paths:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".pdf",
+                                                 filetypes=[("PDF Files", "*.pdf")])
+        if not file_path:
+            return
+
+        import pdf_export
+
+        def plans():
+            # Loaded one at a time as the PDF is written
+            for path in plan_paths:
+                yield os.path.basename(path), plan_schema.read_plan(path)
+
+        ExportWindow(self, lambda progress, cancel: pdf_export.write_plans_pdf(
+            file_path, plans(), len(plan_paths), progress, cancel))
+
+    def open_optimizer(self):
+        OptimizerWindow(self)
+
+    def open_sweep(self):
+        SweepWindow(self)
+
+    def open_reserve_analysis(self):
+        ReserveWindow(self)
+
+    def open_team(self):
+        TeamWindow(self)
+
+    def open_dive_logs(self):
+        DiveLogWindow(self)
+
+    def get_library(self):
+        if self.library is None:
+            import plan_library
+            self.library = plan_library.PlanLibrary()
+        return self.library
+
+    def open_library(self):
+        LibraryWindow(self)
+
+    def clear_all_entries(self):
+        self.set_plan(engine.empty_plan())
+
+class VirtualTable(ctk.CTkFrame):
+    """A table of any length drawn with a fixed pool of entries.
+
+    Cell text lives in a ``TableModel``; the pool shows up to ``visible`` rows
+    from ``top`` and is pointed at other rows as the table scrolls.  Typed
+    changes are reported as ``on_edit(row, col, text)``.  ``readonly`` cells are
+    (row, col) pairs, with negative rows counted from the end and None for every
+    row of the column.
+    """
+
+    def __init__(self, parent, headers, rows, updates, on_edit, readonly=(), visible=8, width=100):
+        super().__init__(parent)
+        self.model = TableModel(len(headers), rows)
+        self.headers = headers
+        self.updates = updates
+        self.on_edit = on_edit
+        self.readonly = readonly
+        self.visible = visible
+        self.width = width
+        self.top = 0
+        self.linked = []  # tables scrolled together with this one
+        self.pool = []
+        self.pool_readonly = []
+        for c, h in enumerate(headers):
+            ctk.CTkLabel(self, text=h, width=width).grid(row=0, column=c, padx=5, pady=2)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.layout()
+
+    def is_readonly(self, r, c):
+        n = len(self.model)
+        return any(c == col and (row is None or r == (row if row >= 0 else n + row)) for row, col in self.readonly)
+
+    def layout(self):
+        # Grow or shrink the pool to the rows that fit, and show the scrollbar when some don't
+        rows = min(len(self.model), self.visible)
+        while len(self.pool) < rows:
+            slot = len(self.pool)
+            entries = []
+            for c in range(len(self.headers)):
+                entry = ctk.CTkEntry(self, width=self.width)
+                entry.grid(row=slot + 1, column=c, padx=5, pady=2)
+                entry.bind("<KeyRelease>", lambda event, slot=slot, c=c: self.edited(slot, c))
+                entry.bind("<FocusOut>", lambda event, slot=slot, c=c: self.edited(slot, c))  # e.g. mouse paste
+                entry.bind("<MouseWheel>", lambda event: self.scroll_to(self.top - (1 if event.delta > 0 else -1)))
+                entry.bind("<Button-4>", lambda event: self.scroll_to(self.top - 1))
+                entry.bind("<Button-5>", lambda event: self.scroll_to(self.top + 1))
+                entries.append(entry)
+            self.pool.append(entries)
+            self.pool_readonly.append([False] * len(entries))
+        while len(self.pool) > rows:
+            for entry in self.pool.pop():
+                entry.destroy()
+            self.pool_readonly.pop()
+        if len(self.model) > rows:
+            self.scrollbar.grid(row=1, column=len(self.headers), rowspan=rows, sticky="ns")
+        else:
+            self.scrollbar.grid_forget()
+        self.scroll_to(self.top, force=True)
+
+    def scroll_to(self, top, force=False):
+        top = max(0, min(top, len(self.model) - len(self.pool)))
+        if top == self.top and not force:
+            return
+        self.top = top
+        for slot, entries in enumerate(self.pool):
+            r = top + slot
+            for c, entry in enumerate(entries):
+                readonly = self.is_readonly(r, c)
+                if readonly != self.pool_readonly[slot][c]:
+                    entry.configure(state="readonly" if readonly else "normal")
+                    self.pool_readonly[slot][c] = readonly
+                self.updates.write(entry, self.model.get(r, c))
+        # Show the new rows now, so a key typed right after scrolling lands on the right row
+        self.updates.flush()
+        if self.pool:
+            n = len(self.model)
+            self.scrollbar.set(top / n, (top + len(self.pool)) / n)
+        for table in self.linked:
+            table.scroll_to(top)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(value) * len(self.model)))
+        else:
+            step = len(self.pool) if unit == "pages" else 1
+            self.scroll_to(self.top + int(value) * step)
+
+    def edited(self, slot, c):
+        r = self.top + slot
+        text = self.pool[slot][c].get()
+        if text != self.model.get(r, c):
+            self.model.set(r, c, text)
+            self.on_edit(r, c, text)
+
+    def set_cell(self, r, c, text):
+        self.model.set(r, c, text)
+        if self.top <= r < self.top + len(self.pool):
+            self.updates.write(self.pool[r - self.top][c], text)
+
+    def set_rows(self, rows):
+        self.model.set_rows(rows)
+        self.layout()
+
+    def cell_widget(self, r, c):
+        if not self.top <= r < self.top + len(self.pool):
+            self.scroll_to(r)
+        return self.pool[r - self.top][c]
+
+
+def cell_name(key):
+    # Readable name for a (section, index) / (section, row, col) cell key
+    section = key[0]
+    if section in engine.ENTRY_ROWS:
+        return f"{section}: {engine.ENTRY_ROWS[section][key[1]]}"
+    headers, rows = engine.TABLES[section]
+    return f"{section}: Row {key[1] + 1} {headers[key[2]]}"
+
+
+def heat_color(fraction):
+    # Green (low gas) to red (high gas)
+    low, high = (46, 125, 50), (198, 40, 40)
+    r, g, b = (round(l + (h - l) * fraction) for l, h in zip(low, high))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+class ExportWindow(ctk.CTkToplevel):
+    """Progress/cancel dialog for a PDF export running on a worker thread.
+
+    ``job(progress, cancel)`` does the rendering; it must not touch widgets.
+    """
+
+    def __init__(self, parent, job, title="Export to PDF"):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("360x130")
+        self.done = self.total = 0
+        self.cancel_event = threading.Event()
+
+        self.bar = ctk.CTkProgressBar(self)
+        self.bar.set(0)
+        self.bar.pack(padx=20, pady=(20, 5), fill="x")
+        self.label = ctk.CTkLabel(self, text="Rendering...")
+        self.label.pack()
+        ctk.CTkButton(self, text="Cancel", command=self.cancel_event.set).pack(pady=10)
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = self.executor.submit(job, self.report, self.cancel_event)
+        self.executor.shutdown(wait=False)
+        self.after(100, self.poll)
+
+    def report(self, done, total):
+        # Worker thread: only record numbers, poll() updates the widgets
+        self.done, self.total = done, total
+
+    def poll(self):
+        if self.total:
+            self.bar.set(min(self.done / self.total, 1))
+            self.label.configure(text=f"{self.done} of {self.total} tables")
+        if not self.future.done():
+            self.after(100, self.poll)
+            return
+        from pdf_export import ExportCancelled
+        try:
+            self.future.result()
+        except ExportCancelled:
+            pass
+        except Exception as exc:
+            messagebox.showerror("Export to PDF", str(exc), parent=self.master)
+        self.destroy()
+
+
+class SweepWindow(ctk.CTkToplevel):
+    FIELDS = {
+        "Total Back Gas Req (CUFT)": "total_back_gas",
+        "Bottom Gas Requirements (CUFT)": "bottom_gas",
+        "Emergency Total Per Diver (CUFT)": "emergency",
+        "Gas Reserve Volume For Two Divers (CUFT)": "two_divers",
+    }
+    AXES = [("Max Depth ({units})", ("100", "150", "10")),
+            ("Bottom Time (min)", ("10", "30", "5")),
+            ("SAC", ("0.5", "1.0", "0.1"))]
+    METRIC_DEPTH_AXIS = ("30", "45", "3")
+    MAX_DISPLAY_CELLS = 2000
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.title("What-If Sweep")
+        self.geometry("1000x700")
+        self.app = app
+        self.result = None
+
+        # --- Grid ranges ---
+        controls = ctk.CTkFrame(self)
+        controls.pack(padx=10, pady=10, fill="x")
+        self.ranges = []
+        units = app.depth_units()
+        for i, (name, defaults) in enumerate(self.AXES):
+            if i == 0 and units == environment.METRES:
+                defaults = self.METRIC_DEPTH_AXIS
+            name = name.format(units=units)
+            row = ctk.CTkFrame(controls)
+            row.pack(pady=2, fill="x")
+            ctk.CTkLabel(row, text=name, width=130).pack(side="left", padx=5)
+            entries = []
+            for label, default in zip(["From", "To", "Step"], defaults):
+                ctk.CTkLabel(row, text=label).pack(side="left", padx=(10, 2))
+                entry = ctk.CTkEntry(row, width=70)
+                entry.insert(0, default)
+                entry.pack(side="left")
+                entries.append(entry)
+            self.ranges.append(entries)
+
+        # --- Display options ---
+        options = ctk.CTkFrame(self)
+        options.pack(padx=10, fill="x")
+        self.field_menu = ctk.CTkOptionMenu(options, values=list(self.FIELDS), command=self.show)
+        self.field_menu.pack(side="left", padx=5, pady=5)
+        self.sac_menu = ctk.CTkOptionMenu(options, values=["SAC"], command=self.show)
+        self.sac_menu.pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(options, text="Run", command=self.run).pack(side="left", padx=10)
+        ctk.CTkButton(options, text="Export to PDF", command=self.export_to_pdf).pack(side="left", padx=10)
+        self.status = ctk.CTkLabel(options, text="")
+        self.status.pack(side="left", padx=10)
+
+        self.table = ctk.CTkScrollableFrame(self)
+        self.table.pack(padx=10, pady=10, fill="both", expand=True)
+
+    def run(self):
+        try:
+            axes = [sweep.axis(*(float(e.get()) for e in entries)) for entries in self.ranges]
+            start = time.perf_counter()
+            self.result = sweep.sweep_grid(self.app.get_plan(), *axes)
+            elapsed = time.perf_counter() - start
+        except ValueError as exc:
+            messagebox.showerror("What-If Sweep", str(exc), parent=self)
+            return
+        sacs = [f"{sac:g}" for sac in self.result.sacs]
+        self.sac_menu.configure(values=sacs)
+        self.sac_menu.set(sacs[0])
+        self.status.configure(text=f"{self.result.total_back_gas.size} combinations in {elapsed * 1000:.0f} ms")
+        self.show()
+
+    def show(self, choice=None):
+        for child in self.table.winfo_children():
+            child.destroy()
+        if self.result is None:
+            return
+        field = self.FIELDS[self.field_menu.get()]
+        sac_index = [f"{sac:g}" for sac in self.result.sacs].index(self.sac_menu.get())
+        rows = self.result.slice_rows(field, sac_index)
+        if len(rows) * len(rows[0]) > self.MAX_DISPLAY_CELLS:
+            ctk.CTkLabel(self.table, text="Grid too large to display; use Export to PDF").grid(row=0, column=0)
+            return
+
+        values = getattr(self.result, field)[:, :, sac_index]
+        low, high = np.nanmin(values), np.nanmax(values)
+        span = (high - low) or 1
+        for r, row in enumerate(rows):
+            for c, text in enumerate(row):
+                label = ctk.CTkLabel(self.table, text=text, width=60)
+                if r and c and text:
+                    label.configure(fg_color=heat_color((values[r - 1, c - 1] - low) / span), corner_radius=4)
+                label.grid(row=r, column=c, padx=1, pady=1)
+
+    def export_to_pdf(self):
+        if self.result is None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".pdf",
+                                                 filetypes=[("PDF Files", "*.pdf")], parent=self)
+        if not file_path:
+            return
+        name = self.field_menu.get()
+        field = self.FIELDS[name]
+        tables = [(f"{name} at SAC {sac:g}", self.result.slice_rows(field, i))
+                  for i, sac in enumerate(self.result.sacs)]
+        import pdf_export
+        ExportWindow(self, lambda progress, cancel: pdf_export.write_pdf(file_path, tables, progress, cancel))
+
+
+class ReserveWindow(ctk.CTkToplevel):
+    OUTPUT_LABELS = {
+        "total_per_diver": "Total Per Diver (CUFT)",
+        "two_divers": "Reserve For Two Divers (CUFT)",
+        "rock_bottom_psi": "Rock Bottom Pressure (PSI)",
+    }
+    COLUMNS = ["mean", "p5", "p50", "p90", "p95", "p99", "max"]
+
+    def __init__(self, app):
+        super().__init__(app)
+        import reserve_mc
+        self.title("Reserve Analysis (Monte Carlo)")
+        self.geometry("900x420")
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+        # --- Inputs ---
+        form = ctk.CTkFrame(self)
+        form.pack(padx=10, pady=10, fill="x")
+        self.inputs = {}
+        fields = [
+            ("Samples", "1000000"),
+            ("SAC Factor", str(reserve_mc.DEFAULT_SAC_FACTOR)),
+            ("Ascent Delay (min)", str(reserve_mc.DEFAULT_ASCENT_DELAY)),
+            ("Stop Overrun (min)", str(reserve_mc.DEFAULT_STOP_OVERRUN)),
+            ("Back Gas (CUFT)", f"{reserve_mc.DEFAULT_CYLINDER_CUFT:g}"),
+            ("Rated Pressure (PSI)", f"{reserve_mc.DEFAULT_CYLINDER_PSI:g}"),
+        ]
+        for i, (label, default) in enumerate(fields):
+            ctk.CTkLabel(form, text=label).grid(row=i // 3 * 2, column=i % 3, padx=5, sticky="w")
+            entry = ctk.CTkEntry(form, width=200)
+            entry.insert(0, default)
+            entry.grid(row=i // 3 * 2 + 1, column=i % 3, padx=5, pady=(0, 5))
+            self.inputs[label] = entry
+        self.all_cores = ctk.CTkCheckBox(form, text="Use all CPU cores")
+        self.all_cores.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.real_gas = ctk.CTkCheckBox(form, text="Real gas (Z) for PSI")
+        self.real_gas.grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        self.run_button = ctk.CTkButton(form, text="Run", command=self.run)
+        self.run_button.grid(row=4, column=1, padx=5, pady=5)
+        self.status = ctk.CTkLabel(form, text="Distributions: fixed, uniform, normal, lognormal, triangular, exponential")
+        self.status.grid(row=4, column=2, padx=5, pady=5)
+
+        # --- Results ---
+        self.table = ctk.CTkFrame(self)
+        self.table.pack(padx=10, pady=10, fill="both", expand=True)
+
+    def run(self):
+        if self.future is not None:
+            return
+        import reserve_mc
+        try:
+            samples = int(float(self.inputs["Samples"].get()))
+            plan = self.app.get_plan()
+            z_table = None
+            if self.real_gas.get():
+                import real_gas
+                import team
+                z_table = real_gas.get_table(team.plan_mix(plan))
+            model = reserve_mc.ReserveModel.from_plan(
+                plan,
+                sac_factor=reserve_mc.Distribution.parse(self.inputs["SAC Factor"].get()),
+                ascent_delay=reserve_mc.Distribution.parse(self.inputs["Ascent Delay (min)"].get()),
+                stop_overrun=reserve_mc.Distribution.parse(self.inputs["Stop Overrun (min)"].get()),
+                cylinder_cuft=float(self.inputs["Back Gas (CUFT)"].get()),
+                cylinder_psi=float(self.inputs["Rated Pressure (PSI)"].get()),
+                z_table=z_table,
+            )
+        except ValueError as exc:
+            messagebox.showerror("Reserve Analysis", str(exc), parent=self)
+            return
+        workers = os.cpu_count() if self.all_cores.get() else None
+        # Sampling runs off the Tk thread; poll() picks the result up
+        self.started = time.perf_counter()
+        self.future = self.executor.submit(reserve_mc.run, model, samples, workers=workers)
+        self.run_button.configure(state="disabled")
+        self.status.configure(text=f"Sampling {samples:,}...")
+        self.after(100, self.poll)
+
+    def poll(self):
+        if not self.future.done():
+            self.after(100, self.poll)
+            return
+        future, self.future = self.future, None
+        self.run_button.configure(state="normal")
+        try:
+            hist = future.result()
+        except Exception as exc:
+            self.status.configure(text="")
+            messagebox.showerror("Reserve Analysis", str(exc), parent=self)
+            return
+        elapsed = time.perf_counter() - self.started
+        self.status.configure(text=f"{hist.n:,} samples in {elapsed:.2f} s")
+        self.show(hist.summary())
+
+    def show(self, summary):
+        for child in self.table.winfo_children():
+            child.destroy()
+        for c, h in enumerate([""] + self.COLUMNS):
+            ctk.CTkLabel(self.table, text=h, width=90).grid(row=0, column=c, padx=5, pady=2)
+        for r, (name, label) in enumerate(self.OUTPUT_LABELS.items(), start=1):
+            ctk.CTkLabel(self.table, text=label).grid(row=r, column=0, padx=5, pady=2, sticky="w")
+            for c, column in enumerate(self.COLUMNS, start=1):
+                decimals = 0 if name == "rock_bottom_psi" else 1
+                ctk.CTkLabel(self.table, text=f"{summary[name][column]:.{decimals}f}", width=90).grid(
+                    row=r, column=c, padx=5, pady=2)
+
+
+class LibraryWindow(ctk.CTkToplevel):
+    """Search the plan library and load a plan into the sheet."""
+    FILTERS = ["Max Depth", "Bottom Time", "Gas Mix", "GF (Lo/Hi)", "Total Gas", "Name"]
+    MIX_TYPES = ["Any Mix", "Trimix", "Air / Nitrox"]
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.title("Plan Library")
+        self.geometry("900x600")
+        self.app = app
+        self.library = app.get_library()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.ids = []
+
+        # --- Filters (ranges as 120-140) ---
+        form = ctk.CTkFrame(self)
+        form.pack(padx=10, pady=10, fill="x")
+        self.filters = {}
+        # Max Depth is searched in the sheet's depth units
+        self.units = app.depth_units()
+        for i, label in enumerate(self.FILTERS):
+            text = f"{label} ({self.units})" if label == "Max Depth" else label
+            ctk.CTkLabel(form, text=text).grid(row=i // 3 * 2, column=i % 3, padx=5, sticky="w")
+            entry = ctk.CTkEntry(form, width=200)
+            entry.grid(row=i // 3 * 2 + 1, column=i % 3, padx=5, pady=(0, 5))
+            entry.bind("<Return>", lambda event: self.search())
+            self.filters[label] = entry
+        self.mix_type = ctk.CTkOptionMenu(form, values=self.MIX_TYPES, command=lambda choice: self.search())
+        self.mix_type.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        ctk.CTkButton(form, text="Search", command=self.search).grid(row=4, column=1, padx=5, pady=5)
+        self.status = ctk.CTkLabel(form, text="")
+        self.status.grid(row=4, column=2, padx=5, pady=5)
+
+        # --- Results: a plain Listbox stays fast with hundreds of rows ---
+        self.results = tk.Listbox(self, font=("Courier", 11), activestyle="none",
+                                  bg="#2b2b2b", fg="#dce4ee", selectbackground="#1f6aa5")
+        self.results.pack(padx=10, fill="both", expand=True)
+        self.results.bind("<Double-Button-1>", lambda event: self.load_selected())
+
+        buttons = ctk.CTkFrame(self)
+        buttons.pack(pady=10)
+        ctk.CTkButton(buttons, text="Load", command=self.load_selected).pack(side="left", padx=10)
+        ctk.CTkButton(buttons, text="Add Current Plan", command=self.add_current).pack(side="left", padx=10)
+        self.import_button = ctk.CTkButton(buttons, text="Import Folder...", command=self.import_folder)
+        self.import_button.pack(side="left", padx=10)
+        ctk.CTkButton(buttons, text="Delete", command=self.delete_selected).pack(side="left", padx=10)
+        self.search()
+
+    def search(self):
+        text = {label: entry.get().strip() for label, entry in self.filters.items()}
+        mix_type = self.mix_type.get()
+        import plan_library
+        try:
+            rows = self.library.search(
+                max_depth=plan_library.parse_range(text["Max Depth"]),
+                bottom_time=plan_library.parse_range(text["Bottom Time"]),
+                total_gas=plan_library.parse_range(text["Total Gas"]),
+                gas_mix=text["Gas Mix"] or None,
+                trimix=None if mix_type == "Any Mix" else mix_type == "Trimix",
+                gf=text["GF (Lo/Hi)"] or None,
+                name=text["Name"] or None,
+                depth_units=self.units,
+            )
+        except ValueError as exc:
+            messagebox.showerror("Plan Library", str(exc), parent=self)
+            return
+        self.ids = [row["id"] for row in rows]
+        self.results.delete(0, "end")
+        self.results.insert("end", *[self.describe(row) for row in rows])
+        more = "+" if len(rows) == plan_library.SEARCH_LIMIT else ""
+        self.status.configure(text=f"{len(rows)}{more} of {self.library.count():,} plans")
+
+    @staticmethod
+    def describe(row):
+        def num(value, decimals=0):
+            return "" if value is None else f"{value:.{decimals}f}"
+        # Max Depth is indexed in feet; show it in the plan's own units
+        units = row["depth_units"] or environment.FEET
+        depth = row["max_depth"]
+        if units == environment.METRES and depth is not None:
+            depth = environment.convert_depth(depth, environment.FEET, units)
+        depth = num(depth, 1 if units == environment.METRES else 0)
+        gf = "" if row["gf_lo"] is None else f"{row['gf_lo']:.0f}/{row['gf_hi']:.0f}"
+        return (f"{depth:>5} {units:<2}  {row['gas_mix'][:10]:<10} {num(row['bottom_time']):>4} min  "
+                f"GF {gf:<6} {num(row['total_gas'], 1):>8} cuft  {row['name']}")
+
+    def selected_id(self):
+        selection = self.results.curselection()
+        return self.ids[selection[0]] if selection else None
+
+    def load_selected(self):
+        plan_id = self.selected_id()
+        if plan_id is not None:
+            try:
+                plan = self.library.load(plan_id)
+            except plan_schema.PlanFormatError as exc:
+                messagebox.showerror("Plan Library", str(exc), parent=self)
+                return
+            self.app.set_plan(plan)
+
+    def delete_selected(self):
+        plan_id = self.selected_id()
+        if plan_id is not None and messagebox.askyesno("Plan Library", "Remove this plan from the library?", parent=self):
+            self.library.delete(plan_id)
+            self.search()
+
+    def add_current(self):
+        name = ctk.CTkInputDialog(text="Name for this plan:", title="Plan Library").get_input()
+        if name:
+            self.library.add(self.app.get_plan(), name)
+            self.search()
+
+    def import_folder(self):
+        if self.future is not None:
+            return
+        folder = filedialog.askdirectory(parent=self)
+        if not folder:
+            return
+        import plan_batch
+        import plan_library
+        paths = plan_batch.find_plans([folder])
+        path = self.library.path
+
+        def job():
+            # Own connection: sqlite3 connections stay on the thread that made them
+            library = plan_library.PlanLibrary(path)
+            try:
+                return library.import_files(paths)
+            finally:
+                library.close()
+
+        self.future = self.executor.submit(job)
+        self.import_button.configure(state="disabled")
+        self.status.configure(text=f"Importing {len(paths):,} files...")
+        self.after(100, self.poll)
+
+    def poll(self):
+        if not self.future.done():
+            self.after(100, self.poll)
+            return
+        future, self.future = self.future, None
+        self.import_button.configure(state="normal")
+        try:
+            errors = future.result()
+        except Exception as exc:
+            messagebox.showerror("Plan Library", str(exc), parent=self)
+            return
+        self.search()
+        if errors:
+            lines = [f"{os.path.basename(path)}: {error}" for path, error in list(errors.items())[:10]]
+            messagebox.showwarning("Plan Library", f"{len(errors)} file(s) could not be imported:\n" + "\n".join(lines),
+                                   parent=self)
+
+
+class OptimizerWindow(ctk.CTkToplevel):
+    """Search deco gases, cylinders and switch depths; apply a result to the sheet."""
+    OBJECTIVES = {"Shortest Runtime": "runtime", "Least Gas": "gas"}
+    MAX_SHOWN = 200
+
+    def __init__(self, app):
+        super().__init__(app)
+        import deco_optimizer
+        self.title("Deco Gas Optimizer")
+        self.geometry("900x600")
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.candidates = []
+
+        # --- Inputs (Max Depth, Bottom Time, bottom gas and GF come from General Info) ---
+        form = ctk.CTkFrame(self)
+        form.pack(padx=10, pady=10, fill="x")
+        self.inputs = {}
+        fields = [
+            ("Candidate Gases", "EAN50, EAN80, O2", 300),
+            ("Cylinders (optional)", "AL40, AL40", 300),
+            ("Max Deco Gases", "2", 120),
+            ("Deco SAC", f"{deco_optimizer.DECO_SAC:g}", 120),
+            ("Max ppO2", f"{deco_engine.MAX_PPO2:g}", 120),
+        ]
+        for i, (label, default, width) in enumerate(fields):
+            ctk.CTkLabel(form, text=label).grid(row=i // 3 * 2, column=i % 3, padx=5, sticky="w")
+            entry = ctk.CTkEntry(form, width=width)
+            entry.insert(0, default)
+            entry.grid(row=i // 3 * 2 + 1, column=i % 3, padx=5, pady=(0, 5), sticky="w")
+            self.inputs[label] = entry
+        ctk.CTkLabel(form, text="Objective").grid(row=2, column=2, padx=5, sticky="w")
+        self.objective = ctk.CTkOptionMenu(form, values=list(self.OBJECTIVES))
+        self.objective.grid(row=3, column=2, padx=5, pady=(0, 5), sticky="w")
+        self.all_cores = ctk.CTkCheckBox(form, text="Use all CPU cores")
+        self.all_cores.select()
+        self.all_cores.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.run_button = ctk.CTkButton(form, text="Optimize", command=self.run)
+        self.run_button.grid(row=4, column=1, padx=5, pady=5)
+        self.status = ctk.CTkLabel(form, text="")
+        self.status.grid(row=4, column=2, padx=5, pady=5)
+
+        self.results = tk.Listbox(self, font=("Courier", 11), activestyle="none",
+                                  bg="#2b2b2b", fg="#dce4ee", selectbackground="#1f6aa5")
+        self.results.pack(padx=10, fill="both", expand=True)
+        self.results.bind("<Double-Button-1>", lambda event: self.apply_selected())
+        ctk.CTkButton(self, text="Apply to Sheet", command=self.apply_selected).pack(pady=10)
+
+    def run(self):
+        if self.future is not None:
+            return
+        import deco_optimizer
+        try:
+            gases = deco_engine.parse_gas_list(self.inputs["Candidate Gases"].get())
+            cylinders = deco_optimizer.parse_cylinders(self.inputs["Cylinders (optional)"].get())
+            self.sac = float(self.inputs["Deco SAC"].get())
+            kwargs = dict(
+                cylinders=cylinders,
+                max_gases=int(self.inputs["Max Deco Gases"].get()),
+                objective=self.OBJECTIVES[self.objective.get()],
+                sac=self.sac,
+                max_ppo2=float(self.inputs["Max ppO2"].get()),
+                workers=None if self.all_cores.get() else 1,
+            )
+            plan = self.app.get_plan()
+            deco_engine.plan_inputs(plan)
+        except ValueError as exc:
+            messagebox.showerror("Deco Gas Optimizer", str(exc), parent=self)
+            return
+        # The search runs off the Tk thread; poll() picks the result up
+        self.started = time.perf_counter()
+        self.future = self.executor.submit(deco_optimizer.optimize_plan, plan, gases, **kwargs)
+        self.run_button.configure(state="disabled")
+        self.status.configure(text="Searching...")
+        self.after(100, self.poll)
+
+    def poll(self):
+        if not self.future.done():
+            self.after(100, self.poll)
+            return
+        future, self.future = self.future, None
+        self.run_button.configure(state="normal")
+        try:
+            self.candidates = future.result()[:self.MAX_SHOWN]
+        except Exception as exc:
+            self.status.configure(text="")
+            messagebox.showerror("Deco Gas Optimizer", str(exc), parent=self)
+            return
+        elapsed = time.perf_counter() - self.started
+        self.status.configure(text=f"{len(self.candidates)} shown, {elapsed:.2f} s"
+                              if self.candidates else "No gas plan fits the cylinders")
+        self.results.delete(0, "end")
+        self.results.insert("end", *[f"{c.runtime:>6.1f} min {c.total_gas:>7.1f} cuft  {c.describe()}"
+                                     for c in self.candidates])
+        if self.candidates:
+            self.results.selection_set(0)
+
+    def apply_selected(self):
+        import deco_optimizer
+        selection = self.results.curselection()
+        if selection:
+            candidate = self.candidates[selection[0]]
+            self.app.set_plan(deco_optimizer.fill_plan(self.app.get_plan(), candidate, self.sac), recalc=True)
+
+
+class TeamWindow(ctk.CTkToplevel):
+    """Team roster: each diver's SAC and cylinder give their gas, PSI, rock bottom and turn pressure."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import team
+        self.title("Team Gas")
+        self.geometry("1400x520")
+        self.app = app
+        self.team = team.Team([["Diver 1", "0.7", "1.2", "Double AL80", ""],
+                               ["Diver 2", "0.7", "1.2", "Double AL80", ""]])
+        self.plan = app.get_plan()
+        self.factors = team.plan_factors(self.plan)
+
+        controls = ctk.CTkFrame(self)
+        controls.pack(padx=10, pady=10, fill="x")
+        ctk.CTkButton(controls, text="+ Diver", width=80, command=self.add_diver).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="- Diver", width=80, command=self.remove_diver).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Load Roster...", command=self.load_roster).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Save Roster...", command=self.save_roster).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Re-read Plan", command=self.reread_plan).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Apply Diver 1 to Sheet", command=self.apply).pack(side="left", padx=5)
+        self.real_gas = ctk.CTkCheckBox(controls, text="Real gas (Z)", command=self.recalculate)
+        self.real_gas.pack(side="left", padx=5)
+        self.status = ctk.CTkLabel(self, text="")
+        self.status.pack(padx=10, anchor="w")
+        ctk.CTkLabel(self, text="Cylinders: " + ", ".join(team.CATALOG.names()), wraplength=1350,
+                     justify="left").pack(padx=10, anchor="w")
+
+        headers = team.FIELDS + team.OUTPUTS
+        outputs = range(len(team.FIELDS), len(headers))
+        self.table = VirtualTable(self, headers, self.team.rows(), app.updates, on_edit=self.edited,
+                                  readonly=[(None, c) for c in outputs], visible=12, width=105)
+        self.table.pack(padx=10, pady=10)
+        self.recalculate()
+
+    def edited(self, r, c, text):
+        import team
+        self.team.set(r, team.FIELDS[c], text)
+        self.recalculate()
+
+    def recalculate(self):
+        # Every diver at once: the buddy reserve and turn pressures depend on the whole team
+        import team
+        z_table = None
+        if self.real_gas.get():
+            # Built (or read from the disk cache) once per mix, then just interpolated
+            import real_gas
+            try:
+                z_table = real_gas.get_table(team.plan_mix(self.plan))
+            except ValueError as exc:
+                messagebox.showerror("Team Gas", str(exc), parent=self)
+                self.real_gas.deselect()
+        self.results = team.team_gas(self.team, self.factors, z_table=z_table)
+        for c, column in enumerate(team.format_outputs(self.results), start=len(team.FIELDS)):
+            self.table.model.set_column(c, column)
+        self.table.scroll_to(self.table.top, force=True)
+        short = int(team.short_of_gas(self.team, self.results).sum())
+        self.status.configure(text=f"{len(self.team)} divers" + (f", {short} short of gas" if short else ""))
+
+    def set_team(self, team_):
+        self.team = team_
+        self.table.set_rows(team_.rows())
+        self.recalculate()
+
+    def add_diver(self):
+        import team
+        rows = self.team.rows() + [[f"Diver {len(self.team) + 1}", "0.7", "1.2", "Double AL80", ""]]
+        self.set_team(team.Team(rows, self.team.catalog))
+
+    def remove_diver(self):
+        import team
+        if len(self.team) > 1:
+            self.set_team(team.Team(self.team.rows()[:-1], self.team.catalog))
+
+    def load_roster(self):
+        import team
+        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")], parent=self)
+        if file_path:
+            try:
+                self.set_team(team.read_roster(file_path))
+            except (OSError, ValueError) as exc:
+                messagebox.showerror("Team Gas", str(exc), parent=self)
+
+    def save_roster(self):
+        import team
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")],
+                                                 parent=self)
+        if file_path:
+            team.write_roster(file_path, self.team)
+
+    def reread_plan(self):
+        import team
+        self.plan = self.app.get_plan()
+        self.factors = team.plan_factors(self.plan)
+        self.recalculate()
+
+    def apply(self):
+        import team
+        if len(self.team):
+            self.app.set_plan(team.fill_plan(self.app.get_plan(), self.results), recalc=True)
+
+
+class DiveLogWindow(ctk.CTkToplevel):
+    """Calibrate SAC values from dive-computer logs (CSV / UDDF) and pre-fill the sheet with them."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import dive_log
+        self.title("Dive Logs")
+        self.geometry("900x480")
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.summary = []
+
+        form = ctk.CTkFrame(self)
+        form.pack(padx=10, pady=10, fill="x")
+        ctk.CTkLabel(form, text="Cylinder (logs without tank volume)").pack(side="left", padx=5)
+        self.cylinder = ctk.CTkEntry(form, width=160)
+        self.cylinder.insert(0, dive_log.DEFAULT_CYLINDER)
+        self.cylinder.pack(side="left", padx=5)
+        self.import_button = ctk.CTkButton(form, text="Import Logs...", command=self.import_logs)
+        self.import_button.pack(side="left", padx=10)
+        self.status = ctk.CTkLabel(form, text="")
+        self.status.pack(side="left", padx=10)
+
+        self.results = tk.Listbox(self, font=("Courier", 11), activestyle="none",
+                                  bg="#2b2b2b", fg="#dce4ee", selectbackground="#1f6aa5")
+        self.results.pack(padx=10, fill="both", expand=True)
+        self.results.bind("<Double-Button-1>", lambda event: self.apply_selected())
+        ctk.CTkButton(self, text="Apply to Sheet", command=self.apply_selected).pack(pady=10)
+
+    def import_logs(self):
+        if self.future is not None:
+            return
+        import dive_log
+        paths = filedialog.askopenfilenames(filetypes=[("Dive Logs", "*.csv *.uddf *.xml"), ("All Files", "*")],
+                                            parent=self)
+        if not paths:
+            return
+        cylinder = self.cylinder.get()
+        # Logs can be large; they are read off the Tk thread and poll() picks the result up
+        self.started = time.perf_counter()
+        self.future = self.executor.submit(dive_log.calibrate, list(paths), cylinder)
+        self.import_button.configure(state="disabled")
+        self.status.configure(text=f"Reading {len(paths)} log(s)...")
+        self.after(100, self.poll)
+
+    def poll(self):
+        if not self.future.done():
+            self.after(100, self.poll)
+            return
+        future, self.future = self.future, None
+        self.import_button.configure(state="normal")
+        try:
+            summary = future.result()
+        except Exception as exc:
+            self.status.configure(text="")
+            messagebox.showerror("Dive Logs", str(exc), parent=self)
+            return
+        self.summary = sorted(summary.items())
+        self.status.configure(text=f"{len(self.summary)} diver(s), {time.perf_counter() - self.started:.2f} s")
+
+        def text(value):
+            return "   -" if value != value else f"{value:4.2f}"
+        self.results.delete(0, "end")
+        self.results.insert("end", f"{'Diver':<24} {'Dives':>5} {'Windows':>8}  SAC  p90   Deco  Emerg")
+        self.results.insert("end", *[f"{name[:24]:<24} {s['dives']:>5} {s['windows']:>8}  {text(s['sac'])} "
+                                     f"{text(s['sac_p90'])}  {text(s['deco_sac'])}  {text(s['emergency_sac'])}"
+                                     for name, s in self.summary])
+        if self.summary:
+            self.results.selection_set(1)
+
+    def apply_selected(self):
+        import dive_log
+        selection = [i for i in self.results.curselection() if i > 0]   # row 0 is the header
+        if selection:
+            _, summary = self.summary[selection[0] - 1]
+            self.app.set_plan(dive_log.fill_plan(self.app.get_plan(), summary), recalc=True)
+
+
+class ProfilerWindow(ctk.CTkToplevel):
+    """Debug panel: live profiler report, reset and JSON dump."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.title("Profiler")
+        self.geometry("1000x500")
+        self.profiler = app.profiler
+
+        controls = ctk.CTkFrame(self)
+        controls.pack(padx=10, pady=10, fill="x")
+        self.switch = ctk.CTkSwitch(controls, text="Profiling enabled", command=self.toggle)
+        self.switch.pack(side="left", padx=10)
+        if self.profiler.enabled:
+            self.switch.select()
+        ctk.CTkButton(controls, text="Reset", command=self.reset).pack(side="left", padx=10)
+        ctk.CTkButton(controls, text="Dump JSON...", command=self.dump).pack(side="left", padx=10)
+
+        self.text = ctk.CTkTextbox(self, font=("Courier", 12), wrap="none")
+        self.text.pack(padx=10, pady=(0, 10), fill="both", expand=True)
+        self.job = None
+        self.refresh()
+
+    def toggle(self):
+        self.profiler.enabled = bool(self.switch.get())
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+    def dump(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON Files", "*.json")], parent=self)
+        if file_path:
+            self.profiler.dump(file_path)
+
+    def refresh(self):
+        if self.job is not None:
+            self.after_cancel(self.job)
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", self.profiler.report())
+        self.text.configure(state="disabled")
+        self.job = self.after(1000, self.refresh)
+
+    def destroy(self):
+        if self.job is not None:
+            self.after_cancel(self.job)
+            self.job = None
+        super().destroy()
+
+
+def report_startup_time():
+    """--startup-time: open the window, print JSON timings in seconds since the
+    first line of this script, and exit.
+
+    imports: modules loaded; window: GasPlanningApp() returned; first_frame:
+    the main window has been mapped and painted; ready: every section built.
+    """
+    timings = {"imports": IMPORTED - STARTED}
+    import tempfile
+    # A throwaway journal: the probe must not recover or overwrite the user's sheet
+    journal = tempfile.TemporaryDirectory()
+    app = GasPlanningApp(autosave_path=os.path.join(journal.name, "autosave.journal"))
+    timings["window"] = time.perf_counter() - STARTED
+
+    def record(name):
+        timings.setdefault(name, time.perf_counter() - STARTED)
+        if "first_frame" in timings and "ready" in timings:
+            app.after_idle(app.destroy)
+
+    app.bind("<Map>", lambda event: event.widget is app and app.after_idle(record, "first_frame"), add="+")
+    app.bind("<<SheetReady>>", lambda event: record("ready"), add="+")
+    app.mainloop()
+    journal.cleanup()
+    print(json.dumps({name: round(seconds, 4) for name, seconds in timings.items()}))
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # process pools in the packaged .EXE
+    if sys.argv[1:] == ["--startup-time"]:
+        sys.exit(report_startup_time())
+    if sys.argv[1:2] == ["--serve"]:
+        # HTTP/JSON service mode, no window (see plan_service.py)
+        import plan_service
+        sys.exit(plan_service.main(sys.argv[2:]))
+    if len(sys.argv) > 1:
+        # Command-line batch mode, no window (see plan_batch.py)
+        import plan_batch
+        sys.exit(plan_batch.main(sys.argv[1:]))
+    app = GasPlanningApp()
+    app.mainloop()
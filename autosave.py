@@ -0,0 +1,202 @@
+"""Crash-safe autosave: an append-only journal of changed cells.
+
+Each line is ``<crc32 hex> <json>``: either a full snapshot ``{"plan": ...}``
+or a batch of cell changes ``{"cells": [[key, text], ...]}`` with keys as
+the sheet's (section, index) / (section, row, col).  ``recover`` replays the
+lines in order and stops at the first one that is torn or corrupt, so a crash
+mid-write loses at most the last batch.  The recovered plan is validated like
+a loaded file.
+
+``Autosaver`` does the writing on a background thread.  The Tk thread only
+merges changes into a pending dict under a lock; the writer waits until no
+change has arrived for ``THROTTLE_SECONDS`` (but at most ``MAX_DELAY_SECONDS``
+after the first) so a typing burst becomes one appended record and one fsync.  Snapshots (loading a plan, resizing tables)
+and every ``COMPACT_EVERY`` records rewrite the journal as a single snapshot,
+through a temporary file and ``os.replace``.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import plan_schema
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".tec_gas_planning", "autosave.journal")
+THROTTLE_SECONDS = 0.5
+MAX_DELAY_SECONDS = 5
+COMPACT_EVERY = 200
+
+
+def encode_record(record):
+    payload = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode()):08x} {payload}\n"
+
+
+def decode_record(line):
+    """The record on a journal line, or None if the line is torn or corrupt."""
+    crc, _, payload = line.rstrip("\n").partition(" ")
+    if not line.endswith("\n") or len(crc) != 8:
+        return None
+    try:
+        if int(crc, 16) != zlib.crc32(payload.encode()):
+            return None
+        record = json.loads(payload)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def apply_cells(plan, cells):
+    # Cells outside the plan's current tables are ignored
+    for key, text in cells:
+        try:
+            if len(key) == 2:
+                plan[key[0]][key[1]] = text
+            else:
+                plan[key[0]][key[1]][key[2]] = text
+        except (KeyError, IndexError, TypeError):
+            continue
+    return plan
+
+
+def recover(path=DEFAULT_PATH):
+    """The last state in the journal as a normalized plan, or None when there is nothing to recover.
+
+    Raises ``plan_schema.PlanFormatError`` if the journalled plan is malformed.
+    """
+    plan = None
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for line in f:
+                record = decode_record(line)
+                if record is None:
+                    break
+                if "plan" in record:
+                    plan = record["plan"]
+                elif plan is not None:
+                    apply_cells(plan, record.get("cells", ()))
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None if plan is None else plan_schema.from_document(plan)
+
+
+def _fsync_dir(path):
+    # Makes a rename durable on POSIX; directories can't be opened on Windows
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Autosaver:
+    def __init__(self, path=DEFAULT_PATH, throttle=THROTTLE_SECONDS, compact_every=COMPACT_EVERY,
+                 max_delay=MAX_DELAY_SECONDS):
+        self.path = path
+        self.throttle = throttle
+        self.max_delay = max_delay
+        self.compact_every = compact_every
+        self.error = None
+        self.fsyncs = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._snapshot = None      # pending full plan (supersedes earlier cells)
+        self._cells = {}           # pending key -> text, last value wins
+        self._plan = None          # writer's copy of the journalled state, for compaction
+        self._records = 0
+        self._file = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    # --- Tk thread ---
+
+    def record(self, changes):
+        """Queue changed cells: (key, text) pairs."""
+        with self._lock:
+            for key, text in changes:
+                self._cells[key] = text
+        self._wake.set()
+
+    def snapshot(self, plan):
+        """Queue the whole plan (a fresh dict the caller no longer changes)."""
+        with self._lock:
+            self._snapshot = plan
+            self._cells.clear()
+        self._wake.set()
+
+    def close(self, timeout=5):
+        """Write anything pending and stop the writer."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let the burst finish: the timer restarts on every change, up to max_delay
+            deadline = time.monotonic() + self.max_delay
+            while not self._closed:
+                self._wake.clear()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._wake.wait(min(self.throttle, remaining)):
+                    break
+            self._wake.clear()
+            with self._lock:
+                snapshot, self._snapshot = self._snapshot, None
+                cells, self._cells = self._cells, {}
+            try:
+                if snapshot is not None:
+                    self._plan = snapshot
+                    self._rewrite()
+                if cells:
+                    self._append(cells)
+            except OSError as exc:
+                if self.error is None:
+                    print(f"Autosave to {self.path} failed: {exc}", file=sys.stderr)
+                self.error = exc
+            if self._closed:
+                break
+        if self._file is not None:
+            self._file.close()
+
+    def _append(self, cells):
+        changes = [[list(key), text] for key, text in cells.items()]
+        if self._plan is not None:
+            apply_cells(self._plan, changes)
+        if self._plan is not None and self._records >= self.compact_every:
+            self._rewrite()
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8", newline="")
+        self._file.write(encode_record({"cells": changes}))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self._records += 1
+
+    def _rewrite(self):
+        # Compaction: the journal becomes one snapshot, swapped in atomically
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(encode_record({"plan": self._plan}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path)
+        self.fsyncs += 1
+        self._records = 0
@@ -0,0 +1,449 @@
+"""Performance benchmarks for the gas planning sheet.
+
+    python benchmarks/bench.py                          # write bench_results.json
+    python benchmarks/bench.py --quick -o new.json      # smaller sizes, quick check
+    python benchmarks/bench.py --baseline old.json      # compare, exit 1 on regressions
+
+Each benchmark reports the median (and fastest) wall time of several runs;
+the PDF benchmarks also report peak traced memory.  The KeyRelease storm
+drives the real widget tree, so it needs a display: it starts Xvfb when
+DISPLAY is unset and Xvfb is installed, and is skipped otherwise.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import gas_engine as engine
+import plan_schema
+from cell_graph import plan_graph
+
+APP_FILE = os.path.join(ROOT, "Tec_Gas_AutoCalc_V0.9.py")
+DEFAULT_TOLERANCE = 0.15
+
+SIZES = {
+    "full": {"batch": 10000, "files": 2000, "pdf_plans": 200, "deco_gases": 3, "repeat": 5},
+    "quick": {"batch": 1000, "files": 200, "pdf_plans": 20, "deco_gases": 2, "repeat": 3},
+}
+
+
+def sample_plan(i=0):
+    """A filled-in plan; ``i`` varies depth and times so batches are not uniform."""
+    plan = engine.empty_plan()
+    depth = 100 + i % 80
+    plan[engine.GENERAL_INFO][:4] = [str(depth), "21/35 + EAN50 + O2", str(20 + i % 20), "30/80"]
+    plan[engine.RESERVE][0] = "70"
+    for r, time_ in ((0, "4"), (1, "3")):
+        plan[engine.EMERGENCY][r][engine.SAC] = "1.2"
+        plan[engine.EMERGENCY][r][engine.TIME] = time_
+    plan[engine.BOTTOM_GAS][0] = [str(depth), "", "0.7", str(20 + i % 20), ""]
+    for r, stop in enumerate(["1", "1", "2", "3", "5", "9"]):
+        plan[engine.DECO_STOPS][r][1] = stop
+    return plan
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "repeat": repeat}
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# --- Benchmarks: each returns a dict of metrics ---
+
+def bench_engine_single(sizes):
+    plan = sample_plan()
+    n = 1000
+    result = timed(lambda: [engine.recompute_plan(plan) for _ in range(n)], sizes["repeat"])
+    result["per_plan_seconds"] = result["seconds"] / n
+    return result
+
+
+def bench_engine_batch(sizes):
+    plans = [sample_plan(i) for i in range(sizes["batch"])]
+    result = timed(lambda: engine.recompute_plans(plans), sizes["repeat"])
+    result["plans"] = len(plans)
+    result["per_plan_seconds"] = result["seconds"] / len(plans)
+    return result
+
+
+def bench_deco_optimizer(sizes):
+    import deco_engine
+    import deco_optimizer
+    bottom = deco_engine.parse_gas("18/45")
+    gases = deco_engine.parse_gas_list("35/25, EAN50, EAN80, O2")
+    # One process, so the number measures the search itself rather than the pool
+    run = lambda: deco_optimizer.optimize(200, 25, bottom, gases, 0.3, 0.8, max_gases=sizes["deco_gases"], workers=1)
+    result = timed(run, sizes["repeat"])
+    result["profiles"] = len(run())
+    return result
+
+
+def bench_cell_graph_edit(sizes):
+    # Incremental update the GUI runs per keystroke: Max Depth, then a deco stop time
+    graph = plan_graph(sample_plan())
+    edits = [(engine.GENERAL_INFO, 0), (engine.DECO_STOPS, 5, 1)]
+    n = 2000
+
+    def run():
+        for i in range(n):
+            graph.set(edits[i % 2], str(10 + i % 150))
+
+    result = timed(run, sizes["repeat"])
+    result["per_edit_seconds"] = result["seconds"] / n
+    return result
+
+
+class CountingEntry:
+    """Just enough of a Tk entry for ``ui_scheduler``; counts delete+insert writes."""
+
+    def __init__(self, counter):
+        self.text = ""
+        self.counter = counter
+
+    def get(self):
+        return self.text
+
+    def cget(self, option):
+        return "normal"
+
+    def configure(self, **options):
+        pass
+
+    def delete(self, first, last=None):
+        self.text = ""
+
+    def insert(self, index, text):
+        self.text = text
+        self.counter["writes"] += 1
+
+
+class IdleRoot:
+    """Stands in for the Tk root: after_idle jobs run when ``idle()`` is called."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def after_idle(self, fn):
+        job = len(self.jobs) + 1
+        self.jobs[job] = fn
+        return job
+
+    def after(self, ms, fn):
+        return self.after_idle(fn)
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def idle(self):
+        jobs, self.jobs = self.jobs, {}
+        for fn in jobs.values():
+            fn()
+
+
+# The edits bench_keyrelease_storm types into the real widgets
+STORM_EDITS = [
+    ((engine.GENERAL_INFO, 0), "130.5"),
+    ((engine.RESERVE, 0), "70"),
+    ((engine.EMERGENCY, 0, engine.SAC), "1.25"),
+    ((engine.EMERGENCY, 0, engine.TIME), "4"),
+    ((engine.DECO_STOPS, 0, 1), "12"),
+    ((engine.DECO_STOPS, 5, 1), "15"),
+]
+
+
+def bench_entry_writes(sizes):
+    """Entry writes per keystroke for the storm edits without a display: every graph
+    change written straight to its entry ("direct", as before UpdateScheduler), or
+    queued through UpdateScheduler with an idle cycle after each key ("typed") or
+    only at the end ("burst")."""
+    from ui_scheduler import UpdateScheduler, write_entry
+    keys = sum(len(text) for key, text in STORM_EDITS)
+
+    def run(mode):
+        counter = {"writes": 0}
+        graph = plan_graph(engine.empty_plan())
+        graph.recompute()
+        entries = {}
+        for key, text in graph.text.items():
+            entries[key] = CountingEntry(counter)
+            entries[key].text = text
+        root = IdleRoot()
+        updates = UpdateScheduler(root)
+        for key, text in STORM_EDITS:
+            for i in range(1, len(text) + 1):
+                entries[key].text = text[:i]  # typed by the user, not a write
+                for changed, value in graph.set(key, text[:i]):
+                    if mode == "direct":
+                        write_entry(entries[changed], value)
+                    else:
+                        updates.write(entries[changed], value)
+                if mode == "typed":
+                    root.idle()
+        root.idle()
+        return counter["writes"]
+
+    result = timed(lambda: run("burst"), sizes["repeat"])
+    result["keys"] = keys
+    for mode in ("direct", "typed", "burst"):
+        result[f"{mode}_writes_per_key"] = run(mode) / keys
+    return result
+
+
+def bench_json_roundtrip(sizes):
+    # What Save / Load do per file: plan_schema.write_plan, then read_plan (parse + validate) + recompute
+    plans = [sample_plan(i) for i in range(sizes["files"])]
+    folder = tempfile.mkdtemp(prefix="bench_json_")
+    try:
+        paths = [os.path.join(folder, f"plan{i}.json") for i in range(len(plans))]
+
+        def save():
+            for path, plan in zip(paths, plans):
+                plan_schema.write_plan(path, plan)
+
+        def load():
+            loaded = []
+            for path in paths:
+                loaded.append(plan_schema.read_plan(path))
+            engine.recompute_plans(loaded)
+
+        save_result = timed(save, sizes["repeat"])
+        load_result = timed(load, sizes["repeat"])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return {
+        "files": len(plans),
+        "seconds": save_result["seconds"] + load_result["seconds"],
+        "save_seconds": save_result["seconds"],
+        "load_seconds": load_result["seconds"],
+        "repeat": sizes["repeat"],
+    }
+
+
+def bench_pdf_single(sizes):
+    import pdf_export
+    tables = pdf_export.plan_tables(engine.recompute_plan(sample_plan()))
+    folder = tempfile.mkdtemp(prefix="bench_pdf_")
+    try:
+        path = os.path.join(folder, "plan.pdf")
+        pdf_export.write_pdf(path, tables)  # warm up (font loading)
+        result = timed(lambda: pdf_export.write_pdf(path, tables), sizes["repeat"])
+        result["peak_bytes"] = peak_memory(lambda: pdf_export.write_pdf(path, tables))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return result
+
+
+def bench_pdf_many(sizes):
+    import pdf_export
+    n = sizes["pdf_plans"]
+    folder = tempfile.mkdtemp(prefix="bench_pdf_")
+    try:
+        path = os.path.join(folder, "plans.pdf")
+
+        def run():
+            plans = ((f"Plan {i}", engine.recompute_plan(sample_plan(i))) for i in range(n))
+            pdf_export.write_plans_pdf(path, plans, n)
+
+        result = timed(run, max(1, sizes["repeat"] - 2))
+        result["peak_bytes"] = peak_memory(run)
+        result["plans"] = n
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return result
+
+
+def start_display():
+    """Make sure Tk has a display; returns (Xvfb process or None, skip reason or None)."""
+    if os.environ.get("DISPLAY"):
+        return None, None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        return None, "no DISPLAY and Xvfb is not installed"
+    display = ":%d" % (90 + os.getpid() % 100)
+    proc = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    if proc.poll() is not None:
+        return None, "Xvfb failed to start"
+    os.environ["DISPLAY"] = display
+    return proc, None
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("gas_planning_app", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_keyrelease_storm(sizes):
+    """Type into the real widgets: one <KeyRelease> per character, either letting
+    Tk go idle after each key ("typed") or only at the end ("burst")."""
+    xvfb, skipped = start_display()
+    if skipped:
+        return {"skipped": skipped}
+    journal = tempfile.TemporaryDirectory()
+    try:
+        # Journal in a temporary directory so the user's autosave is never touched
+        app = load_app_module().GasPlanningApp(autosave_path=os.path.join(journal.name, "autosave.journal"))
+        app.finish_building()
+        app.update()
+        edits = STORM_EDITS
+        result = {"keys": sum(len(text) for key, text in edits)}
+        for mode in ("typed", "burst"):
+            app.set_plan(engine.empty_plan())
+            app.update()
+            app.updates.reset_stats()
+            start = time.perf_counter()
+            for key, text in edits:
+                entry = app.cell_widget(key)
+                for i in range(1, len(text) + 1):
+                    entry.delete(0, "end")
+                    entry.insert(0, text[:i])
+                    entry.event_generate("<KeyRelease>")
+                    if mode == "typed":
+                        app.update()
+            app.update()
+            elapsed = time.perf_counter() - start
+            stats = app.updates.stats()
+            result[f"{mode}_seconds"] = elapsed
+            result[f"{mode}_per_key_seconds"] = elapsed / result["keys"]
+            result[f"{mode}_writes_per_key"] = stats["written"] / result["keys"]
+        result["seconds"] = result["typed_seconds"]
+        app.destroy()
+        return result
+    finally:
+        journal.cleanup()
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+BENCHMARKS = {
+    "engine_single": bench_engine_single,
+    "engine_batch": bench_engine_batch,
+    "cell_graph_edit": bench_cell_graph_edit,
+    "entry_writes": bench_entry_writes,
+    "deco_optimizer": bench_deco_optimizer,
+    "json_roundtrip": bench_json_roundtrip,
+    "pdf_single": bench_pdf_single,
+    "pdf_many": bench_pdf_many,
+    "keyrelease_storm": bench_keyrelease_storm,
+}
+
+# Metrics compared against a baseline (lower is better)
+COMPARED = ("seconds", "peak_bytes", "typed_writes_per_key", "burst_writes_per_key")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, sizes, progress=None):
+    results = {}
+    for name in names:
+        if progress:
+            progress(name)
+        try:
+            results[name] = BENCHMARKS[name](sizes)
+        except Exception as exc:
+            results[name] = {"error": f"{type(exc).__name__}: {exc}"}
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """[(benchmark, metric, old, new, ratio, regressed)] for metrics present in both runs."""
+    rows = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get("results", {}).get(name, {})
+        for metric in COMPARED:
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            ratio = new / old if old else float("inf") if new else 1.0
+            rows.append((name, metric, old, new, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="Gas planning sheet benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("-o", "--out", default="bench_results.json", help="results file (default: bench_results.json)")
+    parser.add_argument("--baseline", metavar="JSON", help="compare against an earlier results file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"slowdown counted as a regression (default: {DEFAULT_TOLERANCE:g} = 15%%)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    sizes = SIZES["quick" if args.quick else "full"]
+
+    results = run(args.names or list(BENCHMARKS), sizes, lambda name: print(f"running {name}...", file=sys.stderr))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=4)
+
+    for name, metrics in results.items():
+        if "seconds" in metrics:
+            extra = f"  peak {metrics['peak_bytes'] / 2 ** 20:.1f} MB" if "peak_bytes" in metrics else ""
+            print(f"{name:<18} {metrics['seconds'] * 1000:10.2f} ms{extra}")
+        else:
+            print(f"{name:<18} {metrics.get('skipped') or metrics.get('error')}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\nvs. {args.baseline} (commit {baseline.get('meta', {}).get('commit')}):")
+    for name, metric, old, new, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<18} {metric:<22} {old:12.6g} -> {new:12.6g}  x{ratio:.2f}{flag}")
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Declarative cell dependency graph for the planning sheet.
+
+Each derived cell has one formula (its input cells and a function).  An edit
+marks the edited cell dirty and only its downstream cells are re-evaluated, in
+topological order and at most once each.  Propagation stops at any cell whose
+text did not change, so a keystroke only touches the widgets it affects.
+"""
+import numpy as np
+
+import environment
+import gas_engine as engine
+import oxygen
+from gas_engine import DEPTH, ATA, SAC, TIME, GAS, PPO2, CNS, OTU, NAN
+
+
+class Formula:
+    def __init__(self, inputs, fn, raw=False):
+        # fn gets the input values as floats (NaN when blank), or as text when raw=True.
+        # Returning None keeps the cell's current text.
+        self.inputs = inputs
+        self.fn = fn
+        self.raw = raw
+
+
+class CellGraph:
+    def __init__(self):
+        self.text = {}
+        self.numbers = {}
+        self.formulas = {}
+        self.dependents = {}
+        self._order = None
+        self._downstream = {}
+
+    def add_cell(self, key, text=""):
+        self.text[key] = text
+        self.numbers[key] = engine.to_float(text)
+        self.dependents.setdefault(key, [])
+
+    def add_formula(self, key, inputs, fn, raw=False):
+        self.formulas[key] = Formula(inputs, fn, raw)
+        for cell in inputs:
+            self.dependents.setdefault(cell, []).append(key)
+        self._order = None
+        self._downstream.clear()
+
+    def order(self):
+        """Topological index of every cell (raises ValueError on a cycle)."""
+        if self._order is None:
+            indegree = {key: 0 for key in self.text}
+            for key, formula in self.formulas.items():
+                indegree[key] = len(formula.inputs)
+            ready = [key for key, n in indegree.items() if n == 0]
+            order = []
+            while ready:
+                key = ready.pop()
+                order.append(key)
+                for dep in self.dependents.get(key, []):
+                    indegree[dep] -= 1
+                    if indegree[dep] == 0:
+                        ready.append(dep)
+            if len(order) != len(indegree):
+                raise ValueError("cell formulas contain a cycle")
+            self._order = {key: i for i, key in enumerate(order)}
+        return self._order
+
+    def downstream(self, key):
+        # Cached per source cell: every formula reachable from ``key`` in topological order
+        if key not in self._downstream:
+            seen, stack = set(), [key]
+            while stack:
+                for dep in self.dependents.get(stack.pop(), []):
+                    if dep not in seen:
+                        seen.add(dep)
+                        stack.append(dep)
+            order = self.order()
+            self._downstream[key] = sorted(seen, key=order.__getitem__)
+        return self._downstream[key]
+
+    def assign(self, key, text):
+        # Store a value without recomputing anything
+        self.text[key] = text
+        self.numbers[key] = engine.to_float(text)
+
+    def _evaluate(self, key):
+        formula = self.formulas[key]
+        if formula.raw:
+            args = [self.text[cell] for cell in formula.inputs]
+        else:
+            args = [self.numbers[cell] for cell in formula.inputs]
+        return formula.fn(*args)
+
+    def _propagate(self, cells, dirty):
+        changes = []
+        for key in cells:
+            if not any(cell in dirty for cell in self.formulas[key].inputs):
+                continue
+            new = self._evaluate(key)
+            if new is None or new == self.text[key]:
+                continue
+            self.assign(key, new)
+            dirty.add(key)
+            changes.append((key, new))
+        return changes
+
+    def set(self, key, text):
+        """Edit one cell; returns the (key, text) pairs of derived cells that changed."""
+        if text == self.text.get(key):
+            return []
+        self.assign(key, text)
+        return self._propagate(self.downstream(key), {key})
+
+    def update(self, values):
+        """Edit several cells at once; each affected formula is still evaluated once."""
+        changed = [key for key, text in values.items() if text != self.text.get(key)]
+        for key in changed:
+            self.assign(key, values[key])
+        cells = set()
+        for key in changed:
+            cells.update(self.downstream(key))
+        order = self.order()
+        return self._propagate(sorted(cells, key=order.__getitem__), set(changed))
+
+    def recompute(self):
+        """Re-evaluate every formula once; returns the cells that changed."""
+        order = self.order()
+        cells = sorted(self.formulas, key=order.__getitem__)
+        return self._propagate(cells, set(self.text))
+
+
+# --- Sheet formulas (same results as gas_engine.evaluate) ---
+
+def _environment(water, altitude, units):
+    # None while the Environment fields don't parse; the ATAs go blank
+    try:
+        return environment.from_fields(water, altitude, units)
+    except ValueError:
+        return None
+
+
+def _copy_if_number(text):
+    return None if engine.to_float(text) != engine.to_float(text) else text
+
+
+def _ata(depth, *fields):
+    # Raw inputs: the depth, then the Environment fields; a blank depth blanks the ATA
+    depth, env = engine.to_float(depth), _environment(*fields)
+    return engine.format_value(env.sheet_ata(depth) if env and depth == depth else NAN, 2)
+
+
+def _gas(decimals):
+    def fn(ata, sac, time):
+        return engine.format_value(float(np.round(engine.gas_volume(ata, sac, time), decimals)), decimals)
+    return fn
+
+
+def _total(decimals):
+    def fn(*values):
+        values = [v for v in values if v == v]
+        return engine.format_value(float(np.round(sum(values), decimals)) if values else NAN, decimals)
+    return fn
+
+
+def _midpoint(depth1, depth3):
+    return engine.format_value(float(np.round((depth1 + depth3) / 2, 1)), 1, engine.MIDPOINT_PLACEHOLDER)
+
+
+def _two_divers(total):
+    return engine.format_value(float(np.round(total * 2, 1)), 1)
+
+
+def _bottom_ppo2(mix, ata):
+    fo2 = engine.mix_fo2(mix)
+    return engine.format_value(float(np.round(fo2[0] * engine.to_float(ata), 2)) if fo2 else NAN, 2)
+
+
+def _deco_ppo2(mix, depth, ata, *fields):
+    fo2, depth, ata = engine.mix_fo2(mix), engine.to_float(depth), engine.to_float(ata)
+    if not fo2:
+        return ""
+    env = _environment(*fields)
+    switch_ata = env.depth_to_ata(depth) if env else NAN
+    return engine.format_value(float(np.round(oxygen.breathing_fo2(fo2, switch_ata) * ata, 2)), 2)
+
+
+def _exposure(rates):
+    # rates: oxygen.CNS_RATE or oxygen.OTU_RATE
+    def fn(ppo2, time):
+        return engine.format_value(float(np.round(np.interp(ppo2, oxygen.PPO2_GRID, rates) * time, 1)), 1)
+    return fn
+
+
+def _o2_warnings(n_bottom):
+    # Inputs: CNS total, OTU total, then (ppO2, time) per bottom row and per deco row
+    def fn(cns, otu, *segments):
+        used = [p if t > 0 and p == p else NAN for p, t in zip(segments[0::2], segments[1::2])]
+        bottom = max((p for p in used[:n_bottom] if p == p), default=NAN)
+        deco = max((p for p in used[n_bottom:] if p == p), default=NAN)
+        return oxygen.warnings(cns, otu, bottom, deco)
+    return fn
+
+
+def plan_graph(plan=None):
+    """Build the sheet's dependency graph, keyed (section, index) / (section, row, col)."""
+    plan = engine.normalize_plan(plan or engine.empty_plan())
+    graph = CellGraph()
+    for section in engine.SECTION_ORDER:
+        if section in engine.ENTRY_ROWS:
+            for i, value in enumerate(plan[section]):
+                graph.add_cell((section, i), value)
+        else:
+            for r, row in enumerate(plan[section]):
+                for c, value in enumerate(row):
+                    graph.add_cell((section, r, c), value)
+
+    em, bottom, deco = engine.EMERGENCY, engine.BOTTOM_GAS, engine.DECO_GAS
+    # Every depth -> ATA formula also reads the Environment, so changing it re-evaluates them all once
+    env = [(engine.ENVIRONMENT, i) for i in range(len(engine.ENVIRONMENT_LABELS))]
+
+    # Gas Reserve (Emergency)
+    graph.add_formula((em, 0, DEPTH), [(engine.GENERAL_INFO, 0)], _copy_if_number, raw=True)
+    graph.add_formula((em, 2, DEPTH), [(engine.RESERVE, 0)], _copy_if_number, raw=True)
+    graph.add_formula((em, 1, DEPTH), [(em, 0, DEPTH), (em, 2, DEPTH)], _midpoint)
+    graph.add_formula((em, 0, ATA), [(em, 0, DEPTH)] + env, _ata, raw=True)
+    graph.add_formula((em, 1, ATA), [(em, 1, DEPTH)] + env, _ata, raw=True)
+    graph.add_formula((em, 2, ATA), [(em, 2, DEPTH)] + env, _ata, raw=True)
+    for r in (0, 1):
+        graph.add_formula((em, r, GAS), [(em, r, ATA), (em, r, SAC), (em, r, TIME)], _gas(1))
+    graph.add_formula((em, 2, GAS), [(em, 0, GAS), (em, 1, GAS)], _total(1))
+    graph.add_formula((engine.RESERVE, 1), [(em, 2, GAS)], _two_divers)
+
+    # Bottom Gas Requirements
+    for r in range(len(plan[bottom])):
+        graph.add_formula((bottom, r, ATA), [(bottom, r, DEPTH)] + env, _ata, raw=True)
+        graph.add_formula((bottom, r, GAS), [(bottom, r, ATA), (bottom, r, SAC), (bottom, r, TIME)], _gas(2))
+
+    # Deco Gas Requirements: one row per deco stop, then the total
+    n_stops = len(plan[engine.DECO_STOPS])
+    for r in range(n_stops):
+        graph.add_formula((deco, r, TIME), [(engine.DECO_STOPS, r, 1)], lambda text: text, raw=True)
+        graph.add_formula((deco, r, ATA), [(deco, r, DEPTH)] + env, _ata, raw=True)
+        graph.add_formula((deco, r, GAS), [(deco, r, ATA), (deco, r, SAC), (deco, r, TIME)], _gas(2))
+    graph.add_formula((deco, n_stops, GAS), [(deco, r, GAS) for r in range(n_stops)], _total(2))
+
+    # Oxygen exposure, per row: a stop time edit re-evaluates that row's CNS/OTU and the totals
+    info, mix = engine.GENERAL_INFO, (engine.GENERAL_INFO, 1)
+    n_bottom = len(plan[bottom])
+    segments = [(bottom, r) for r in range(n_bottom)] + [(deco, r) for r in range(n_stops)]
+    for section, r in segments:
+        if section == bottom:
+            graph.add_formula((section, r, PPO2), [mix, (section, r, ATA)], _bottom_ppo2, raw=True)
+        else:
+            graph.add_formula((section, r, PPO2), [mix, (section, r, DEPTH), (section, r, ATA)] + env,
+                              _deco_ppo2, raw=True)
+        for column, rates in ((CNS, oxygen.CNS_RATE), (OTU, oxygen.OTU_RATE)):
+            graph.add_formula((section, r, column), [(section, r, PPO2), (section, r, TIME)], _exposure(rates))
+    for column, total in ((CNS, engine.CNS_TOTAL), (OTU, engine.OTU_TOTAL)):
+        graph.add_formula((deco, n_stops, column), [(deco, r, column) for r in range(n_stops)], _total(1))
+        graph.add_formula((info, total), [(bottom, r, column) for r in range(n_bottom)] + [(deco, n_stops, column)],
+                          _total(1))
+    graph.add_formula((info, engine.O2_WARNINGS),
+                      [(info, engine.CNS_TOTAL), (info, engine.OTU_TOTAL)]
+                      + [(section, r, c) for section, r in segments for c in (PPO2, TIME)],
+                      _o2_warnings(n_bottom))
+    return graph
@@ -0,0 +1,356 @@
+"""Bühlmann ZHL-16C decompression engine with gradient factors.
+
+Tissue loadings for all 16 compartments are held as NumPy arrays, so a whole
+profile is a handful of vector updates.  The ascent search walks forward from
+the tissue state cached at the previous stop rather than re-simulating from the
+surface.  Depths are in the plan's depth units, converted to pressure with its
+``environment.Environment`` (feet of sea water at sea level by default).
+"""
+import re
+
+import numpy as np
+
+import environment
+import gas_engine as engine
+from gas_engine import DEPTH, ATA, TIME, N_STOPS
+from oxygen import MAX_PPO2  # deco gas switch limit
+
+# --- ZHL-16C coefficients (a in bar) ---
+N2_HALF_TIMES = np.array([4.0, 8.0, 12.5, 18.5, 27.0, 38.3, 54.3, 77.0,
+                          109.0, 146.0, 187.0, 239.0, 305.0, 390.0, 498.0, 635.0])
+N2_A = np.array([1.2599, 1.0000, 0.8618, 0.7562, 0.6200, 0.5043, 0.4410, 0.4000,
+                 0.3750, 0.3500, 0.3295, 0.3065, 0.2835, 0.2610, 0.2480, 0.2327])
+N2_B = np.array([0.5050, 0.6514, 0.7222, 0.7825, 0.8126, 0.8434, 0.8693, 0.8910,
+                 0.9092, 0.9222, 0.9319, 0.9403, 0.9477, 0.9544, 0.9602, 0.9653])
+HE_HALF_TIMES = np.array([1.51, 3.02, 4.72, 6.99, 10.21, 14.48, 20.53, 29.11,
+                          41.20, 55.19, 70.69, 90.34, 115.29, 147.42, 188.24, 240.03])
+HE_A = np.array([1.7424, 1.3830, 1.1919, 1.0458, 0.9220, 0.8205, 0.7305, 0.6502,
+                 0.5950, 0.5545, 0.5333, 0.5189, 0.5181, 0.5176, 0.5172, 0.5119])
+HE_B = np.array([0.4245, 0.5747, 0.6527, 0.7223, 0.7582, 0.7957, 0.8279, 0.8553,
+                 0.8757, 0.8903, 0.8997, 0.9073, 0.9122, 0.9171, 0.9217, 0.9267])
+
+K_N2 = np.log(2) / N2_HALF_TIMES
+K_HE = np.log(2) / HE_HALF_TIMES
+
+SURFACE_BAR = 1.01325
+WATER_VAPOUR_BAR = 0.0627
+AIR_N2 = 0.7902
+
+# Rates and stop spacing of the default environment (feet); see ``environment`` for metres
+DEFAULT_ENV = environment.DEFAULT
+DESCENT_RATE = DEFAULT_ENV.descent_rate   # ft/min
+ASCENT_RATE = DEFAULT_ENV.ascent_rate     # ft/min
+STOP_INTERVAL = DEFAULT_ENV.stop_interval  # ft
+LAST_STOP = DEFAULT_ENV.last_stop          # ft
+MAX_STOP_MINUTES = 999
+
+
+def depth_to_bar(depth, env=DEFAULT_ENV):
+    return env.depth_to_ata(depth) * SURFACE_BAR
+
+
+def bar_to_depth(pressure, env=DEFAULT_ENV):
+    return env.ata_to_depth(pressure / SURFACE_BAR)
+
+
+# --- Gas / gradient factor parsing ---
+
+def parse_gas(text):
+    """Parse one mix ("Air", "EAN32", "32%", "O2", "18/45", "TMX 21/35") into (fO2, fHe)."""
+    t = text.strip().upper()
+    if t in ("AIR", ""):
+        return 0.21, 0.0
+    if t in ("O2", "OXYGEN"):
+        return 1.0, 0.0
+    m = re.fullmatch(r"(?:TMX|TX|TRIMIX|HELIAIR)?\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)", t)
+    if m:
+        fo2, fhe = float(m.group(1)) / 100, float(m.group(2)) / 100
+    else:
+        m = re.fullmatch(r"(?:EANX?|NITROX|NX)?\s*(\d+(?:\.\d+)?)\s*%?", t)
+        if not m:
+            raise ValueError(f"Unrecognised gas mix: {text!r}")
+        fo2, fhe = float(m.group(1)) / 100, 0.0
+    if not 0 < fo2 <= 1 or fo2 + fhe > 1:
+        raise ValueError(f"Gas mix fractions out of range: {text!r}")
+    return fo2, fhe
+
+
+def gas_name(gas):
+    """Sheet name for (fO2, fHe): "Air", "O2", "EAN50", "18/45"."""
+    fo2, fhe = (round(f * 100, 1) for f in gas)
+    if fhe:
+        return f"{fo2:g}/{fhe:g}"
+    return {21: "Air", 100: "O2"}.get(fo2, f"EAN{fo2:g}")
+
+
+def parse_gas_list(text):
+    """Gas Mix field: bottom gas first, then any deco gases ("18/45 + EAN50, O2")."""
+    parts = [p for p in re.split(r"[+,;]", text) if p.strip()]
+    if not parts:
+        raise ValueError("Gas Mix is empty")
+    return [parse_gas(p) for p in parts]
+
+
+def parse_gradient_factors(text):
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*[/\-]\s*(\d+(?:\.\d+)?)\s*", text or "")
+    if not m:
+        raise ValueError(f"Gradient Factor should look like 30/80, got {text!r}")
+    lo, hi = float(m.group(1)) / 100, float(m.group(2)) / 100
+    if not 0 < lo <= hi <= 1:
+        raise ValueError(f"Gradient Factor out of range: {text!r}")
+    return lo, hi
+
+
+def ppo2(depth, fo2, env=DEFAULT_ENV):
+    return fo2 * env.depth_to_ata(depth)
+
+
+def breathable(depth, fo2, max_ppo2=MAX_PPO2, env=DEFAULT_ENV):
+    # ppO2 is judged to one decimal, as on the sheet (O2 at 20 ft is 1.6)
+    return round(float(ppo2(depth, fo2, env)), 1) <= max_ppo2
+
+
+# --- Tissue model ---
+
+class Tissues:
+    """N2/He partial pressures (bar) for the 16 compartments, saturated at the
+    environment's surface pressure to start with."""
+
+    def __init__(self, n2=None, he=None, env=DEFAULT_ENV):
+        if n2 is None:
+            n2 = np.full(16, AIR_N2 * (env.surface_ata * SURFACE_BAR - WATER_VAPOUR_BAR))
+        self.n2 = n2
+        self.he = np.zeros(16) if he is None else he
+        self.env = env
+
+    def copy(self):
+        return Tissues(self.n2.copy(), self.he.copy(), self.env)
+
+    def segment(self, start_depth, end_depth, minutes, gas):
+        """Schreiner equation for a linear depth change (constant depth when equal)."""
+        if minutes <= 0:
+            return self
+        fo2, fhe = gas
+        fn2 = 1 - fo2 - fhe
+        p0 = float(depth_to_bar(start_depth, self.env)) - WATER_VAPOUR_BAR
+        rate = (float(depth_to_bar(end_depth, self.env)) - float(depth_to_bar(start_depth, self.env))) / minutes
+        self.n2 = _schreiner(self.n2, fn2 * p0, fn2 * rate, minutes, K_N2)
+        self.he = _schreiner(self.he, fhe * p0, fhe * rate, minutes, K_HE)
+        return self
+
+    def coefficients(self):
+        total = self.n2 + self.he
+        safe = np.where(total > 0, total, 1)
+        a = (N2_A * self.n2 + HE_A * self.he) / safe
+        b = (N2_B * self.n2 + HE_B * self.he) / safe
+        return total, a, b
+
+    def ceiling(self, gf):
+        """Shallowest tolerated depth at gradient factor ``gf``."""
+        total, a, b = self.coefficients()
+        tolerated = (total - a * gf) / (gf / b + 1 - gf)
+        return max(0.0, float(bar_to_depth(tolerated.max(), self.env)))
+
+
+def _schreiner(p, palv, rate, t, k):
+    return palv + rate * (t - 1 / k) - (palv - p - rate / k) * np.exp(-k * t)
+
+
+# --- Schedule ---
+
+class DecoSchedule:
+    def __init__(self, stops, runtime, gas_switches, first_stop, units=environment.FEET):
+        self.stops = stops                # [(depth, minutes, gas)], deepest first
+        self.runtime = runtime            # minutes, surface to surface
+        self.gas_switches = gas_switches  # [(depth, gas)]
+        self.first_stop = first_stop
+        self.units = units                # of every depth above
+
+
+def _best_gas(depth, gases, env=DEFAULT_ENV):
+    # Richest mix that is breathable at this depth (bottom gas is always allowed)
+    best = gases[0]
+    for gas in gases[1:]:
+        if breathable(depth, gas[0], MAX_PPO2, env) and gas[0] > best[0]:
+            best = gas
+    return best
+
+
+def _gf_at(depth, first_stop, gf_lo, gf_hi):
+    if first_stop <= 0:
+        return gf_hi
+    return gf_hi + (gf_lo - gf_hi) * depth / first_stop
+
+
+def _next_target(depth, last_stop, interval=STOP_INTERVAL):
+    # Next stop depth above ``depth``; nothing between the last stop and the surface
+    target = int(np.ceil(depth / interval - 1e-9)) * interval - interval
+    return target if target >= last_stop else 0
+
+
+class Ascent:
+    """Ascent state (tissues, depth, gas, stops so far) that can be copied and resumed.
+
+    ``step`` moves up one stop interval, first waiting out a stop if the ceiling
+    requires it, so callers can cache the state at any depth and continue from
+    it with different gas choices (see ``deco_optimizer``).
+    """
+
+    def __init__(self, tissues, depth, runtime, gas):
+        self.tissues = tissues
+        self.depth = depth
+        self.runtime = runtime
+        self.gas = gas
+        self.first_stop = None      # set when the free ascent ends
+        self.stops = []
+        self.switches = []
+        self.legs = []              # [(start_depth, end_depth, minutes, gas)]
+
+    @property
+    def env(self):
+        return self.tissues.env
+
+    @classmethod
+    def after_bottom(cls, max_depth, bottom_time, gas, descent_rate=None, env=DEFAULT_ENV):
+        """State on leaving the bottom; bottom time runs from leaving the surface.
+        ``descent_rate`` defaults to the environment's."""
+        if max_depth <= 0 or bottom_time <= 0:
+            raise ValueError("Max Depth and Bottom Time must be positive")
+        descent_rate = descent_rate or env.descent_rate
+        tissues = Tissues(env=env)
+        descent = min(max_depth / descent_rate, bottom_time)
+        tissues.segment(0, max_depth, descent, gas)
+        tissues.segment(max_depth, max_depth, bottom_time - descent, gas)
+        return cls(tissues, max_depth, bottom_time, gas)
+
+    def copy(self):
+        other = Ascent(self.tissues.copy(), self.depth, self.runtime, self.gas)
+        other.first_stop = self.first_stop
+        other.stops, other.switches, other.legs = list(self.stops), list(self.switches), list(self.legs)
+        return other
+
+    def switch(self, gas):
+        if gas != self.gas:
+            self.switches.append((self.depth, gas))
+            self.gas = gas
+
+    def step(self, gas_at, gf_lo, gf_hi, ascent_rate=None, last_stop=None):
+        """Ascend to the next stop depth; ``gas_at(depth)`` picks the gas on arrival.
+        The ascent rate and last stop default to the environment's."""
+        env = self.env
+        ascent_rate = ascent_rate or env.ascent_rate
+        last_stop = env.last_stop if last_stop is None else last_stop
+        depth = self.depth
+        target = _next_target(depth, last_stop, env.stop_interval)
+        travel = (depth - target) / ascent_rate
+        if self.first_stop is None:
+            # Free ascent while the GF Lo ceiling allows it (GF Hi for surfacing without stops)
+            trial = self.tissues.copy().segment(depth, target, travel, self.gas)
+            if trial.ceiling(gf_lo if target else gf_hi) <= target + 1e-9:
+                self.legs.append((depth, target, travel, self.gas))
+                self.tissues, self.depth = trial, target
+                self.runtime += travel
+                if target:
+                    self.switch(gas_at(target))
+                return self
+            self.first_stop = depth
+            self.switch(gas_at(depth))
+
+        gf_next = _gf_at(target, self.first_stop, gf_lo, gf_hi)
+        minutes = 0
+        # Wait out the stop a minute at a time from the cached state
+        while True:
+            trial = self.tissues.copy().segment(depth, target, travel, self.gas)
+            if minutes and trial.ceiling(gf_next) <= target + 1e-9:
+                break
+            if minutes >= MAX_STOP_MINUTES:
+                raise ValueError("Stop time exceeded the search limit; check the plan inputs")
+            self.tissues.segment(depth, depth, 1, self.gas)
+            minutes += 1
+        self.stops.append((depth, minutes, self.gas))
+        self.legs += [(depth, depth, minutes, self.gas), (depth, target, travel, self.gas)]
+        self.runtime += minutes + travel
+        self.tissues, self.depth = trial, target
+        if target:
+            self.switch(gas_at(target))
+        return self
+
+    def schedule(self):
+        first_stop = self.depth if self.first_stop is None else self.first_stop
+        return DecoSchedule(list(self.stops), self.runtime, list(self.switches), first_stop, self.env.units)
+
+
+def switch_plan_gas(bottom_gas, switches):
+    """``gas_at`` for fixed switches [(depth, gas)], deepest first: the gas of the
+    shallowest switch at or below ``depth``, else the bottom gas."""
+    def gas_at(depth):
+        gas = bottom_gas
+        for switch_depth, switch_gas in switches:
+            if depth > switch_depth + 1e-9:
+                break
+            gas = switch_gas
+        return gas
+    return gas_at
+
+
+def plan_deco(max_depth, bottom_time, gases, gf_lo, gf_hi, env=DEFAULT_ENV, ascent_rate=None,
+              descent_rate=None, last_stop=None, switches=None):
+    """Compute a decompression schedule.
+
+    ``gases`` is [bottom gas, deco gases...] as (fO2, fHe).  Depths are in ``env``'s
+    units, and the rates and last stop default to its.  Bottom time runs from
+    leaving the surface to leaving the bottom.  Deco gases are switched to as soon
+    as they are breathable, unless ``switches`` fixes the switch depths as
+    [(depth, gas)], deepest first.
+    """
+    ascent = Ascent.after_bottom(max_depth, bottom_time, gases[0], descent_rate, env)
+    if switches is None:
+        gas_at = lambda depth: _best_gas(depth, gases, env)
+    else:
+        gas_at = switch_plan_gas(gases[0], switches)
+    while ascent.depth > 0:
+        ascent.step(gas_at, gf_lo, gf_hi, ascent_rate, last_stop)
+    return ascent.schedule()
+
+
+def plan_inputs(plan):
+    """(max_depth, bottom_time, gases, gf_lo, gf_hi, env) from a plan's General Info and Environment."""
+    plan = engine.normalize_plan(plan)
+    info = plan[engine.GENERAL_INFO]
+    max_depth, bottom_time = engine.to_float(info[0]), engine.to_float(info[2])
+    if max_depth != max_depth or bottom_time != bottom_time:
+        raise ValueError("Max Depth and Bottom Time must be numbers")
+    gf_lo, gf_hi = parse_gradient_factors(info[3])
+    return max_depth, bottom_time, parse_gas_list(info[1]), gf_lo, gf_hi, engine.plan_environment(plan)
+
+
+def schedule_for_plan(plan):
+    """Run ``plan_deco`` from a plan's General Info (Max Depth, Gas Mix, Bottom Time, GF) and Environment."""
+    return plan_deco(*plan_inputs(plan))
+
+
+def fill_plan(plan, schedule, rows=None):
+    """Write a schedule into the Deco Stops / Deco Gas Requirements tables and First Gas Switch Depth.
+
+    The deco tables are resized to ``rows`` stops (default: the schedule's stop
+    count, at least the sheet's standard six rows).
+    """
+    if rows is None:
+        rows = max(N_STOPS, len(schedule.stops))
+    elif len(schedule.stops) > rows:
+        raise ValueError(f"The schedule needs {len(schedule.stops)} stops but the Deco Stops table has {rows} rows")
+    plan = engine.normalize_plan(plan, stops=rows)
+    stops, deco = plan[engine.DECO_STOPS], plan[engine.DECO_GAS]
+    for r in range(rows):
+        if r < len(schedule.stops):
+            depth, minutes, gas = schedule.stops[r]
+            depth_text, time_text = f"{depth:g}", str(minutes)
+        else:
+            depth_text = time_text = ""
+        stops[r][0], stops[r][1] = depth_text, time_text
+        deco[r][DEPTH], deco[r][TIME] = depth_text, time_text
+        if not depth_text:
+            deco[r][ATA] = ""
+    if schedule.gas_switches:
+        plan[engine.RESERVE][0] = f"{schedule.gas_switches[0][0]:g}"
+    return plan
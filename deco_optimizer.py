@@ -0,0 +1,247 @@
+"""Multi-gas deco optimizer: picks deco gases, cylinders and switch depths.
+
+A candidate is a subset of the candidate gases (at most ``max_gases``, leaner
+gases switched deeper) with one switch depth per gas, anywhere from the
+deepest stop depth where the gas is breathable (its MOD at ``max_ppo2``) up to
+the last stop.  Each profile is simulated with ``deco_engine.Ascent``:
+
+* profiles are grouped by their deepest switch and each group is one task
+  for a process pool, all starting from the same bottom-phase state;
+* inside a group the ascent state is memoised per depth, keyed by the switches
+  already made, so profiles sharing a prefix only simulate it once.
+
+Cylinders do not change the profile, so each deco gas is matched to a cylinder
+afterwards and candidates whose gas does not fit are dropped.
+"""
+import itertools
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import gas_engine as engine
+import deco_engine
+import team
+from deco_engine import Ascent, DEFAULT_ENV, MAX_PPO2
+from gas_engine import SAC
+
+OBJECTIVES = ("runtime", "gas")
+DECO_SAC = float(engine.DEFAULT_DECO_SAC[0])
+RESERVE_FACTOR = 1.5      # deco gas requirement = consumption x 1.5 (rule of thirds)
+MAX_PROFILES = 200000
+POOL_MIN_PROFILES = 200   # below this a process pool costs more than it saves
+
+
+def parse_cylinders(text):
+    """Cylinder list, one entry per cylinder: catalog names ("AL40, AL80") or a name
+    and capacity in cuft ("Steel 50 50")."""
+    cylinders = []
+    for part in re.split(r"[,;]", text or ""):
+        words = part.split()
+        if not words:
+            continue
+        try:
+            cuft = float(words[-1])
+        except ValueError:
+            try:
+                cylinder = team.CATALOG[part]
+            except KeyError:
+                raise ValueError(f"Cylinder should be a catalog name or a name and cuft ('Steel 50 50'), "
+                                 f"got {part.strip()!r}") from None
+            cylinders.append((cylinder.name, cylinder.cuft))
+            continue
+        if cuft <= 0:
+            raise ValueError(f"Cylinder capacity must be positive: {part.strip()!r}")
+        cylinders.append((" ".join(words[:-1]) or f"{cuft:g} cuft", cuft))
+    return cylinders
+
+
+def switch_depths(gas, max_depth, max_ppo2=MAX_PPO2, last_stop=None, env=DEFAULT_ENV):
+    """Stop depths shallower than ``max_depth`` where ``gas`` is breathable, deepest first."""
+    interval = env.stop_interval
+    last_stop = env.last_stop if last_stop is None else last_stop
+    top = int(np.ceil(max_depth / interval - 1e-9)) * interval - interval
+    return [d for d in range(top, last_stop - 1, -interval) if deco_engine.breathable(d, gas[0], max_ppo2, env)]
+
+
+def switch_plans(bottom_gas, gases, max_depth, max_gases=2, max_ppo2=MAX_PPO2, last_stop=None, env=DEFAULT_ENV):
+    """Every switch plan ((depth, gas), ...), deepest first, using up to ``max_gases`` of ``gases``.
+
+    The empty plan (bottom gas only) comes first.  Gases no richer than the
+    bottom gas are skipped and richer gases are always switched to shallower.
+    """
+    gases = sorted({gas for gas in gases if gas[0] > bottom_gas[0]})
+    yield ()
+    for k in range(1, max_gases + 1):
+        for subset in itertools.combinations(gases, k):
+            if len({gas[0] for gas in subset}) < k:
+                continue
+            options = [switch_depths(gas, max_depth, max_ppo2, last_stop, env) for gas in subset]
+            for depths in itertools.product(*options):
+                if all(a > b for a, b in zip(depths, depths[1:])):
+                    yield tuple(zip(depths, subset))
+
+
+def _evaluate_group(start, plans, gf_lo, gf_hi, sac, ascent_rate, last_stop):
+    """Worker: simulate ``plans`` from the bottom-phase state ``start``.
+
+    Returns [(plan, schedule, {gas: cuft})], gas used over the whole ascent.
+    """
+    env = start.env
+    memo = {}
+    finished = []
+    for plan in plans:
+        # Resume from the shallowest memoised depth on this plan's path
+        path, depth = [], start.depth
+        while depth > 0:
+            depth = deco_engine._next_target(depth, last_stop, env.stop_interval)
+            path.append(depth)
+        state = start
+        for depth in reversed(path[:-1]):
+            key = (depth, tuple(s for s in plan if s[0] >= depth))
+            if key in memo:
+                state = memo[key]
+                break
+        gas_at = deco_engine.switch_plan_gas(start.gas, plan)
+        while state.depth > 0:
+            state = state.copy().step(gas_at, gf_lo, gf_hi, ascent_rate, last_stop)
+            if state.depth > 0:
+                memo[(state.depth, tuple(s for s in plan if s[0] >= state.depth))] = state
+        finished.append((plan, state))
+
+    # Gas for every leg of every profile in one vectorised pass
+    legs = [(i,) + leg for i, (_, state) in enumerate(finished) for leg in state.legs]
+    if not legs:
+        return [(plan, state.schedule(), {}) for plan, state in finished]
+    index, start_depth, end_depth, minutes = (np.array([leg[c] for leg in legs], dtype=float) for c in range(4))
+    ata = (env.depth_to_ata(start_depth) + env.depth_to_ata(end_depth)) / 2
+    volumes = engine.gas_volume(ata, sac, minutes).tolist()
+    used = [{} for _ in finished]
+    for leg, volume in zip(legs, volumes):
+        used[leg[0]][leg[4]] = used[leg[0]].get(leg[4], 0.0) + volume
+    return [(plan, state.schedule(), gas) for (plan, state), gas in zip(finished, used)]
+
+
+def assign_cylinders(requirements, cylinders):
+    """Give each gas its own cylinder that holds its requirement, using the least total
+    capacity; returns {gas: (name, cuft)} or None if nothing fits."""
+    gases = list(requirements)
+    best = None
+    for chosen in itertools.permutations(range(len(cylinders)), len(gases)):
+        if all(cylinders[i][1] >= requirements[gas] for i, gas in zip(chosen, gases)):
+            size = sum(cylinders[i][1] for i in chosen)
+            if best is None or size < best[0]:
+                best = (size, chosen)
+    return None if best is None else {gas: cylinders[i] for gas, i in zip(gases, best[1])}
+
+
+class Candidate:
+    def __init__(self, switches, schedule, gas_used, requirements, cylinders):
+        self.switches = switches          # ((depth, gas), ...), deepest first
+        self.schedule = schedule
+        self.gas_used = gas_used          # {gas: cuft} over the ascent, bottom gas included
+        self.requirements = requirements  # {deco gas: cuft} including the reserve
+        self.cylinders = cylinders        # {deco gas: (name, cuft)}; empty without a cylinder list
+
+    @property
+    def runtime(self):
+        return self.schedule.runtime
+
+    @property
+    def total_gas(self):
+        return sum(self.gas_used.values())
+
+    @property
+    def deco_gas(self):
+        return sum(self.requirements.values())
+
+    def describe(self):
+        if not self.switches:
+            return "Bottom gas only"
+        parts = []
+        for depth, gas in self.switches:
+            text = f"{deco_engine.gas_name(gas)} @ {depth:g} {self.schedule.units}"
+            if gas in self.cylinders:
+                text += f" ({self.cylinders[gas][0]})"
+            parts.append(text)
+        return ", ".join(parts)
+
+
+def optimize(max_depth, bottom_time, bottom_gas, gases, gf_lo, gf_hi, cylinders=None, max_gases=2,
+             objective="runtime", sac=DECO_SAC, max_ppo2=MAX_PPO2, reserve=RESERVE_FACTOR,
+             ascent_rate=None, last_stop=None, workers=None, env=DEFAULT_ENV):
+    """Search deco gas plans for a dive; returns the feasible ``Candidate``s, best first.
+
+    ``objective`` is "runtime" (total runtime, then gas) or "gas" (total gas
+    breathed on the ascent at ``sac``, then runtime).  Depths are in ``env``'s
+    units; the ascent rate and last stop default to its.  With ``cylinders`` each
+    deco gas needs its own cylinder holding ``reserve`` x its consumption, and
+    at most one gas per cylinder is used.  ``workers`` as in ``plan_batch.run``.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objective must be one of {', '.join(OBJECTIVES)}")
+    if cylinders:
+        max_gases = min(max_gases, len(cylinders))
+    ascent_rate = ascent_rate or env.ascent_rate
+    last_stop = env.last_stop if last_stop is None else last_stop
+    plans = []
+    for plan in switch_plans(bottom_gas, gases, max_depth, max_gases, max_ppo2, last_stop, env):
+        plans.append(plan)
+        if len(plans) > MAX_PROFILES:
+            raise ValueError(f"More than {MAX_PROFILES} gas plans to try; use fewer candidate gases "
+                             f"or fewer deco gases per dive")
+    start = Ascent.after_bottom(max_depth, bottom_time, bottom_gas, env=env)
+
+    groups = {}
+    for plan in plans:
+        groups.setdefault(plan[:1], []).append(plan)
+    groups = list(groups.values())
+    args = (gf_lo, gf_hi, sac, ascent_rate, last_stop)
+    if workers == 1 or len(groups) <= 1 or len(plans) < POOL_MIN_PROFILES:
+        results = [r for group in groups for r in _evaluate_group(start, group, *args)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            n = len(groups)
+            # Largest groups first so the pool isn't left waiting on one at the end
+            groups.sort(key=len, reverse=True)
+            parts = pool.map(_evaluate_group, [start] * n, groups, *([value] * n for value in args))
+            results = [r for part in parts for r in part]
+
+    candidates = []
+    for plan, schedule, used in results:
+        requirements = {gas: used.get(gas, 0.0) * reserve for _, gas in plan}
+        assigned = {}
+        if cylinders:
+            assigned = assign_cylinders(requirements, cylinders)
+            if assigned is None:
+                continue
+        candidates.append(Candidate(plan, schedule, used, requirements, assigned))
+    if objective == "runtime":
+        candidates.sort(key=lambda c: (c.runtime, c.total_gas))
+    else:
+        candidates.sort(key=lambda c: (c.total_gas, c.runtime))
+    return candidates
+
+
+def optimize_plan(plan, gases, **kwargs):
+    """``optimize`` for a plan's General Info (Max Depth, bottom gas, Bottom Time, GF) and Environment."""
+    max_depth, bottom_time, plan_gases, gf_lo, gf_hi, env = deco_engine.plan_inputs(plan)
+    return optimize(max_depth, bottom_time, plan_gases[0], gases, gf_lo, gf_hi, env=env, **kwargs)
+
+
+def fill_plan(plan, candidate, sac=DECO_SAC):
+    """Write a candidate into the sheet.
+
+    Deco Stops, the Deco Gas rows and First Gas Switch Depth come from
+    ``deco_engine.fill_plan``; the deco rows get ``sac``, Gas Mix lists the
+    chosen deco gases after the bottom gas and Deco Gas Req is their total
+    requirement.
+    """
+    plan = deco_engine.fill_plan(plan, candidate.schedule)
+    info = plan[engine.GENERAL_INFO]
+    names = [deco_engine.gas_name(gas) for _, gas in candidate.switches]
+    info[1] = " + ".join([re.split(r"[+,;]", info[1])[0].strip()] + ([", ".join(names)] if names else []))
+    info[5] = f"{candidate.deco_gas:.1f}" if names else ""
+    for row in plan[engine.DECO_GAS][:len(candidate.schedule.stops)]:
+        row[SAC] = f"{sac:g}"
+    return plan
@@ -0,0 +1,377 @@
+"""Dive-log importer: calibrates SAC, deco SAC and Emergency SAC from real dives.
+
+    python dive_log.py logs/*.csv export.uddf --cylinder "Double AL80"
+
+Reads dive-computer exports as a stream: CSV rows are gathered into chunks
+(one dive at most per chunk) and UDDF is parsed incrementally with each
+waypoint discarded once read.  Every chunk is folded into fixed windows of
+``WINDOW_SECONDS``; the tank pressure drop over a window, converted to
+surface CUFT and divided by minutes and ATA, is one SAC sample.  Samples go
+into fixed-size histograms per diver and phase, so memory stays flat however
+long the logs are.
+
+Phases use the running maximum depth of the dive: "bottom" windows are
+within ``BOTTOM_FRACTION`` of it, "deco" windows are shallower than half of
+it and close to level.  The calibrated SAC is the bottom median, deco SAC
+the deco median and Emergency SAC the 95th percentile of all windows.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import gas_engine as engine
+from gas_engine import BOTTOM_GAS, DECO_GAS, EMERGENCY, DEPTH, SAC
+import team
+
+WINDOW_SECONDS = 120
+CHUNK_ROWS = 65536
+MIN_DEPTH = 10            # ft; windows shallower than this are surface swims / safety stops
+BOTTOM_FRACTION = 0.75
+DECO_FRACTION = 0.5
+LEVEL_RATE = 10           # ft/min; deco windows must be about this level
+EMERGENCY_PERCENTILE = 95
+
+FEET_PER_METRE = 3.28084
+PSI_PER_BAR = 14.5038
+PA_PER_PSI = 6894.757
+SURFACE_PSI = 14.696
+CUFT_PER_M3 = 35.3147
+DEFAULT_CYLINDER = "Double AL80"
+
+# SAC histogram: 0.01 cuft/min bins up to SAC_MAX (the last bin also takes anything above)
+SAC_BIN = 0.01
+SAC_MAX = 5.0
+PHASES = ("bottom", "deco", "all")
+
+
+class SacHistogram:
+    def __init__(self):
+        self.counts = np.zeros(int(round(SAC_MAX / SAC_BIN)), dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, values):
+        if len(values):
+            index = np.minimum((values / SAC_BIN).astype(np.int64), len(self.counts) - 1)
+            self.counts += np.bincount(index, minlength=len(self.counts))
+            self.n += len(values)
+            self.total += float(values.sum())
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.n += other.n
+        self.total += other.total
+        return self
+
+    def percentile(self, q):
+        if not self.n:
+            return float("nan")
+        i = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.n))
+        return (min(i, len(self.counts) - 1) + 0.5) * SAC_BIN
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else float("nan")
+
+
+class DiverStats:
+    def __init__(self):
+        self.histograms = {phase: SacHistogram() for phase in PHASES}
+        self.dives = 0
+
+    def summary(self):
+        bottom, deco, every = (self.histograms[p] for p in PHASES)
+        return {
+            "dives": self.dives,
+            "windows": every.n,
+            "sac": bottom.percentile(50),
+            "sac_p90": bottom.percentile(90),
+            "deco_sac": deco.percentile(50),
+            "emergency_sac": every.percentile(EMERGENCY_PERCENTILE),
+            "mean_sac": every.mean,
+        }
+
+
+class Calibrator:
+    """Folds samples into per-diver SAC histograms, one chunk at a time.
+
+    Each dive starts with ``start_dive``; ``add`` takes arrays of elapsed
+    seconds, depth (ft) and tank pressure (psi).  Rows of the window still
+    open at the end of a chunk are carried into the next one.
+    """
+
+    def __init__(self, window=WINDOW_SECONDS):
+        self.window = window
+        self.divers = {}
+        self.samples = 0
+        self._carry = None
+
+    def start_dive(self, diver, cuft_per_psi):
+        self.end_dive()
+        self.stats = self.divers.setdefault(diver, DiverStats())
+        self.stats.dives += 1
+        self.cuft_per_psi = cuft_per_psi
+        self.t0 = None
+        self.running_max = 0.0
+        self._carry = None
+
+    def end_dive(self):
+        if self._carry is not None:
+            self._fold(*self._carry, complete=True)
+            self._carry = None
+
+    def add(self, seconds, depth, pressure):
+        self.samples += len(seconds)
+        if not len(seconds):
+            return
+        if self.t0 is None:
+            self.t0 = seconds[0]
+        if self._carry is not None:
+            seconds, depth, pressure = (np.concatenate([a, b]) for a, b in zip(self._carry, (seconds, depth, pressure)))
+            self._carry = None
+        self._fold(seconds, depth, pressure, complete=False)
+
+    def _fold(self, seconds, depth, pressure, complete):
+        window = ((seconds - self.t0) // self.window).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, window[1:] != window[:-1]])
+        if not complete:
+            # The last window may continue in the next chunk
+            last = starts[-1]
+            self._carry = (seconds[last:], depth[last:], pressure[last:])
+            seconds, depth, pressure, starts = seconds[:last], depth[:last], pressure[:last], starts[:-1]
+            if not len(starts):
+                return
+        ends = np.r_[starts[1:], len(seconds)] - 1
+        counts = ends - starts + 1
+        minutes = (seconds[ends] - seconds[starts]) / 60
+        mean_depth = np.add.reduceat(depth, starts) / counts
+        running_max = np.maximum(np.maximum.accumulate(np.maximum.reduceat(depth, starts)), self.running_max)
+        self.running_max = float(running_max[-1])
+        used = (pressure[starts] - pressure[ends]) * self.cuft_per_psi
+        rate = np.abs(depth[ends] - depth[starts]) / np.where(minutes > 0, minutes, np.nan)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sac = used / minutes / engine.depth_to_ata(mean_depth)
+        # Whole-ish windows at depth where the pressure fell (not a gas switch or a missing reading)
+        valid = (minutes >= self.window / 120) & (mean_depth >= MIN_DEPTH) & (used > 0) & np.isfinite(sac)
+        bottom = valid & (mean_depth >= BOTTOM_FRACTION * running_max)
+        deco = valid & (mean_depth < DECO_FRACTION * running_max) & (rate <= LEVEL_RATE)
+        histograms = self.stats.histograms
+        histograms["all"].add(sac[valid])
+        histograms["bottom"].add(sac[bottom])
+        histograms["deco"].add(sac[deco])
+
+    def summary(self):
+        self.end_dive()
+        return {diver: stats.summary() for diver, stats in self.divers.items()}
+
+
+# --- CSV ---
+
+def _find_column(headers, *candidates, exclude=()):
+    lowered = [h.strip().lower() for h in headers]
+    for candidate in candidates:
+        for i, h in enumerate(lowered):
+            if candidate in h and not any(x in h for x in exclude):
+                return i
+    return None
+
+
+def _parse_time(text):
+    # [h:]mm:ss to seconds
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def read_csv(calibrator, file_path, cuft_per_psi, diver=None, chunk_rows=CHUNK_ROWS):
+    """Stream a sample CSV (one row per sample, header row first) into ``calibrator``.
+
+    Columns are found by name: sample time / elapsed / time, depth, pressure,
+    and optionally dive (number or id) and diver.  Units come from the header
+    ("(m)", "bar", "(min)"); the defaults are ft, psi and seconds.  Without a
+    dive column a new dive starts whenever the time goes backwards.
+    """
+    diver = diver or os.path.splitext(os.path.basename(file_path))[0]
+    with open(file_path, newline="") as f:
+        reader = csv.reader(f)
+        try:
+            headers = next(reader)
+        except StopIteration:
+            return
+        time_col = _find_column(headers, "sample time", "divetime", "dive time", "elapsed", "time",
+                                exclude=("date", "surface", "start"))
+        depth_col = _find_column(headers, "sample depth", "depth", exclude=("max", "avg", "mean"))
+        pressure_col = _find_column(headers, "sample pressure", "tank pressure", "pressure",
+                                    exclude=("start", "end", "begin"))
+        if time_col is None or depth_col is None or pressure_col is None:
+            raise ValueError(f"{file_path}: need time, depth and pressure columns, got {headers}")
+        dive_col = _find_column(headers, "dive number", "dive id", "dive #", "dive")
+        diver_col = _find_column(headers, "diver", exclude=("buddy",))
+        depth_scale = FEET_PER_METRE if _is_metric(headers[depth_col]) else 1.0
+        pressure_scale = PSI_PER_BAR if "bar" in headers[pressure_col].lower() else 1.0
+        time_scale = 60.0 if "min" in headers[time_col].lower() else 1.0
+
+        key = None
+        times, depths, pressures = [], [], []
+
+        def flush():
+            if times:
+                calibrator.add(np.array(times), np.array(depths, dtype=float) * depth_scale,
+                               np.array(pressures, dtype=float) * pressure_scale)
+                times.clear(), depths.clear(), pressures.clear()
+
+        last_time = None
+        for record in reader:
+            try:
+                t, d, p = record[time_col].strip(), record[depth_col].strip(), record[pressure_col].strip()
+            except IndexError:
+                continue
+            if not t or not d:
+                continue
+            dive = record[dive_col] if dive_col is not None else None
+            who = (record[diver_col].strip() if diver_col is not None else "") or diver
+            seconds = _parse_time(t) if ":" in t else float(t) * time_scale   # mm:ss is always clock time
+            new_dive = (who, dive) != key or (dive_col is None and last_time is not None and seconds < last_time)
+            last_time = seconds
+            if new_dive:
+                flush()
+                calibrator.start_dive(who, cuft_per_psi)
+                key = (who, dive)
+            times.append(seconds)
+            depths.append(d)
+            pressures.append(p or "nan")
+            if len(times) >= chunk_rows:
+                flush()
+        flush()
+        calibrator.end_dive()
+
+
+def _is_metric(header):
+    h = header.lower()
+    return "(m)" in h or "[m]" in h or h.endswith(" m") or "metre" in h or "meter" in h
+
+
+# --- UDDF ---
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_uddf(calibrator, file_path, cuft_per_psi, diver=None, chunk_rows=CHUNK_ROWS):
+    """Stream a UDDF file into ``calibrator``.
+
+    UDDF is SI: depth in m, time in s, tank pressure in Pa.  The owner's name
+    is the diver; a dive's ``tankvolume`` (m^3 water volume) replaces the
+    default cylinder.  Waypoints and dives are dropped from the tree as soon
+    as they are read.
+    """
+    name = diver or os.path.splitext(os.path.basename(file_path))[0]
+    seconds, depth, pressure = [], [], []
+    parents = []
+    tank_volume = None
+    dive_started = False
+
+    def flush():
+        if seconds:
+            calibrator.add(np.array(seconds), np.array(depth) * FEET_PER_METRE, np.array(pressure) / PA_PER_PSI)
+            seconds.clear(), depth.clear(), pressure.clear()
+
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        tag = _local(elem.tag)
+        if tag == "waypoint":
+            values = {}
+            for child in elem:
+                key = _local(child.tag)
+                if key in ("divetime", "depth", "tankpressure") and key not in values and child.text:
+                    values[key] = float(child.text)   # first tank's pressure when there are several
+            if "divetime" in values and "depth" in values:
+                if not dive_started:
+                    factor = tank_volume * CUFT_PER_M3 / SURFACE_PSI if tank_volume else cuft_per_psi
+                    calibrator.start_dive(name, factor)
+                    dive_started = True
+                seconds.append(values["divetime"])
+                depth.append(values["depth"])
+                pressure.append(values.get("tankpressure", np.nan))
+                if len(seconds) >= chunk_rows:
+                    flush()
+            parents[-1].remove(elem)
+        elif tag == "tankdata" and tank_volume is None:
+            for child in elem:
+                if _local(child.tag) == "tankvolume" and child.text:
+                    tank_volume = float(child.text)
+        elif tag == "owner" and not diver:
+            names = [e.text.strip() for e in elem.iter() if _local(e.tag) in ("firstname", "lastname") and e.text]
+            name = " ".join(names) or name
+        elif tag == "dive":
+            flush()
+            calibrator.end_dive()
+            tank_volume, dive_started = None, False
+            parents[-1].remove(elem)
+
+
+def calibrate(paths, cylinder=DEFAULT_CYLINDER, window=WINDOW_SECONDS, progress=None):
+    """Read every log; returns {diver: summary} (see ``DiverStats.summary``).
+
+    ``cylinder`` (a ``team.CATALOG`` name) converts PSI to CUFT wherever the
+    log does not give the tank volume.
+    """
+    try:
+        spec = team.CATALOG[cylinder]
+    except KeyError:
+        raise ValueError(f"Unknown cylinder {cylinder!r}; use a catalog name such as AL80 or Double HP100") from None
+    cuft_per_psi = spec.cuft / spec.psi
+    calibrator = Calibrator(window)
+    for i, path in enumerate(paths):
+        if os.path.splitext(path)[1].lower() in (".uddf", ".xml"):
+            read_uddf(calibrator, path, cuft_per_psi)
+        else:
+            read_csv(calibrator, path, cuft_per_psi)
+        if progress:
+            progress(i + 1, len(paths))
+    return calibrator.summary()
+
+
+def fill_plan(plan, summary):
+    """Pre-fill SAC columns from one diver's summary: Bottom Gas rows, the Deco Gas stop
+    rows that have a depth and Emergency Rows 1-2.  Blank (uncalibrated) values are skipped."""
+    plan = engine.normalize_plan(plan)
+    deco_rows = [row for row in plan[DECO_GAS][:-1] if row[DEPTH].strip()]
+    for rows, value in ((plan[BOTTOM_GAS], summary["sac"]), (deco_rows, summary["deco_sac"]),
+                        (plan[EMERGENCY][:2], summary["emergency_sac"])):
+        if value != value:
+            continue
+        for row in rows:
+            row[SAC] = f"{value:.2f}"
+    return plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dive_log", description="Calibrate SAC values from dive-computer logs.")
+    parser.add_argument("logs", nargs="+", help="CSV or UDDF files")
+    parser.add_argument("--cylinder", default=DEFAULT_CYLINDER,
+                        help=f"back-gas cylinder for logs without a tank volume (default: {DEFAULT_CYLINDER})")
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS, help="SAC window in seconds")
+    args = parser.parse_args(argv)
+    try:
+        summary = calibrate(args.logs, args.cylinder, args.window)
+    except (OSError, ValueError, ET.ParseError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    json.dump(summary, sys.stdout, indent=4)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
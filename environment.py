@@ -0,0 +1,124 @@
+"""Dive environment: water, surface altitude and depth units.
+
+Every depth -> pressure conversion on the sheet goes through an ``Environment``.
+Pressure is ``surface_ata + depth / depth_per_atm``: 33 ft of sea water per
+atmosphere (the sheet's original rule), proportionally more in fresh water,
+with the surface pressure from the standard atmosphere at the altitude.  The
+default (salt water, sea level, feet) gives exactly the old ``depth / 33 + 1``.
+
+``from_fields`` returns one shared instance per setting, so the rounded ATAs
+an environment memoises (``sheet_ata``) survive switching back and forth.
+Needs only NumPy.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+SALT, FRESH = "salt", "fresh"
+FEET, METRES = "ft", "m"
+
+WATER_DENSITY = {SALT: 1.025, FRESH: 1.000}   # kg/L
+FEET_PER_ATM = 33          # of sea water
+METRES_PER_FOOT = 0.3048
+ATA_MEMO_SIZE = 4096       # rounded ATAs kept per environment
+
+# Deco geometry per depth unit
+STOP_INTERVAL = {FEET: 10, METRES: 3}
+LAST_STOP = {FEET: 20, METRES: 6}
+ASCENT_RATE = {FEET: 30, METRES: 9}      # per minute
+DESCENT_RATE = {FEET: 60, METRES: 18}    # per minute
+
+
+def surface_ata(altitude_m):
+    """Standard-atmosphere surface pressure in ATA at an altitude in metres (1 at sea level)."""
+    return (1 - 2.25577e-5 * altitude_m) ** 5.25588
+
+
+class Environment:
+    def __init__(self, water=SALT, altitude=0.0, units=FEET):
+        if water not in WATER_DENSITY:
+            raise ValueError(f"Water should be {SALT} or {FRESH}, got {water!r}")
+        if units not in STOP_INTERVAL:
+            raise ValueError(f"Depth units should be {FEET} or {METRES}, got {units!r}")
+        self.water = water
+        self.altitude = float(altitude)     # in ``units``
+        self.units = units
+        to_feet = 1 / METRES_PER_FOOT if units == METRES else 1
+        self.depth_per_atm = FEET_PER_ATM * (WATER_DENSITY[SALT] / WATER_DENSITY[water]) / to_feet
+        altitude_m = self.altitude * METRES_PER_FOOT * to_feet
+        if not -500 <= altitude_m <= 6000:
+            raise ValueError(f"Altitude {self.altitude:g} {units} is out of range")
+        self.surface_ata = surface_ata(altitude_m)
+        self.stop_interval = STOP_INTERVAL[units]
+        self.last_stop = LAST_STOP[units]
+        self.ascent_rate = ASCENT_RATE[units]
+        self.descent_rate = DESCENT_RATE[units]
+        self._ata = {}
+
+    @property
+    def key(self):
+        return self.water, self.altitude, self.units
+
+    def __eq__(self, other):
+        return isinstance(other, Environment) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"Environment({self.water!r}, {self.altitude:g}, {self.units!r})"
+
+    def depth_to_ata(self, depth):
+        """Absolute pressure in ATA at ``depth`` (scalar or array)."""
+        return np.asarray(depth, dtype=float) / self.depth_per_atm + self.surface_ata
+
+    def ata_to_depth(self, ata):
+        return (np.asarray(ata, dtype=float) - self.surface_ata) * self.depth_per_atm
+
+    def sheet_ata(self, depth):
+        """ATA at a scalar depth, rounded to 2 decimals as the sheet shows it (memoised)."""
+        try:
+            return self._ata[depth]
+        except KeyError:
+            if len(self._ata) >= ATA_MEMO_SIZE:
+                self._ata.clear()
+            value = self._ata[depth] = float(np.round(self.depth_to_ata(depth), 2))
+            return value
+
+
+def parse_water(text):
+    t = (text or "").strip().lower()
+    if not t or t[0] == "s":
+        return SALT
+    if t[0] == "f":
+        return FRESH
+    raise ValueError(f"Water should be Salt or Fresh, got {text!r}")
+
+
+def parse_units(text):
+    t = (text or "").strip().lower()
+    if not t or t[0] in "fi":      # ft, feet, imperial
+        return FEET
+    if t[0] == "m":                # m, metres, metric
+        return METRES
+    raise ValueError(f"Depth Units should be ft or m, got {text!r}")
+
+
+@lru_cache(maxsize=64)
+def from_fields(water="", altitude="", units=""):
+    """The Environment for the sheet's Environment fields (blank: salt water, sea level, feet)."""
+    try:
+        height = float(altitude) if (altitude or "").strip() else 0.0
+    except ValueError:
+        raise ValueError(f"Altitude should be a number, got {altitude!r}") from None
+    return Environment(parse_water(water), height, parse_units(units))
+
+
+DEFAULT = from_fields()
+
+
+def convert_depth(depth, units, to_units):
+    """A depth (or altitude) in ``units`` expressed in ``to_units``."""
+    if units == to_units:
+        return depth
+    return depth / METRES_PER_FOOT if units == METRES else depth * METRES_PER_FOOT
@@ -0,0 +1,386 @@
+"""Headless gas-calculation engine for the Tec40-45 Gas Planning Sheet.
+
+Plans use the same section layout that ``GasPlanningApp.save_to_json`` writes:
+entry rows are flat lists of strings and tables are lists of row lists.  All
+derived fields are evaluated in one NumPy-batched pass over any number of plans,
+so the same math runs in the GUI, in CI and on a headless server.  Depths are
+converted to pressure with each plan's Environment section (``environment.py``).
+"""
+from functools import lru_cache
+
+import numpy as np
+
+import environment
+import oxygen
+
+# --- Plan layout (shared with the GUI) ---
+GENERAL_INFO = "General Info"
+ENVIRONMENT = "Environment"
+RESERVE = "Gas Reserve / Rock Bottom"
+EMERGENCY = "Gas Reserve (Emergency)"
+BOTTOM_GAS = "Bottom Gas Requirements"
+DECO_STOPS = "Deco Stops"
+DECO_GAS = "Deco Gas Requirements"
+
+GENERAL_INFO_LABELS = ["Max Depth", "Gas Mix", "Bottom Time", "Gradient Factor (Lo/Hi)",
+                       "Total Back Gas Req (CUFT/PSI)", "Deco Gas Req (CUFT)",
+                       "CNS % (Total)", "OTU (Total)", "O2 Warnings"]
+# Depth Units only change depths: SAC and gas volumes stay in CUFT, pressures in PSI
+ENVIRONMENT_LABELS = ["Water (Salt/Fresh)", "Altitude", "Depth Units (ft/m; gas in CUFT)"]
+RESERVE_LABELS = ["First Gas Switch Depth", "Gas Reserve Volume For Two Divers (CUFT)",
+                  "Rock Bottom Pressure (PSI) [Total/Per Tank]"]
+GAS_HEADERS = ["Depth", "ATA", "SAC", "Time", "Gas Volume", "ppO2", "CNS %", "OTU"]
+EMERGENCY_HEADERS = ["Depth", "ATA", "Emergency SAC", "Time", "Gas Volume"]
+DECO_STOP_HEADERS = ["Depth", "Time"]
+
+DEFAULT_DECO_DEPTHS = ["70", "60", "50", "40", "30", "20"]
+DEFAULT_DECO_ATAS = ["3.1", "2.8", "2.5", "2.2", "1.9", "1.6"]
+DEFAULT_DECO_SAC = [".6", ".6", ".6", ".6", ".6", ".6"]
+
+# section -> labels for entry rows, (headers, default rows) for tables.  Bottom Gas and
+# Deco Stops can grow (multi-level bottoms, long stop lists); Deco Gas always has one
+# row per deco stop plus the total as its last row.
+ENTRY_ROWS = {
+    GENERAL_INFO: GENERAL_INFO_LABELS,
+    ENVIRONMENT: ENVIRONMENT_LABELS,
+    RESERVE: RESERVE_LABELS,
+}
+TABLES = {
+    EMERGENCY: (EMERGENCY_HEADERS, 3),
+    BOTTOM_GAS: (GAS_HEADERS, 1),
+    DECO_STOPS: (DECO_STOP_HEADERS, 6),
+    DECO_GAS: (GAS_HEADERS, 7),
+}
+SECTION_ORDER = [GENERAL_INFO, ENVIRONMENT, RESERVE, EMERGENCY, BOTTOM_GAS, DECO_STOPS, DECO_GAS]
+
+# Column indexes shared by the gas tables; Bottom Gas and Deco Gas also track oxygen
+DEPTH, ATA, SAC, TIME, GAS = range(5)
+PPO2, CNS, OTU = range(5, 8)
+# General Info fields filled from the oxygen columns
+CNS_TOTAL, OTU_TOTAL, O2_WARNINGS = range(6, 9)
+# Environment fields
+WATER, ALTITUDE, DEPTH_UNITS = range(3)
+N_STOPS = 6
+
+MIDPOINT_PLACEHOLDER = "(A)"
+ROW3_TIME_LABEL = "Total Per Diver"
+DECO_TOTAL_LABEL = "Total"
+
+NAN = float("nan")
+
+# plans_to_arrays keys: each plan's Gas Mix as oxygen fractions, bottom gas first (NaN padded),
+# and its environment's pressure at the surface and depth per atmosphere (NaN if it doesn't parse)
+GAS_MIX_FO2 = "Gas Mix fO2"
+SURFACE_ATA = "Surface ATA"
+DEPTH_PER_ATM = "Depth per ATM"
+
+
+def depth_to_ata(depth, env=environment.DEFAULT):
+    """Absolute pressure in ATA for a depth (scalar or array); feet of sea water by default."""
+    return env.depth_to_ata(depth)
+
+
+def _batch_ata(depth, surface, per_atm):
+    # depth is (plans, ...); surface / per_atm hold one value per plan
+    shape = (-1,) + (1,) * (depth.ndim - 1)
+    return depth / per_atm.reshape(shape) + surface.reshape(shape)
+
+
+def gas_volume(ata, sac, time):
+    """ATA x SAC x Time, using the ATA as displayed on the sheet (2 decimals)."""
+    return np.round(ata, 2) * sac * time
+
+
+def _nan_total(values, axis=-1):
+    # Sum that stays blank (NaN) when every addend is blank
+    total = np.nansum(values, axis=axis)
+    return np.where(np.isnan(values).all(axis=axis), np.nan, total)
+
+
+def to_float(text):
+    if not text:
+        return NAN
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return NAN
+
+
+@lru_cache(maxsize=256)
+def mix_fo2(text):
+    """Oxygen fractions of a Gas Mix field (blank is Air), or () if it doesn't parse."""
+    from deco_engine import parse_gas_list  # deco_engine imports this module
+    try:
+        return tuple(fo2 for fo2, _ in parse_gas_list(text or "Air"))
+    except ValueError:
+        return ()
+
+
+def plan_environment(plan):
+    """The plan's ``environment.Environment``; raises ValueError if a field doesn't parse."""
+    fields = list(plan.get(ENVIRONMENT) or [])[:len(ENVIRONMENT_LABELS)]
+    return environment.from_fields(*fields)
+
+
+def convert_depth_units(plan, units):
+    """A copy of ``plan`` with its depths and altitude converted to ``units`` ("ft" or "m").
+
+    Deco stop depths are snapped to the new stop interval; other depths keep one decimal.
+    """
+    plan = normalize_plan(plan)
+    old = environment.parse_units(plan[ENVIRONMENT][DEPTH_UNITS])
+    plan[ENVIRONMENT][DEPTH_UNITS] = units
+    interval = environment.STOP_INTERVAL[units]
+
+    def convert(text, step=None):
+        value = to_float(text)
+        if value != value or old == units:
+            return text
+        value = environment.convert_depth(value, old, units)
+        return f"{round(value / step) * step:g}" if step else f"{round(value, 1):g}"
+    cells = [(plan[GENERAL_INFO], 0), (plan[ENVIRONMENT], ALTITUDE), (plan[RESERVE], 0),
+             (plan[EMERGENCY][0], DEPTH), (plan[EMERGENCY][2], DEPTH)]
+    cells += [(row, DEPTH) for row in plan[BOTTOM_GAS]]
+    for values, i in cells:
+        values[i] = convert(values[i])
+    for row in plan[DECO_STOPS] + plan[DECO_GAS][:-1]:
+        row[DEPTH] = convert(row[DEPTH], interval)
+    return plan
+
+
+def table_sizes(data):
+    """(Bottom Gas rows, deco stops) of a plan, never below the sheet's defaults."""
+    bottom = data.get(BOTTOM_GAS) or []
+    stops = data.get(DECO_STOPS) or []
+    deco = data.get(DECO_GAS) or []
+    return max(TABLES[BOTTOM_GAS][1], len(bottom)), max(N_STOPS, len(stops), len(deco) - 1)
+
+
+def empty_plan(stops=N_STOPS, bottom_rows=1):
+    rows = {BOTTOM_GAS: bottom_rows, DECO_STOPS: stops, DECO_GAS: stops + 1}
+    plan = {}
+    for section in SECTION_ORDER:
+        if section in ENTRY_ROWS:
+            plan[section] = [""] * len(ENTRY_ROWS[section])
+        else:
+            headers, default_rows = TABLES[section]
+            plan[section] = [[""] * len(headers) for _ in range(rows.get(section, default_rows))]
+    for i in range(stops):
+        if i < N_STOPS:
+            plan[DECO_STOPS][i][DEPTH] = DEFAULT_DECO_DEPTHS[i]
+            plan[DECO_GAS][i][DEPTH] = DEFAULT_DECO_DEPTHS[i]
+            plan[DECO_GAS][i][ATA] = DEFAULT_DECO_ATAS[i]
+        plan[DECO_GAS][i][SAC] = DEFAULT_DECO_SAC[min(i, N_STOPS - 1)]
+    plan[DECO_GAS][stops][TIME] = DECO_TOTAL_LABEL
+    plan[EMERGENCY][1][DEPTH] = MIDPOINT_PLACEHOLDER
+    plan[EMERGENCY][2][TIME] = ROW3_TIME_LABEL
+    return plan
+
+
+def normalize_plan(data, stops=None, bottom_rows=None):
+    """Return a full-size copy of ``data``; missing sections/cells are filled from ``empty_plan``.
+
+    Tables keep the plan's own row counts unless ``stops`` / ``bottom_rows`` resize
+    them (rows are added blank or dropped from the end; the Deco Gas total stays last).
+    """
+    data_bottom, data_stops = table_sizes(data)
+    plan = empty_plan(stops or data_stops, bottom_rows or data_bottom)
+    for section in SECTION_ORDER:
+        values = data.get(section)
+        if not values:
+            continue
+        if section in ENTRY_ROWS:
+            for i, v in enumerate(values[:len(plan[section])]):
+                plan[section][i] = "" if v is None else str(v)
+            continue
+        if section == DECO_GAS and len(values) == data_stops + 1:
+            rows = list(zip(plan[section][:-1], values[:-1])) + [(plan[section][-1], values[-1])]
+        else:
+            rows = zip(plan[section], values)
+        for row, row_values in rows:
+            for i, v in enumerate(row_values[:len(row)]):
+                row[i] = "" if v is None else str(v)
+    return plan
+
+
+def _padded_rows(plan, section, rows):
+    # Blank rows up to ``rows`` so plans of different sizes share one array; Deco Gas keeps its total last
+    values = plan[section]
+    if len(values) == rows:
+        return values
+    padding = [[""] * len(values[0])] * (rows - len(values))
+    return values[:-1] + padding + values[-1:] if section == DECO_GAS else values + padding
+
+
+def plans_to_arrays(plans):
+    """Parse N plans into float arrays per section (NaN where a cell is not numeric).
+
+    Tables are padded with blank rows to the largest plan in the batch.
+    """
+    stops = max(len(plan[DECO_STOPS]) for plan in plans)
+    rows = {
+        EMERGENCY: TABLES[EMERGENCY][1],
+        BOTTOM_GAS: max(len(plan[BOTTOM_GAS]) for plan in plans),
+        DECO_STOPS: stops,
+        DECO_GAS: stops + 1,
+    }
+    arrays = {}
+    for section in SECTION_ORDER:
+        if section in ENTRY_ROWS:
+            flat = [to_float(v) for plan in plans for v in plan[section]]
+            arrays[section] = np.array(flat, dtype=float).reshape(len(plans), len(ENTRY_ROWS[section]))
+            continue
+        # The oxygen columns are always derived, so they start blank instead of being parsed
+        width = len(TABLES[section][0])
+        parsed = min(width, PPO2)
+        flat = [to_float(v) for plan in plans for row in _padded_rows(plan, section, rows[section])
+                for v in row[:parsed]]
+        values = np.array(flat, dtype=float).reshape(len(plans), rows[section], parsed)
+        blank = np.full(values.shape[:2] + (width - parsed,), NAN)
+        arrays[section] = np.concatenate([values, blank], axis=2)
+    mixes = [mix_fo2(plan[GENERAL_INFO][1]) for plan in plans]
+    width = max(1, max(len(m) for m in mixes))
+    arrays[GAS_MIX_FO2] = np.array([m + (NAN,) * (width - len(m)) for m in mixes], dtype=float)
+    pressures = []
+    for plan in plans:
+        try:
+            env = plan_environment(plan)
+            pressures.append((env.surface_ata, env.depth_per_atm))
+        except ValueError:
+            pressures.append((NAN, NAN))
+    arrays[SURFACE_ATA], arrays[DEPTH_PER_ATM] = np.array(pressures, dtype=float).reshape(len(plans), 2).T.copy()
+    return arrays
+
+
+def evaluate_reserve(out):
+    """Fill Gas Reserve (Emergency) and the two-diver reserve of ``out`` in place."""
+    surface, per_atm = out[SURFACE_ATA], out[DEPTH_PER_ATM]
+    max_depth = out[GENERAL_INFO][:, 0]
+    first_gas = out[RESERVE][:, 0]
+
+    # Max Depth -> Row 1, First Gas Switch -> Row 3, midpoint -> Row 2
+    em = out[EMERGENCY]
+    em[:, 0, DEPTH] = np.where(np.isnan(max_depth), em[:, 0, DEPTH], max_depth)
+    em[:, 2, DEPTH] = np.where(np.isnan(first_gas), em[:, 2, DEPTH], first_gas)
+    em[:, 1, DEPTH] = np.round((em[:, 0, DEPTH] + em[:, 2, DEPTH]) / 2, 1)
+    em[:, :, ATA] = np.round(_batch_ata(em[:, :, DEPTH], surface, per_atm), 2)
+    em[:, :2, GAS] = np.round(gas_volume(em[:, :2, ATA], em[:, :2, SAC], em[:, :2, TIME]), 1)
+    em[:, 2, GAS] = np.round(_nan_total(em[:, :2, GAS]), 1)
+    out[RESERVE][:, 1] = np.round(em[:, 2, GAS] * 2, 1)
+
+
+def evaluate_bottom_gas(out):
+    """Fill the ATA and Gas Volume columns of Bottom Gas Requirements in ``out`` in place."""
+    bottom = out[BOTTOM_GAS]
+    bottom[..., ATA] = np.round(_batch_ata(bottom[..., DEPTH], out[SURFACE_ATA], out[DEPTH_PER_ATM]), 2)
+    bottom[..., GAS] = np.round(gas_volume(bottom[..., ATA], bottom[..., SAC], bottom[..., TIME]), 2)
+
+
+def evaluate(arrays):
+    """Evaluate every derived field for a batch of plans.
+
+    Takes the output of ``plans_to_arrays`` and returns new arrays of the same
+    shape with the derived cells filled in.  Blank results are NaN.
+    """
+    out = {section: values.copy() for section, values in arrays.items()}
+    surface, per_atm = out[SURFACE_ATA], out[DEPTH_PER_ATM]
+    evaluate_reserve(out)
+    evaluate_bottom_gas(out)
+    bottom = out[BOTTOM_GAS]
+
+    # Deco Gas Requirements: times mirror Deco Stops, last row is the total
+    deco = out[DECO_GAS]
+    stops = deco[:, :-1]
+    stops[..., TIME] = out[DECO_STOPS][:, :, 1]
+    stops[..., ATA] = np.round(_batch_ata(stops[..., DEPTH], surface, per_atm), 2)
+    stops[..., GAS] = np.round(gas_volume(stops[..., ATA], stops[..., SAC], stops[..., TIME]), 2)
+    deco[:, -1, GAS] = np.round(_nan_total(stops[..., GAS]), 2)
+
+    # Oxygen exposure: bottom rows breathe the bottom gas, deco rows the gas Calculate Deco
+    # would switch to at that depth; ppO2 uses the ATA as displayed.  Bottom and deco
+    # segments are evaluated together.
+    fo2 = out[GAS_MIX_FO2][:, None, :]
+    switch_ata = _batch_ata(stops[..., DEPTH], surface, per_atm)
+    breathing = np.concatenate([np.broadcast_to(fo2[..., 0], bottom.shape[:2]),
+                                oxygen.breathing_fo2(fo2, switch_ata)], axis=1)
+    segments = np.concatenate([bottom, stops], axis=1)
+    segments[..., PPO2] = np.round(breathing * segments[..., ATA], 2)
+    segments[..., CNS], segments[..., OTU] = oxygen.exposure(segments[..., PPO2], segments[..., TIME])
+    segments[..., CNS:OTU + 1] = np.round(segments[..., CNS:OTU + 1], 1)
+    n_bottom = bottom.shape[1]
+    bottom[..., PPO2:] = segments[:, :n_bottom, PPO2:]
+    stops[..., PPO2:] = segments[:, n_bottom:, PPO2:]
+    deco[:, -1, CNS:OTU + 1] = np.round(_nan_total(stops[..., CNS:OTU + 1], axis=1), 1)
+    totals = np.concatenate([bottom[..., CNS:OTU + 1], deco[:, -1:, CNS:OTU + 1]], axis=1)
+    out[GENERAL_INFO][:, [CNS_TOTAL, OTU_TOTAL]] = np.round(_nan_total(totals, axis=1), 1)
+    return out
+
+
+def format_value(value, decimals, missing=""):
+    if value != value:  # NaN
+        return missing
+    return f"{value:.{decimals}f}"
+
+
+def _isnan(value):
+    return value != value
+
+
+def _write_oxygen(row, a_row):
+    row[PPO2] = format_value(a_row[PPO2], 2)
+    row[CNS] = format_value(a_row[CNS], 1)
+    row[OTU] = format_value(a_row[OTU], 1)
+
+
+def arrays_to_plans(plans, arrays):
+    """Write the derived cells of ``arrays`` (from ``evaluate``) back into ``plans`` in place."""
+    a_reserve = arrays[RESERVE][:, 1].tolist()
+    a_ems, a_bottoms, a_decos = (arrays[s].tolist() for s in (EMERGENCY, BOTTOM_GAS, DECO_GAS))
+    a_info = arrays[GENERAL_INFO][:, [CNS_TOTAL, OTU_TOTAL]].tolist()
+    bottom_ppo2 = oxygen.max_ppo2(arrays[BOTTOM_GAS][..., PPO2], arrays[BOTTOM_GAS][..., TIME]).tolist()
+    deco_ppo2 = oxygen.max_ppo2(arrays[DECO_GAS][:, :-1, PPO2], arrays[DECO_GAS][:, :-1, TIME]).tolist()
+    for plan, two_divers, a_em, a_bottom, a_deco, (cns, otu), b_ppo2, d_ppo2 in zip(
+            plans, a_reserve, a_ems, a_bottoms, a_decos, a_info, bottom_ppo2, deco_ppo2):
+        info, reserve = plan[GENERAL_INFO], plan[RESERVE]
+        em, bottom, stops, deco = plan[EMERGENCY], plan[BOTTOM_GAS], plan[DECO_STOPS], plan[DECO_GAS]
+
+        # Depths are mirrored as typed
+        if not _isnan(to_float(info[0])):
+            em[0][DEPTH] = info[0]
+        if not _isnan(to_float(reserve[0])):
+            em[2][DEPTH] = reserve[0]
+        em[1][DEPTH] = format_value(a_em[1][DEPTH], 1, MIDPOINT_PLACEHOLDER)
+        for r in range(3):
+            em[r][ATA] = format_value(a_em[r][ATA], 2)
+            em[r][GAS] = format_value(a_em[r][GAS], 1)
+        reserve[1] = format_value(two_divers, 1)
+
+        for row, a_row in zip(bottom, a_bottom):
+            row[ATA] = format_value(a_row[ATA], 2)
+            row[GAS] = format_value(a_row[GAS], 2)
+            _write_oxygen(row, a_row)
+
+        for r in range(len(stops)):
+            deco[r][TIME] = stops[r][1]
+            deco[r][ATA] = format_value(a_deco[r][ATA], 2)
+            deco[r][GAS] = format_value(a_deco[r][GAS], 2)
+            _write_oxygen(deco[r], a_deco[r])
+        deco[-1][GAS] = format_value(a_deco[-1][GAS], 2)
+        deco[-1][CNS] = format_value(a_deco[-1][CNS], 1)
+        deco[-1][OTU] = format_value(a_deco[-1][OTU], 1)
+        info[CNS_TOTAL] = format_value(cns, 1)
+        info[OTU_TOTAL] = format_value(otu, 1)
+        info[O2_WARNINGS] = oxygen.warnings(cns, otu, b_ppo2, d_ppo2)
+    return plans
+
+
+def recompute_plans(plans):
+    """Recompute every derived field for a list of plans in one batched pass."""
+    plans = [normalize_plan(p) for p in plans]
+    if not plans:
+        return []
+    return arrays_to_plans(plans, evaluate(plans_to_arrays(plans)))
+
+
+def recompute_plan(plan):
+    return recompute_plans([plan])[0]
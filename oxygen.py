@@ -0,0 +1,81 @@
+"""Oxygen exposure: CNS % and OTU per segment.
+
+CNS % uses the NOAA single-exposure limits (minutes allowed at each ppO2),
+interpolated linearly in rate and extrapolated above 1.6; OTU is
+``((ppO2 - 0.5) / 0.5) ** 0.83`` per minute.  Nothing accrues at or below
+0.5 ATA.  Both rates are tabulated once on a fine ppO2 grid, so a batch of
+segments is two ``np.interp`` lookups.  Needs only NumPy.
+"""
+import numpy as np
+
+MAX_PPO2 = 1.6       # deco gas switch limit
+BOTTOM_PPO2 = 1.4    # working limit for bottom segments
+CNS_WARNING = 80     # %
+CNS_LIMIT = 100      # %
+OTU_WARNING = 300    # single-day limit
+
+# ppO2 (ATA) -> single-exposure limit (minutes)
+NOAA_CNS_LIMITS = [(0.6, 720), (0.7, 570), (0.8, 450), (0.9, 360), (1.0, 300), (1.1, 240),
+                   (1.2, 210), (1.3, 180), (1.4, 150), (1.5, 120), (1.6, 45)]
+
+PPO2_STEP = 0.005
+PPO2_MAX = 3.0       # lookups clamp to the last rate above this
+
+
+def _tables():
+    grid = np.round(np.arange(0, PPO2_MAX + PPO2_STEP / 2, PPO2_STEP), 3)
+    points = np.array([0.5] + [p for p, _ in NOAA_CNS_LIMITS])
+    rates = np.array([0.0] + [100 / limit for _, limit in NOAA_CNS_LIMITS])
+    slope = (rates[-1] - rates[-2]) / (points[-1] - points[-2])
+    cns = np.interp(grid, points, rates)
+    cns = np.where(grid > points[-1], rates[-1] + slope * (grid - points[-1]), cns)
+    otu = np.where(grid > 0.5, (np.maximum(grid - 0.5, 0) / 0.5) ** 0.83, 0.0)
+    return grid, cns, otu
+
+
+PPO2_GRID, CNS_RATE, OTU_RATE = _tables()   # % per minute, OTU per minute
+
+
+def exposure(ppo2, minutes):
+    """(CNS %, OTU) for segments at ``ppo2`` lasting ``minutes`` (arrays; NaN stays NaN)."""
+    ppo2 = np.asarray(ppo2, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+    return (np.interp(ppo2, PPO2_GRID, CNS_RATE) * minutes,
+            np.interp(ppo2, PPO2_GRID, OTU_RATE) * minutes)
+
+
+def breathing_fo2(fo2, ata):
+    """fO2 breathed at ``ata``: the richest mix whose ppO2 (to one decimal) is within
+    ``MAX_PPO2``, as Calculate Deco switches.  ``fo2`` lists the mixes along its last
+    axis, bottom gas first (always allowed); NaN pads unused slots.
+    """
+    fo2 = np.asarray(fo2, dtype=float)
+    ata = np.asarray(ata, dtype=float)[..., None]
+    deco = fo2[..., 1:]
+    allowed = np.round(deco * ata, 1) <= MAX_PPO2
+    best = np.max(np.where(allowed, deco, -np.inf), axis=-1, initial=-np.inf)
+    return np.maximum(fo2[..., 0], best)
+
+
+def max_ppo2(ppo2, minutes):
+    """Highest ppO2 over the segments that have time (last axis); NaN when there are none."""
+    used = np.where(np.asarray(minutes, dtype=float) > 0, ppo2, np.nan)
+    return np.fmax.reduce(used, axis=-1, initial=np.nan)
+
+
+def warnings(cns, otu, bottom_ppo2, deco_ppo2):
+    """O2 Warnings text for the totals and the highest bottom / deco ppO2 ("" if none)."""
+    found = []
+    # ppO2 is judged to one decimal, like the gas switches (O2 at 20 ft is 1.6)
+    worst = max((p for p in (bottom_ppo2, deco_ppo2) if p == p), default=np.nan)
+    if round(worst, 1) > MAX_PPO2:
+        found.append(f"ppO2 {worst:.2f} over {MAX_PPO2}")
+    elif round(bottom_ppo2, 1) > BOTTOM_PPO2:
+        found.append(f"bottom ppO2 {bottom_ppo2:.2f} over {BOTTOM_PPO2}")
+    if cns >= CNS_LIMIT:
+        found.append(f"CNS {cns:.0f}% over {CNS_LIMIT}%")
+    elif cns >= CNS_WARNING:
+        found.append(f"CNS {cns:.0f}%")
+    if otu >= OTU_WARNING:
+        found.append(f"OTU {otu:.0f} over {OTU_WARNING}")
+    return "; ".join(found)
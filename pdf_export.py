@@ -0,0 +1,139 @@
+"""PDF rendering for plans and sweep tables (no Tk required).
+
+Style objects are built once and reused by every export.  Rendering takes
+optional ``progress(done, total)`` and ``cancel`` (a ``threading.Event``) hooks
+so it can run on a worker thread, and ``write_plans_pdf`` streams any number
+of plans into one document without building all of their flowables up front.
+"""
+import os
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+
+import gas_engine as engine
+
+PAGE_WIDTH = 8.5 * 72 - 40
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def styles():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def table_style():
+    return TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('FONTSIZE', (0,0), (-1,-1), 8),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+        ('TOPPADDING', (0,0), (-1,-1), 1)
+    ])
+
+
+def plan_tables(plan):
+    """[(section, rows)] for a plan in the save_to_json layout, as the GUI exports it."""
+    plan = engine.normalize_plan(plan)
+    tables = []
+    for section in engine.SECTION_ORDER:
+        if section in engine.ENTRY_ROWS:
+            data = [["", ""]] + [[label, value] for label, value in zip(engine.ENTRY_ROWS[section], plan[section])]
+        else:
+            headers, rows = engine.TABLES[section]
+            data = [headers] + plan[section]
+        tables.append((section, data))
+    return tables
+
+
+class SectionEnd(Spacer):
+    """Spacer closing a section; progress counts these because a table split over
+    two pages reaches ``afterFlowable`` once per part."""
+
+
+def table_flowables(tables):
+    elements = []
+    for title, data in tables:
+        elements.append(Paragraph(title, styles()['Heading2']))
+        num_cols = len(data[0])
+        col_width = PAGE_WIDTH / num_cols
+        table = Table(data, colWidths=[col_width]*num_cols, hAlign='LEFT')
+        table.setStyle(table_style())
+        elements.append(table)
+        elements.append(SectionEnd(1, 6))
+    return elements
+
+
+class FlowableStream(list):
+    """Flowable list that ReportLab consumes from the front, refilled lazily
+    from an iterator of flowable chunks (one chunk per plan)."""
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = iter(chunks)
+
+    def __len__(self):
+        while not list.__len__(self):
+            try:
+                self.extend(next(self._chunks))
+            except StopIteration:
+                break
+        return list.__len__(self)
+
+
+class _DocTemplate(SimpleDocTemplate):
+    def __init__(self, filename, total, progress=None, cancel=None):
+        super().__init__(filename, pagesize=letter,
+                         leftMargin=20, rightMargin=20, topMargin=20, bottomMargin=20)
+        self.total, self.done = total, 0
+        self.progress, self.cancel = progress, cancel
+
+    def afterFlowable(self, flowable):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ExportCancelled()
+        if isinstance(flowable, SectionEnd):
+            self.done += 1
+            if self.progress:
+                self.progress(self.done, self.total)
+
+
+def _build(file_path, flowables, total, progress, cancel):
+    doc = _DocTemplate(file_path, total, progress, cancel)
+    try:
+        doc.build(flowables)
+    except ExportCancelled:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+
+def write_pdf(file_path, tables, progress=None, cancel=None):
+    # tables: [(title, rows)], first row is the header row
+    _build(file_path, table_flowables(tables), len(tables), progress, cancel)
+
+
+def write_plans_pdf(file_path, plans, count=None, progress=None, cancel=None):
+    """Stream many plans into one PDF, one plan per page group.
+
+    ``plans`` is an iterable of (title, plan) and is consumed lazily, so it can
+    load each plan from disk as it is needed.  ``count`` is only used for
+    progress reporting.
+    """
+    per_plan = len(engine.SECTION_ORDER)
+
+    def chunks():
+        for i, (title, plan) in enumerate(plans):
+            elements = [PageBreak()] if i else []
+            elements.append(Paragraph(title, styles()['Heading1']))
+            elements.extend(table_flowables(plan_tables(plan)))
+            yield elements
+
+    _build(file_path, FlowableStream(chunks()), (count or 0) * per_plan, progress, cancel)
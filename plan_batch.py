@@ -0,0 +1,172 @@
+"""Batch recompute of saved plans: plan files in (any schema version), recomputed plan files (and PDF) out.
+
+    python plan_batch.py plans/ "archive/**/*.json" --out recomputed --pdf
+    python plan_batch.py plans/ --no-json --combined all_plans.pdf
+
+Runs without Tk.  Files are split into batches that worker processes load,
+recompute with one ``gas_engine.recompute_plans`` call and write back out; a
+bad file only fails itself.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import gas_engine as engine
+import plan_schema
+
+BATCH_SIZE = 32
+
+
+def _inside(path, folder):
+    path = os.path.abspath(path)
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+def find_plans(inputs, exclude=None):
+    """Expand directories (all *.json inside, recursively) and glob patterns.
+
+    Files under ``exclude`` are skipped, so a rerun with the output directory
+    inside the input tree doesn't pick up its own earlier output.
+    """
+    skip = os.path.abspath(exclude) if exclude else None
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*.json"), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True) or [item]
+        paths.extend(sorted(p for p in matches if not (skip and _inside(p, skip))))
+    # Keep first occurrence order, drop duplicates
+    return list(dict.fromkeys(os.path.normpath(p) for p in paths))
+
+
+def _output_path(path, root, out_dir, ext):
+    # Mirror the input layout below ``root`` so same-named files don't collide
+    rel = os.path.relpath(os.path.abspath(path), root)
+    out = os.path.join(out_dir, os.path.splitext(rel)[0] + ext)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    return out
+
+
+def process_batch(paths, root, out_dir, write_json=True, write_pdf=False):
+    """Worker: returns [(path, error message or None)] in input order."""
+    results = {}
+    plans, loaded = [], []
+    for path in paths:
+        try:
+            plans.append(plan_schema.read_plan(path))
+            loaded.append(path)
+        except Exception as exc:
+            results[path] = f"{type(exc).__name__}: {exc}"
+
+    if plans:
+        if write_pdf:
+            from pdf_export import plan_tables, write_pdf as render_pdf
+        try:
+            recomputed = engine.recompute_plans(plans)
+        except Exception:
+            # A plan broke the batched pass: recompute one at a time so only that file fails
+            recomputed = []
+            for path, plan in zip(loaded, plans):
+                try:
+                    recomputed.append(engine.recompute_plan(plan))
+                except Exception as exc:
+                    recomputed.append(None)
+                    results[path] = f"{type(exc).__name__}: {exc}"
+        for path, plan in zip(loaded, recomputed):
+            if plan is None:
+                continue
+            try:
+                if write_json:
+                    plan_schema.write_plan(_output_path(path, root, out_dir, ".json"), plan)
+                if write_pdf:
+                    render_pdf(_output_path(path, root, out_dir, ".pdf"), plan_tables(plan))
+                results[path] = None
+            except Exception as exc:
+                results[path] = f"{type(exc).__name__}: {exc}"
+    return [(path, results[path]) for path in paths]
+
+
+def run(paths, out_dir, write_json=True, write_pdf=False, workers=None, batch_size=BATCH_SIZE,
+        progress=None):
+    """Process ``paths``; returns {path: error or None}.  ``progress(done, total, path, error)``."""
+    os.makedirs(out_dir, exist_ok=True)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else ""
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    results = {}
+
+    def collect(batch_results):
+        for path, error in batch_results:
+            results[path] = error
+            if progress:
+                progress(len(results), len(paths), path, error)
+
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            collect(process_batch(batch, root, out_dir, write_json, write_pdf))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            n = len(batches)
+            for batch_results in pool.map(process_batch, batches, [root] * n, [out_dir] * n,
+                                          [write_json] * n, [write_pdf] * n):
+                collect(batch_results)
+    return results
+
+
+def write_combined_pdf(file_path, paths):
+    from pdf_export import write_plans_pdf
+
+    def plans():
+        # One plan in memory at a time
+        for path in paths:
+            yield path, engine.recompute_plan(plan_schema.read_plan(path))
+
+    write_plans_pdf(file_path, plans(), len(paths))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="plan_batch",
+        description="Recompute saved gas plans and write updated JSON and/or PDF files.")
+    parser.add_argument("inputs", nargs="+", help="plan JSON files, directories or glob patterns")
+    parser.add_argument("-o", "--out", default="batch_output", help="output directory (default: batch_output)")
+    parser.add_argument("--pdf", action="store_true", help="also export each plan to PDF")
+    parser.add_argument("--combined", metavar="PDF", help="also stream every plan into one combined PDF")
+    parser.add_argument("--no-json", action="store_true", help="do not write recomputed JSON")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU, 1 = no pool)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    paths = find_plans(args.inputs, exclude=args.out)
+    if not paths:
+        print("No plan files found", file=sys.stderr)
+        return 2
+    if args.no_json and not (args.pdf or args.combined):
+        parser.error("--no-json needs --pdf or --combined, otherwise nothing is written")
+
+    def progress(done, total, path, error):
+        if error:
+            print(f"[{done}/{total}] FAILED {path}: {error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"[{done}/{total}] {path}", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = run(paths, args.out, write_json=not args.no_json, write_pdf=args.pdf,
+                  workers=args.workers, progress=progress)
+    if args.combined:
+        write_combined_pdf(args.combined, [p for p in paths if not results[p]])
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for error in results.values() if error)
+    rate = len(results) / elapsed if elapsed > 0 else float("inf")
+    print(f"{len(results) - failed} of {len(results)} plans processed, {failed} failed, "
+          f"{elapsed:.2f} s ({rate:.1f} plans/sec)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
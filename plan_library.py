@@ -0,0 +1,236 @@
+"""Local plan library: saved plans indexed in SQLite.
+
+Every plan is stored whole, as a versioned ``plan_schema`` document so stored
+plans migrate like saved files, next to the indexed columns used for
+searching: Max Depth, Gas Mix (with its O2/He fractions), Bottom Time,
+GF Lo/Hi, total back gas and deco gas.  Max Depth is indexed in feet whatever
+the plan's Depth Units, so metric and imperial plans search and sort
+together; ``depth_units`` keeps the plan's own units for display.
+"""
+import json
+import os
+import sqlite3
+import time
+
+import environment
+import gas_engine as engine
+import deco_engine
+import plan_schema
+from gas_engine import BOTTOM_GAS, DECO_GAS, GAS
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".tec_gas_planning", "plans.db")
+SEARCH_LIMIT = 500
+IMPORT_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT UNIQUE,
+    saved_at REAL NOT NULL,
+    max_depth REAL,
+    depth_units TEXT,
+    gas_mix TEXT,
+    fo2 REAL,
+    fhe REAL,
+    bottom_time REAL,
+    gf_lo REAL,
+    gf_hi REAL,
+    total_gas REAL,
+    deco_gas REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_depth ON plans (max_depth, bottom_time);
+CREATE INDEX IF NOT EXISTS plans_gas ON plans (fhe, fo2);
+CREATE INDEX IF NOT EXISTS plans_gf ON plans (gf_lo, gf_hi);
+CREATE INDEX IF NOT EXISTS plans_total ON plans (total_gas);
+"""
+
+COLUMNS = ["name", "source", "saved_at", "max_depth", "depth_units", "gas_mix", "fo2", "fhe", "bottom_time",
+           "gf_lo", "gf_hi", "total_gas", "deco_gas", "data"]
+# Re-saving or re-importing the same file updates its row and keeps its id
+INSERT = (f"INSERT INTO plans ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+          f"ON CONFLICT (source) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in COLUMNS if c != 'source')}")
+SUMMARY_COLUMNS = ["id", "name", "max_depth", "depth_units", "gas_mix", "bottom_time", "gf_lo", "gf_hi", "total_gas", "deco_gas"]
+
+
+def _number(value):
+    value = engine.to_float(value)
+    return None if value != value else value
+
+
+def plan_units(plan):
+    try:
+        return environment.parse_units(plan[engine.ENVIRONMENT][engine.DEPTH_UNITS])
+    except ValueError:
+        return environment.FEET
+
+
+def index_values(plan):
+    """Indexed column values for a recomputed plan (None where a field is blank or unparsable)."""
+    info = plan[engine.GENERAL_INFO]
+    units = plan_units(plan)
+    max_depth = _number(info[0])
+    if max_depth is not None:
+        max_depth = environment.convert_depth(max_depth, units, environment.FEET)
+    try:
+        fo2, fhe = deco_engine.parse_gas_list(info[1])[0]
+    except ValueError:
+        fo2 = fhe = None
+    try:
+        gf_lo, gf_hi = (round(gf * 100) for gf in deco_engine.parse_gradient_factors(info[3]))
+    except ValueError:
+        gf_lo = gf_hi = None
+    # Total back gas: the typed value if numeric, else bottom gas (all rows) + two-diver reserve
+    total = _number(info[4].split("/")[0])
+    if total is None:
+        parts = [_number(row[GAS]) for row in plan[BOTTOM_GAS]] + [_number(plan[engine.RESERVE][1])]
+        parts = [p for p in parts if p is not None]
+        total = sum(parts) if parts else None
+    return {
+        "max_depth": max_depth,
+        "depth_units": units,
+        "gas_mix": info[1].strip(),
+        "fo2": fo2,
+        "fhe": fhe,
+        "bottom_time": _number(info[2]),
+        "gf_lo": gf_lo,
+        "gf_hi": gf_hi,
+        "total_gas": total,
+        "deco_gas": _number(plan[DECO_GAS][-1][GAS]),
+    }
+
+
+def parse_range(text):
+    """Filter text: "130" -> (130, 130), "120-140" -> (120, 140), "" -> None."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    low, sep, high = text.partition("-")
+    try:
+        low = float(low)
+        high = float(high) if sep else low
+    except ValueError:
+        raise ValueError(f"Expected a number or a range like 120-140, got {text!r}") from None
+    return (low, high) if low <= high else (high, low)
+
+
+class PlanLibrary:
+    def __init__(self, path=DEFAULT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(plans)")}
+        self.db.executescript(SCHEMA)
+        if columns and "depth_units" not in columns:
+            self._add_depth_units()
+
+    def close(self):
+        self.db.close()
+
+    def _add_depth_units(self):
+        # Libraries from before Depth Units: add the column and re-index Max Depth in feet
+        with self.db:
+            self.db.execute("ALTER TABLE plans ADD COLUMN depth_units TEXT")
+            ids, plans = [], []
+            for row in self.db.execute("SELECT id, data FROM plans"):
+                try:
+                    plans.append(plan_schema.from_document(json.loads(row["data"])))
+                except ValueError:
+                    continue   # left as indexed; load() reports it
+                ids.append(row["id"])
+            for start in range(0, len(plans), IMPORT_BATCH):
+                computed = engine.recompute_plans(plans[start:start + IMPORT_BATCH])
+                updates = []
+                for plan_id, plan in zip(ids[start:start + IMPORT_BATCH], computed):
+                    values = index_values(plan)
+                    updates.append((values["max_depth"], values["depth_units"], plan_id))
+                self.db.executemany("UPDATE plans SET max_depth = ?, depth_units = ? WHERE id = ?", updates)
+
+    def _insert(self, plans, names, sources):
+        # One batched recompute for the index columns; the plan is stored as given, in the file format
+        now = time.time()
+        rows = []
+        for plan, computed, name, source in zip(plans, engine.recompute_plans(plans), names, sources):
+            values = index_values(computed)
+            values.update(name=name, source=source, saved_at=now, data=json.dumps(plan_schema.to_document(plan)))
+            rows.append([values[c] for c in COLUMNS])
+        self.db.executemany(INSERT, rows)
+
+    def add(self, plan, name, source=None):
+        """Insert a plan (or replace the one saved from the same ``source`` path); returns its id."""
+        with self.db:
+            self._insert([engine.normalize_plan(plan)], [name], [source])
+            if source is None:
+                return self.db.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return self.db.execute("SELECT id FROM plans WHERE source = ?", (source,)).fetchone()[0]
+
+    def import_files(self, paths, progress=None):
+        """Bulk-import saved plan files (any schema version) in one transaction; returns {path: error} for failures."""
+        errors = {}
+        with self.db:
+            for start in range(0, len(paths), IMPORT_BATCH):
+                plans, names, sources = [], [], []
+                for path in paths[start:start + IMPORT_BATCH]:
+                    try:
+                        plans.append(plan_schema.read_plan(path))
+                        names.append(os.path.basename(path))
+                        sources.append(os.path.abspath(path))
+                    except Exception as exc:
+                        errors[path] = f"{type(exc).__name__}: {exc}"
+                if plans:
+                    self._insert(plans, names, sources)
+                if progress:
+                    progress(min(start + IMPORT_BATCH, len(paths)), len(paths))
+        return errors
+
+    def search(self, max_depth=None, bottom_time=None, total_gas=None, gas_mix=None,
+               trimix=None, gf=None, name=None, limit=SEARCH_LIMIT, depth_units=environment.FEET):
+        """Filtered search.  Ranges are (low, high) tuples, ``max_depth`` in
+        ``depth_units``; ``gas_mix`` matches the bottom gas by fractions ("21/35",
+        "EAN32"); ``gf`` is "30/80"."""
+        where, args = [], []
+        if max_depth is not None:
+            low, high = (environment.convert_depth(d, depth_units, environment.FEET) for d in max_depth)
+            max_depth = (low - 1e-6, high + 1e-6)
+        for column, value in (("max_depth", max_depth), ("bottom_time", bottom_time), ("total_gas", total_gas)):
+            if value is not None:
+                where.append(f"{column} BETWEEN ? AND ?")
+                args.extend(value)
+        if gas_mix:
+            fo2, fhe = deco_engine.parse_gas(gas_mix)
+            where.append("fo2 BETWEEN ? AND ? AND fhe BETWEEN ? AND ?")
+            args.extend([fo2 - 1e-6, fo2 + 1e-6, fhe - 1e-6, fhe + 1e-6])
+        if trimix is not None:
+            where.append("fhe > 0" if trimix else "fhe = 0")
+        if gf:
+            gf_lo, gf_hi = deco_engine.parse_gradient_factors(gf)
+            where.append("gf_lo = ? AND gf_hi = ?")
+            args.extend([round(gf_lo * 100), round(gf_hi * 100)])
+        if name:
+            # % and _ in the filter are matched literally
+            where.append("name LIKE ? ESCAPE '\\'")
+            args.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        sql = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM plans"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY max_depth, bottom_time, id LIMIT ?"
+        args.append(limit)
+        return [dict(row) for row in self.db.execute(sql, args)]
+
+    def load(self, plan_id):
+        row = self.db.execute("SELECT data FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No plan with id {plan_id}")
+        # Rows written before the keyed format hold the positional layout (read as version 1)
+        return plan_schema.from_document(json.loads(row["data"]))
+
+    def delete(self, plan_id):
+        with self.db:
+            self.db.execute("DELETE FROM plans WHERE id = ?", (plan_id,))
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
@@ -0,0 +1,264 @@
+"""Versioned plan files.
+
+Version 4 (what Save writes) is keyed, so a field can't slide into the
+wrong column::
+
+    {"format": "tec-gas-plan", "version": 4,
+     "general_info": {"max_depth": "130", "gas_mix": "21/35", ..., "cns_total": "31.2", ...},
+     "environment": {"water": "Salt", "altitude": "0", "depth_units": "ft"},
+     "reserve": {"first_gas_switch_depth": "70", ...},
+     "emergency": [{"depth": "130", "ata": "4.94", "sac": "1.2", "time": "4", "gas_volume": "23.7"}, ...],
+     "bottom_gas": [{..., "gas_volume": "95.2", "ppo2": "1.13", "cns": "12.5", "otu": "31.0"}],
+     "deco_stops": [{"depth": "70", "time": "1"}, ...],
+     "deco_gas": [...], "deco_totals": {"gas_volume": "12.3", "cns": "18.7", "otu": "40.1"}}
+
+Version 3 had no environment (it was always salt water at sea level, in
+feet).  Version 2 had no oxygen fields and kept only the deco gas total, as
+``"deco_gas_total"``.  Version 1 is the original positional layout (section
+title -> lists in widget order, no version); it is also the in-memory plan
+format the rest of the code uses.  Older documents are upgraded one step at a time through
+``MIGRATIONS``.  Validation is compiled once from the field tables below
+into one reader per section and runs in a single pass, collecting every
+problem before raising ``PlanFormatError``.
+"""
+import json
+
+import gas_engine as engine
+from gas_engine import GENERAL_INFO, ENVIRONMENT, RESERVE, EMERGENCY, BOTTOM_GAS, DECO_STOPS, DECO_GAS, GAS, CNS, OTU
+
+FORMAT = "tec-gas-plan"
+SCHEMA_VERSION = 4
+MAX_ROWS = 1000   # per growable table
+
+GENERAL_INFO_FIELDS = ["max_depth", "gas_mix", "bottom_time", "gradient_factors",
+                       "total_back_gas", "deco_gas_req", "cns_total", "otu_total", "o2_warnings"]
+ENVIRONMENT_FIELDS = ["water", "altitude", "depth_units"]
+RESERVE_FIELDS = ["first_gas_switch_depth", "two_diver_reserve", "rock_bottom_psi"]
+EMERGENCY_COLUMNS = ["depth", "ata", "sac", "time", "gas_volume"]
+GAS_COLUMNS = EMERGENCY_COLUMNS + ["ppo2", "cns", "otu"]
+STOP_COLUMNS = ["depth", "time"]
+DECO_TOTAL_FIELDS = ["gas_volume", "cns", "otu"]
+DECO_TOTAL_COLUMNS = [GAS, CNS, OTU]   # in the Deco Gas table's last row
+
+# document key -> (section, field names, kind)
+SECTIONS = {
+    "general_info": (GENERAL_INFO, GENERAL_INFO_FIELDS, "entries"),
+    "environment": (ENVIRONMENT, ENVIRONMENT_FIELDS, "entries"),
+    "reserve": (RESERVE, RESERVE_FIELDS, "entries"),
+    "emergency": (EMERGENCY, EMERGENCY_COLUMNS, "rows"),
+    "bottom_gas": (BOTTOM_GAS, GAS_COLUMNS, "rows"),
+    "deco_stops": (DECO_STOPS, STOP_COLUMNS, "rows"),
+    "deco_gas": (DECO_GAS, GAS_COLUMNS, "rows"),
+    "deco_totals": (DECO_GAS, DECO_TOTAL_FIELDS, "total"),
+}
+HEADER_KEYS = {"format", "version"}
+
+
+class PlanFormatError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        shown = "; ".join(errors[:10]) + (f"; ... ({len(errors) - 10} more)" if len(errors) > 10 else "")
+        super().__init__(f"Not a valid plan: {shown}")
+
+
+def _text(value, path, errors):
+    # Cells are text; numbers are accepted and written the way they'd be typed
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(int(value)) if float(value).is_integer() else repr(value)
+    errors.append(f"{path}: expected text or a number, got {type(value).__name__}")
+    return ""
+
+
+def _compile_entries(key, fields, columns=None):
+    index = dict(zip(fields, columns or range(len(fields))))
+
+    def read(value, errors, target):
+        if not isinstance(value, dict):
+            errors.append(f"{key}: expected an object")
+            return
+        for name, v in value.items():
+            i = index.get(name)
+            if i is None:
+                errors.append(f"{key}.{name}: unknown field")
+            else:
+                target[i] = _text(v, f"{key}.{name}", errors)
+    return read
+
+
+def _compile_rows(key, columns, max_rows):
+    index = {name: i for i, name in enumerate(columns)}
+
+    def read(value, errors, target):
+        # ``target`` already has a default row for every row in ``value``
+        if not isinstance(value, list):
+            errors.append(f"{key}: expected a list of rows")
+            return
+        if len(value) > max_rows:
+            errors.append(f"{key}: {len(value)} rows, at most {max_rows} allowed")
+            return
+        for r, row in enumerate(value):
+            if not isinstance(row, dict):
+                errors.append(f"{key}[{r}]: expected an object")
+                continue
+            values = target[r]
+            for name, v in row.items():
+                i = index.get(name)
+                if i is None:
+                    errors.append(f"{key}[{r}].{name}: unknown field")
+                else:
+                    values[i] = _text(v, f"{key}[{r}].{name}", errors)
+    return read
+
+
+def _compile():
+    readers = {}
+    for key, (section, fields, kind) in SECTIONS.items():
+        if kind == "entries":
+            readers[key] = (section, _compile_entries(key, fields))
+        elif kind == "total":
+            readers[key] = (section, _compile_entries(key, fields, DECO_TOTAL_COLUMNS))
+        else:
+            max_rows = engine.TABLES[section][1] if section == EMERGENCY else MAX_ROWS
+            readers[key] = (section, _compile_rows(key, fields, max_rows))
+    return readers
+
+
+READERS = _compile()
+
+
+def _migrate_v1(data):
+    """Positional sections -> keyed version 2.  Lists longer than the sheet are errors
+    rather than being cut off."""
+    errors = []
+    stops = engine.table_sizes(data)[1]
+    doc = {"format": FORMAT, "version": 2}
+    for key, (section, fields, kind) in SECTIONS.items():
+        values = data.get(section)
+        if values is None or kind == "total":
+            continue
+        if not isinstance(values, list):
+            errors.append(f"{section}: expected a list")
+            continue
+        if kind == "entries":
+            if len(values) > len(fields):
+                errors.append(f"{section}: {len(values)} values, the sheet has {len(fields)}")
+            doc[key] = dict(zip(fields, values))
+            continue
+        if section == DECO_GAS and len(values) == stops + 1:
+            # The saved Deco Gas table ends with its total row
+            total = values[-1]
+            values = values[:-1]
+            if isinstance(total, list) and len(total) > GAS:
+                doc["deco_gas_total"] = total[GAS]
+        rows = []
+        for r, row in enumerate(values):
+            if not isinstance(row, list):
+                errors.append(f"{section}[{r}]: expected a list")
+                continue
+            if len(row) > len(fields):
+                errors.append(f"{section}[{r}]: {len(row)} columns, the table has {len(fields)}")
+            rows.append(dict(zip(fields, row)))
+        doc[key] = rows
+    if errors:
+        raise PlanFormatError(errors)
+    return doc
+
+
+def _migrate_v2(data):
+    """Adds the oxygen fields (all optional); the deco total moves into ``deco_totals``."""
+    doc = dict(data, version=3)
+    if "deco_gas_total" in doc:
+        doc["deco_totals"] = {"gas_volume": doc.pop("deco_gas_total")}
+    return doc
+
+
+def _migrate_v3(data):
+    """Adds the environment section (optional; blank is salt water, sea level, feet)."""
+    return dict(data, version=4)
+
+
+# version -> upgrade to version + 1
+MIGRATIONS = {1: _migrate_v1, 2: _migrate_v2, 3: _migrate_v3}
+
+
+def document_version(data):
+    if not isinstance(data, dict):
+        raise PlanFormatError(["expected a JSON object"])
+    if "version" not in data:
+        return 1
+    version = data["version"]
+    if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+        raise PlanFormatError([f"version: expected a positive integer, got {version!r}"])
+    return version
+
+
+def from_document(data):
+    """A plan file's JSON (any version) -> a normalized in-memory plan."""
+    version = document_version(data)
+    if version > SCHEMA_VERSION:
+        raise PlanFormatError([f"saved by a newer version of the sheet (plan version {version}, "
+                               f"this sheet reads up to {SCHEMA_VERSION})"])
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+    if data.get("format", FORMAT) != FORMAT:
+        raise PlanFormatError([f"format: expected {FORMAT!r}, got {data.get('format')!r}"])
+
+    # Fields the document leaves out keep the sheet's defaults
+    def rows(key):
+        value = data.get(key)
+        return len(value) if isinstance(value, list) else 0
+    stops = max(engine.N_STOPS, rows("deco_stops"), rows("deco_gas"))
+    plan = engine.empty_plan(stops, max(rows("bottom_gas"), 1))
+
+    # Single pass over the document
+    errors = []
+    for key, value in data.items():
+        reader = READERS.get(key)
+        if reader is not None:
+            section, read = reader
+            read(value, errors, plan[section][-1] if key == "deco_totals" else plan[section])
+        elif key not in HEADER_KEYS:
+            errors.append(f"{key}: unknown section")
+    if errors:
+        raise PlanFormatError(errors)
+    return plan
+
+
+def to_document(plan):
+    """An in-memory plan -> the current (keyed) file format."""
+    plan = engine.normalize_plan(plan)
+    doc = {"format": FORMAT, "version": SCHEMA_VERSION}
+    for key, (section, fields, kind) in SECTIONS.items():
+        values = plan[section]
+        if kind == "entries":
+            doc[key] = dict(zip(fields, values))
+        elif kind == "total":
+            doc[key] = {name: values[-1][c] for name, c in zip(fields, DECO_TOTAL_COLUMNS)}
+        else:
+            if section == DECO_GAS:
+                values = values[:-1]
+            doc[key] = [dict(zip(fields, row)) for row in values]
+    return doc
+
+
+def loads(text):
+    try:
+        data = json.loads(text)
+    except ValueError as exc:
+        raise PlanFormatError([f"invalid JSON ({exc})"]) from None
+    return from_document(data)
+
+
+def read_plan(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return loads(f.read())
+
+
+def write_plan(file_path, plan):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(to_document(plan), f, indent=4)
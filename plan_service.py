@@ -0,0 +1,318 @@
+"""Local planning service: plan numbers over HTTP/JSON, no window.
+
+    python Tec_Gas_AutoCalc_V0.9.py --serve [--port 8765] [-j WORKERS]
+
+Every endpoint takes a saved plan file's JSON (any ``plan_schema`` version) as
+the POST body; plans in responses use the current schema:
+
+    POST /compute   {"plan": plan with every derived field recomputed}
+    POST /deco      {"schedule": {...}, "plan": plan with the deco tables filled}
+    POST /pdf       the plan as a PDF (application/pdf)
+    GET  /health    {"status": "ok", "cache": {...}}
+
+Responses are cached (LRU, ``CACHE_SIZE`` entries) keyed by the plan's
+inputs: the normalized plan with the cells ``recompute_plan`` overwrites
+blanked, so stale derived values from a client don't cause misses.  Deco
+schedules are also cached by the General Info and Environment inputs
+alone.  Concurrent requests for the same key share one computation.  Deco
+and PDF work runs on a process pool so the event loop keeps answering
+other clients.
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import gas_engine as engine
+import deco_engine
+import plan_schema
+from gas_engine import ATA, CNS, DEPTH, GAS, OTU, PPO2, TIME
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+CACHE_SIZE = 1024
+MAX_BODY = 1 << 20        # bytes
+MAX_HEADER = 1 << 16
+KEEP_ALIVE_TIMEOUT = 30   # seconds an idle connection stays open
+
+JSON_TYPE = "application/json"
+PDF_TYPE = "application/pdf"
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def discard(self, key, value):
+        if self.data.get(key) is value:
+            del self.data[key]
+
+    def stats(self):
+        return {"size": len(self.data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def plan_key(plan):
+    """Cache key for a normalized plan: its cells as JSON, with the derived cells blanked."""
+    plan = engine.normalize_plan(plan)
+    plan[engine.RESERVE][1] = ""
+    for i in (engine.CNS_TOTAL, engine.OTU_TOTAL, engine.O2_WARNINGS):
+        plan[engine.GENERAL_INFO][i] = ""
+    for section in (engine.EMERGENCY, engine.BOTTOM_GAS, engine.DECO_GAS):
+        for row in plan[section]:
+            row[GAS] = ""
+            if engine.to_float(row[DEPTH]) == engine.to_float(row[DEPTH]):
+                row[ATA] = ""
+            if section != engine.EMERGENCY:
+                row[PPO2] = row[CNS] = row[OTU] = ""
+    plan[engine.EMERGENCY][1][DEPTH] = plan[engine.EMERGENCY][1][ATA] = ""
+    # Rows 1 and 3 mirror Max Depth and First Gas Switch Depth when those are numbers
+    for r, source in ((0, plan[engine.GENERAL_INFO][0]), (2, plan[engine.RESERVE][0])):
+        if engine.to_float(source) == engine.to_float(source):
+            plan[engine.EMERGENCY][r][DEPTH] = ""
+    for row in plan[engine.DECO_GAS][:-1]:
+        row[TIME] = ""
+    return json.dumps(plan, separators=(",", ":"))
+
+
+def _encode(value):
+    return json.dumps(value).encode()
+
+
+# --- Work (module level so the process pool can pickle it) ---
+
+def compute_response(plan):
+    return _encode({"plan": plan_schema.to_document(engine.recompute_plan(plan))})
+
+
+def schedule_dict(schedule):
+    return {
+        "stops": [{"depth": depth, "minutes": minutes, "gas": deco_engine.gas_name(gas)}
+                  for depth, minutes, gas in schedule.stops],
+        "runtime": schedule.runtime,
+        "first_stop": schedule.first_stop,
+        "gas_switches": [{"depth": depth, "gas": deco_engine.gas_name(gas)} for depth, gas in schedule.gas_switches],
+        "units": schedule.units,
+    }
+
+
+def deco_schedule(inputs):
+    return deco_engine.plan_deco(*inputs)
+
+
+def deco_response(plan, schedule):
+    filled = engine.recompute_plan(deco_engine.fill_plan(plan, schedule))
+    return _encode({"schedule": schedule_dict(schedule), "plan": plan_schema.to_document(filled)})
+
+
+def pdf_response(plan):
+    from pdf_export import plan_tables, write_pdf
+    buffer = io.BytesIO()
+    write_pdf(buffer, plan_tables(engine.recompute_plan(plan)))
+    return buffer.getvalue()
+
+
+class PlanService:
+    """Request handling and the result cache, independent of the HTTP layer."""
+
+    def __init__(self, workers=None, cache_size=CACHE_SIZE):
+        # workers=1 keeps the work in this process, on one thread off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1) if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+        self.cache = LRUCache(cache_size)
+        self.requests = 0
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def cached(self, key, make):
+        """Cached result of ``make()`` (a coroutine function); in-flight results are shared."""
+        future = self.cache.get(key)
+        if future is None:
+            future = asyncio.ensure_future(make())
+            self.cache.put(key, future)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self.cache.discard(key, future)  # errors are not cached
+            raise
+
+    def run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def handle(self, method, path, body):
+        """Returns (status, content type, body bytes)."""
+        self.requests += 1
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            return 200, JSON_TYPE, _encode({"status": "ok", "requests": self.requests, "cache": self.cache.stats()})
+        if path not in ("/compute", "/deco", "/pdf"):
+            raise HTTPError(404, f"No endpoint {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST with a plan as the JSON body")
+        try:
+            plan = plan_schema.loads(body or b"null")
+        except plan_schema.PlanFormatError as exc:
+            raise HTTPError(400, str(exc)) from None
+        key = plan_key(plan)
+
+        if path == "/compute":
+            # Cheap enough to run on the loop; the pool round trip would cost more
+            return 200, JSON_TYPE, await self.cached(("compute", key), lambda: self._now(compute_response, plan))
+        if path == "/pdf":
+            return 200, PDF_TYPE, await self.cached(("pdf", key), lambda: self.run(pdf_response, plan))
+        try:
+            inputs = deco_engine.plan_inputs(plan)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+
+        async def make():
+            schedule = await self.cached(("schedule", repr(inputs)), lambda: self.run(deco_schedule, inputs))
+            return deco_response(plan, schedule)
+        try:
+            return 200, JSON_TYPE, await self.cached(("deco", key), make)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+
+    @staticmethod
+    async def _now(func, *args):
+        return func(*args)
+
+
+# --- HTTP/1.1 ---
+
+async def _read_request(reader):
+    """(method, path, headers, body), or None when the client closed the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as exc:
+        if exc.partial.strip():
+            raise HTTPError(400, "Incomplete request") from None
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, "Headers too large") from None
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Bad Content-Length") from None
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Body larger than {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _response(status, content_type, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def _connection(service, reader, writer):
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await asyncio.wait_for(_read_request(reader), KEEP_ALIVE_TIMEOUT)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, content_type, payload = await service.handle(method, path, body)
+            except HTTPError as exc:
+                status, content_type, payload = exc.status, JSON_TYPE, _encode({"error": str(exc)})
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as exc:
+                status, content_type, payload = 500, JSON_TYPE, _encode({"error": f"{type(exc).__name__}: {exc}"})
+            writer.write(_response(status, content_type, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, cache_size=CACHE_SIZE, ready=None):
+    """Run the service until cancelled.  ``ready(port)`` is called once it is listening."""
+    service = PlanService(workers, cache_size)
+    server = await asyncio.start_server(lambda r, w: _connection(service, r, w), host, port, limit=MAX_HEADER)
+    try:
+        if ready:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plan_service", description="Serve plan calculations over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes for deco and PDF (default: one per CPU, 1 = no pool)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="cached responses to keep")
+    args = parser.parse_args(argv)
+
+    def ready(port):
+        print(f"Serving plans on http://{args.host}:{port} (started in {time.perf_counter() - start:.2f} s)",
+              file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size, ready))
+    except KeyboardInterrupt:
+        pass
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
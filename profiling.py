@@ -0,0 +1,126 @@
+"""Opt-in timing of UI callbacks, cell formulas and export/load phases.
+
+Everything goes through one ``Profiler``: ``wrap`` times a callable,
+``phase`` times a block and ``count`` records a value distribution (e.g.
+cell changes per keystroke).  While ``enabled`` is False the wrappers just
+call through, so the instrumentation can stay installed.
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency bucket upper bounds in seconds: 10 us ... 1 s in 1-2.5-5 steps, then overflow
+LATENCY_BUCKETS = [m * 10 ** e for e in range(-5, 0) for m in (1, 2.5, 5)] + [1.0]
+# Count bucket upper bounds (cell changes per keystroke, writes per flush etc.)
+COUNT_BUCKETS = [0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64]
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.n += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th percentile (max for the overflow bucket)
+        target, seen = q / 100 * self.n, 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.n,
+            "total": self.total,
+            "mean": self.total / self.n if self.n else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+            "buckets": {("<=%g" % b): c for b, c in zip(self.bounds, self.buckets)} | {"more": self.buckets[-1]},
+        }
+
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = {}
+        self.counts = {}
+        self._lock = threading.Lock()  # export phases are recorded from worker threads
+
+    def record(self, name, seconds):
+        with self._lock:
+            if name not in self.timings:
+                self.timings[name] = Histogram(LATENCY_BUCKETS)
+            self.timings[name].add(seconds)
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self.counts:
+                self.counts[name] = Histogram(COUNT_BUCKETS)
+            self.counts[name].add(value)
+
+    def wrap(self, name, fn):
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.counts.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "timings": {name: h.to_dict() for name, h in self.timings.items()},
+                "counts": {name: h.to_dict() for name, h in self.counts.items()},
+            }
+
+    def dump(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def report(self):
+        """Plain-text table of the timings (slowest total first) and counts."""
+        data = self.to_dict()
+        lines = [f"{'Callback / phase':<56} {'calls':>7} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'total ms':>10}"]
+        for name, h in sorted(data["timings"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{name[:56]:<56} {h['count']:>7} {h['mean'] * 1e3:>9.3f} {h['p95'] * 1e3:>9.3f} "
+                         f"{h['max'] * 1e3:>9.3f} {h['total'] * 1e3:>10.1f}")
+        if data["counts"]:
+            lines += ["", f"{'Count':<56} {'samples':>7} {'mean':>9} {'p95':>9} {'max':>9}"]
+            for name, h in data["counts"].items():
+                lines.append(f"{name[:56]:<56} {h['count']:>7} {h['mean']:>9.2f} {h['p95']:>9g} {h['max']:>9g}")
+        return "\n".join(lines)
@@ -0,0 +1,149 @@
+"""Real-gas (compressibility) corrections for cylinder pressure <-> volume.
+
+The sheet's volumes are free gas at the surface, and at breathing pressures
+(a few ATA) every mix is close to ideal.  Cylinder pressure is where it
+matters: at 3442 psi a helium-rich trimix holds several percent less than the
+ideal CUFT = rated CUFT x PSI / rated PSI, and oxygen a little more.
+
+Z factors come from the Peng-Robinson equation of state for O2/N2/He mixes
+(van der Waals mixing, no interaction terms).  The standard Peng-Robinson
+alpha is poor for helium, so helium uses a constant alpha fitted to its second
+virial coefficient near room temperature.
+
+Solving the cubic on every keystroke is avoided: the first time a mix is
+used, a ``ZTable`` over a pressure grid is built (all grid points in one
+batched solve) and cached in memory and on disk.  Conversions are then
+``np.interp`` over the table.  A table maps between ideal-equivalent PSI (what
+the linear CUFT <-> PSI factors give) and real gauge PSI for that mix, so
+the per-cylinder factors stay as they are.
+"""
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".tec_gas_planning", "ztables")
+TABLE_VERSION = 1
+DEFAULT_TEMPERATURE_C = 20.0
+GRID_MAX_PSI = 6000
+GRID_STEP_PSI = 10
+SURFACE_PSI = 14.696
+PA_PER_PSI = 6894.757
+GAS_CONSTANT = 8.314462618
+
+# Critical temperature (K), critical pressure (Pa), acentric factor
+COMPONENTS = {
+    "O2": (154.58, 50.43e5, 0.022),
+    "N2": (126.19, 33.96e5, 0.0372),
+    "He": (5.1953, 2.2746e5, -0.390),
+}
+HE_ALPHA = 1.93
+
+
+def _pr_parameters(temperature_k):
+    # Peng-Robinson a (with alpha) and b per component, in COMPONENTS order
+    a, b = [], []
+    for name, (tc, pc, omega) in COMPONENTS.items():
+        if name == "He":
+            alpha = HE_ALPHA
+        else:
+            kappa = 0.37464 + 1.54226 * omega - 0.26992 * omega ** 2
+            alpha = (1 + kappa * (1 - np.sqrt(temperature_k / tc))) ** 2
+        a.append(0.45724 * (GAS_CONSTANT * tc) ** 2 / pc * alpha)
+        b.append(0.07780 * GAS_CONSTANT * tc / pc)
+    return np.array(a), np.array(b)
+
+
+def z_factor(fo2, fhe, pressures_pa, temperature_k):
+    """Compressibility of an O2/N2/He mix at absolute pressures (Pa), solved for every pressure at once."""
+    x = np.array([fo2, 1 - fo2 - fhe, fhe])
+    a, b = _pr_parameters(temperature_k)
+    a_mix = float(x @ np.sqrt(np.outer(a, a)) @ x)
+    b_mix = float(x @ b)
+    rt = GAS_CONSTANT * temperature_k
+    p = np.asarray(pressures_pa, dtype=float)
+    big_a, big_b = a_mix * p / rt ** 2, b_mix * p / rt
+    # Z^3 + c2 Z^2 + c1 Z + c0 = 0 via the eigenvalues of each companion matrix
+    c2 = -(1 - big_b)
+    c1 = big_a - 3 * big_b ** 2 - 2 * big_b
+    c0 = -(big_a * big_b - big_b ** 2 - big_b ** 3)
+    companion = np.zeros(p.shape + (3, 3))
+    companion[..., 0, :] = np.stack([-c2, -c1, -c0], axis=-1)
+    companion[..., 1, 0] = companion[..., 2, 1] = 1
+    roots = np.linalg.eigvals(companion)
+    # The gas phase is the largest real root
+    real = np.where(np.abs(roots.imag) < 1e-9, roots.real, -np.inf)
+    return real.max(axis=-1)
+
+
+class ZTable:
+    """Z over a gauge-pressure grid for one mix, with ideal <-> real PSI lookups."""
+
+    def __init__(self, psi, z):
+        self.psi = psi
+        self.z = z
+        # Usable gas above 0 psig in ideal-equivalent psi: (P / Z(P) - P0 / Z(P0)) in absolute psi
+        self.ideal = (psi + SURFACE_PSI) / z - SURFACE_PSI / z[0]
+
+    @classmethod
+    def build(cls, fo2, fhe, temperature_c=DEFAULT_TEMPERATURE_C):
+        psi = np.arange(0, GRID_MAX_PSI + GRID_STEP_PSI, GRID_STEP_PSI, dtype=float)
+        z = z_factor(fo2, fhe, (psi + SURFACE_PSI) * PA_PER_PSI, temperature_c + 273.15)
+        return cls(psi, z)
+
+    def z_at(self, psi):
+        return np.interp(psi, self.psi, self.z)
+
+    def real_psi(self, ideal_psi):
+        """Gauge pressure holding the gas the ideal factors put at ``ideal_psi`` (scalar or array)."""
+        return self._interp(ideal_psi, self.ideal, self.psi)
+
+    def ideal_psi(self, real_psi):
+        """Ideal-equivalent pressure of the gas at gauge pressure ``real_psi``."""
+        return self._interp(real_psi, self.psi, self.ideal)
+
+    @staticmethod
+    def _interp(values, xs, ys):
+        # np.interp keeps NaN inputs as NaN; beyond the grid extrapolate along the last segment
+        values = np.asarray(values, dtype=float)
+        out = np.interp(values, xs, ys)
+        slope = (ys[-1] - ys[-2]) / (xs[-1] - xs[-2])
+        out = np.where(values > xs[-1], ys[-1] + (values - xs[-1]) * slope, out)
+        return out if out.ndim else float(out)
+
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def _cache_path(cache_dir, key):
+    fo2, fhe, temperature_c = key
+    return os.path.join(cache_dir, f"z_v{TABLE_VERSION}_{fo2:.4f}_{fhe:.4f}_{temperature_c:g}C.npz")
+
+
+def get_table(gas, temperature_c=DEFAULT_TEMPERATURE_C, cache_dir=DEFAULT_CACHE_DIR):
+    """``ZTable`` for a (fO2, fHe) mix: from memory, else the disk cache, else built and saved."""
+    key = (round(gas[0], 4), round(gas[1], 4), float(temperature_c))
+    with _lock:
+        table = _tables.get(key)
+        if table is not None:
+            return table
+        path = _cache_path(cache_dir, key) if cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    table = ZTable(data["psi"], data["z"])
+            except (OSError, ValueError, KeyError):
+                table = None  # unreadable cache file: rebuild it
+        if table is None:
+            table = ZTable.build(*key)
+            if path:
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.tmp.npz"
+                    np.savez(tmp, psi=table.psi, z=table.z)
+                    os.replace(tmp, path)
+                except OSError:
+                    pass  # the cache is only an optimisation
+        _tables[key] = table
+        return table
@@ -0,0 +1,195 @@
+"""Monte Carlo analysis of the Gas Reserve (Emergency) table.
+
+Each sample draws a SAC factor (applied to both rows' Emergency SAC), an
+ascent delay (minutes added to Row 1) and a stop-time overrun (minutes added
+to Row 2).  Samples are generated in fixed-size chunks and folded into
+log-spaced histograms, so memory stays the same for 10^4 or 10^9 samples and
+chunks can be spread over a process pool and merged.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import gas_engine as engine
+from gas_engine import ATA, SAC, TIME, EMERGENCY
+
+CHUNK_SIZE = 1 << 16
+PERCENTILES = (5, 50, 90, 95, 99)
+
+# Histogram bins: log-spaced from 0.01 to 10^6, about 0.1% wide
+HIST_LOW, HIST_HIGH, HIST_BINS = 1e-2, 1e6, 20000
+_LOG_LOW = np.log(HIST_LOW)
+_LOG_STEP = (np.log(HIST_HIGH) - _LOG_LOW) / HIST_BINS
+BIN_CENTRES = np.exp(_LOG_LOW + (np.arange(HIST_BINS) + 0.5) * _LOG_STEP)
+
+# Back gas defaults: double AL80s
+DEFAULT_CYLINDER_CUFT = 154.8
+DEFAULT_CYLINDER_PSI = 3000
+
+OUTPUTS = ("total_per_diver", "two_divers", "rock_bottom_psi")
+
+
+class Distribution:
+    """A sampling distribution written as text, e.g. "normal 1 0.15" or "uniform 0 2".
+
+    Kinds: fixed VALUE, uniform LOW HIGH, normal MEAN SD, lognormal MEDIAN SIGMA,
+    triangular LOW MODE HIGH, exponential MEAN.  Samples are clipped at zero.
+    """
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "triangular": 3, "exponential": 1}
+
+    def __init__(self, kind, *params):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown distribution {kind!r}; use one of {', '.join(self.KINDS)}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"{kind} takes {self.KINDS[kind]} parameter(s)")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, text):
+        parts = text.split()
+        if not parts:
+            raise ValueError("Distribution is empty")
+        try:
+            return cls(parts[0].lower(), *parts[1:])
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Bad distribution {text!r}: {exc}") from None
+
+    def __str__(self):
+        return " ".join([self.kind] + [f"{p:g}" for p in self.params])
+
+    def sample(self, rng, n):
+        p = self.params
+        if self.kind == "fixed":
+            values = np.full(n, p[0])
+        elif self.kind == "uniform":
+            values = rng.uniform(p[0], p[1], n)
+        elif self.kind == "normal":
+            values = rng.normal(p[0], p[1], n)
+        elif self.kind == "lognormal":
+            values = p[0] * np.exp(rng.normal(0, p[1], n))
+        elif self.kind == "triangular":
+            values = rng.triangular(p[0], p[1], p[2], n)
+        else:
+            values = rng.exponential(p[0], n)
+        return np.maximum(values, 0)
+
+
+DEFAULT_SAC_FACTOR = Distribution("lognormal", 1, 0.15)
+DEFAULT_ASCENT_DELAY = Distribution("uniform", 0, 2)
+DEFAULT_STOP_OVERRUN = Distribution("exponential", 1)
+
+
+class ReserveModel:
+    """Emergency table inputs plus the distributions to sample."""
+
+    def __init__(self, atas, sacs, times, sac_factor=DEFAULT_SAC_FACTOR,
+                 ascent_delay=DEFAULT_ASCENT_DELAY, stop_overrun=DEFAULT_STOP_OVERRUN,
+                 cylinder_cuft=DEFAULT_CYLINDER_CUFT, cylinder_psi=DEFAULT_CYLINDER_PSI, z_table=None):
+        self.atas, self.sacs, self.times = atas, sacs, times   # Rows 1 and 2
+        self.sac_factor = sac_factor
+        self.ascent_delay = ascent_delay
+        self.stop_overrun = stop_overrun
+        self.psi_per_cuft = cylinder_psi / cylinder_cuft
+        self.z_table = z_table  # real_gas.ZTable for the back gas, None for ideal gas
+
+    @classmethod
+    def from_plan(cls, plan, **kwargs):
+        em = engine.recompute_plan(plan)[EMERGENCY]
+        rows = [[engine.to_float(em[r][c]) for c in (ATA, SAC, TIME)] for r in (0, 1)]
+        if any(v != v for row in rows for v in row):
+            raise ValueError("Gas Reserve (Emergency) Rows 1 and 2 need Depth, Emergency SAC and Time")
+        atas, sacs, times = (tuple(col) for col in zip(*rows))
+        return cls(atas, sacs, times, **kwargs)
+
+    def sample(self, rng, n):
+        """Vectorised draw of ``n`` samples; returns arrays keyed by OUTPUTS."""
+        factor = self.sac_factor.sample(rng, n)
+        time1 = self.times[0] + self.ascent_delay.sample(rng, n)
+        time2 = self.times[1] + self.stop_overrun.sample(rng, n)
+        total = factor * (self.atas[0] * self.sacs[0] * time1 + self.atas[1] * self.sacs[1] * time2)
+        two_divers = total * 2
+        rock_bottom = two_divers * self.psi_per_cuft
+        return {
+            "total_per_diver": total,
+            "two_divers": two_divers,
+            "rock_bottom_psi": rock_bottom if self.z_table is None else self.z_table.real_psi(rock_bottom),
+        }
+
+
+class Histograms:
+    """Mergeable log-binned histograms of each output, with exact mean/min/max."""
+
+    def __init__(self):
+        self.counts = {name: np.zeros(HIST_BINS, dtype=np.int64) for name in OUTPUTS}
+        self.sums = dict.fromkeys(OUTPUTS, 0.0)
+        self.mins = dict.fromkeys(OUTPUTS, np.inf)
+        self.maxs = dict.fromkeys(OUTPUTS, -np.inf)
+        self.n = 0
+
+    def add(self, samples):
+        for name in OUTPUTS:
+            values = samples[name]
+            index = ((np.log(np.maximum(values, HIST_LOW)) - _LOG_LOW) / _LOG_STEP).astype(np.int64)
+            self.counts[name] += np.bincount(np.clip(index, 0, HIST_BINS - 1), minlength=HIST_BINS)
+            self.sums[name] += float(values.sum())
+            self.mins[name] = min(self.mins[name], float(values.min()))
+            self.maxs[name] = max(self.maxs[name], float(values.max()))
+        self.n += len(samples[OUTPUTS[0]])
+
+    def merge(self, other):
+        for name in OUTPUTS:
+            self.counts[name] += other.counts[name]
+            self.sums[name] += other.sums[name]
+            self.mins[name] = min(self.mins[name], other.mins[name])
+            self.maxs[name] = max(self.maxs[name], other.maxs[name])
+        self.n += other.n
+        return self
+
+    def percentile(self, name, q):
+        cumulative = np.cumsum(self.counts[name])
+        i = int(np.searchsorted(cumulative, q / 100 * self.n))
+        return float(np.clip(BIN_CENTRES[min(i, HIST_BINS - 1)], self.mins[name], self.maxs[name]))
+
+    def summary(self, percentiles=PERCENTILES):
+        return {
+            name: {
+                "mean": self.sums[name] / self.n,
+                "min": self.mins[name],
+                "max": self.maxs[name],
+                **{f"p{q:g}": self.percentile(name, q) for q in percentiles},
+            }
+            for name in OUTPUTS
+        }
+
+
+def _run_chunks(model, seeds):
+    # Worker: one SeedSequence per chunk so results do not depend on the worker count
+    hist = Histograms()
+    for seed, n in seeds:
+        hist.add(model.sample(np.random.default_rng(seed), n))
+    return hist
+
+
+def run(model, samples=10 ** 6, chunk_size=CHUNK_SIZE, workers=None, seed=None):
+    """Stream ``samples`` draws through the model in chunks.
+
+    ``workers`` > 1 spreads the chunks over a process pool (None or 1 runs in
+    this process).  Returns a ``Histograms`` whose ``summary()`` gives the
+    percentiles.
+    """
+    if samples <= 0:
+        raise ValueError("Sample count must be positive")
+    sizes = [chunk_size] * (samples // chunk_size)
+    if samples % chunk_size:
+        sizes.append(samples % chunk_size)
+    chunk_seeds = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+    if not workers or workers <= 1:
+        return _run_chunks(model, chunk_seeds)
+    hist = Histograms()
+    batches = [chunk_seeds[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_run_chunks, [model] * workers, batches):
+            hist.merge(part)
+    return hist
@@ -0,0 +1,78 @@
+"""What-if sweeps of the gas plan over depth x bottom time x SAC.
+
+Only the engine steps the results need are run: the Emergency table and the
+two-diver reserve once per depth (they don't depend on time or SAC), and the
+Bottom Gas Requirements once per grid point, each in one batched call.
+"""
+import numpy as np
+
+import gas_engine as engine
+from gas_engine import DEPTH, SAC, TIME, GAS
+
+MAX_POINTS = 10 ** 7
+
+
+def axis(start, stop, step):
+    """Inclusive range of grid values, e.g. axis(100, 150, 10)."""
+    if step <= 0:
+        raise ValueError("Sweep step must be positive")
+    if stop < start:
+        raise ValueError("Sweep range must run from low to high")
+    return np.arange(start, stop + step / 2, step)
+
+
+class SweepResult:
+    def __init__(self, depths, times, sacs, bottom_gas, emergency, two_divers, total_back_gas):
+        self.depths, self.times, self.sacs = depths, times, sacs
+        # Arrays shaped (depth, time, SAC)
+        self.bottom_gas = bottom_gas
+        self.emergency = emergency          # Gas Reserve (Emergency) Row 3, per diver
+        self.two_divers = two_divers        # Gas Reserve Volume For Two Divers
+        self.total_back_gas = total_back_gas
+
+    def slice_rows(self, field, sac_index, decimals=1):
+        """Table rows for one SAC value: header row of times, then one row per depth."""
+        values = getattr(self, field)[:, :, sac_index]
+        rows = [["Depth \\ Time"] + [f"{t:g}" for t in self.times]]
+        for depth, row in zip(self.depths, values.tolist()):
+            rows.append([f"{depth:g}"] + [engine.format_value(v, decimals) for v in row])
+        return rows
+
+
+def sweep_grid(plan, depths, times, sacs):
+    """Evaluate ``plan`` at every (Max Depth, Bottom Time, SAC) combination.
+
+    The sweep replaces the first Bottom Gas row; everything else (further
+    bottom segments, First Gas Switch Depth, Emergency SAC/times, deco rows)
+    is taken from ``plan``.  Bottom gas is the sum of the Bottom Gas rows and
+    total back gas is that plus the two-diver reserve.
+    """
+    depths, times, sacs = (np.asarray(a, dtype=float) for a in (depths, times, sacs))
+    shape = (depths.size, times.size, sacs.size)
+    n = depths.size * times.size * sacs.size
+    if n > MAX_POINTS:
+        raise ValueError(f"Sweep has {n} points; the limit is {MAX_POINTS}")
+    base = engine.plans_to_arrays([engine.normalize_plan(plan)])
+    pressure = (engine.SURFACE_ATA, engine.DEPTH_PER_ATM)
+
+    # Gas Reserve (Emergency) and the two-diver reserve, one row per depth
+    reserve = {key: np.repeat(base[key], depths.size, axis=0)
+               for key in (engine.GENERAL_INFO, engine.RESERVE, engine.EMERGENCY) + pressure}
+    reserve[engine.GENERAL_INFO][:, 0] = depths
+    engine.evaluate_reserve(reserve)
+    per_depth = (slice(None), None, None)
+    emergency = np.broadcast_to(reserve[engine.EMERGENCY][:, 2, GAS][per_depth], shape)
+    two_divers = np.broadcast_to(reserve[engine.RESERVE][:, 1][per_depth], shape)
+
+    # Bottom Gas Requirements at every grid point; the sweep replaces the first row
+    grid_depth, grid_time, grid_sac = (g.ravel() for g in np.meshgrid(depths, times, sacs, indexing="ij"))
+    bottom = {key: np.repeat(base[key], n, axis=0) for key in (engine.BOTTOM_GAS,) + pressure}
+    rows = bottom[engine.BOTTOM_GAS]
+    rows[:, 0, DEPTH] = grid_depth
+    rows[:, 0, SAC] = grid_sac
+    rows[:, 0, TIME] = grid_time
+    engine.evaluate_bottom_gas(bottom)
+    segments = rows[..., GAS]
+    bottom_gas = np.where(np.isnan(segments).all(axis=1), np.nan, np.nansum(segments, axis=1)).reshape(shape)
+    total = np.nansum([bottom_gas, two_divers], axis=0)
+    return SweepResult(depths, times, sacs, bottom_gas, emergency.copy(), two_divers.copy(), total)
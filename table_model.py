@@ -0,0 +1,62 @@
+"""Array-backed cell storage for the sheet's tables.
+
+The GUI keeps table text here rather than in one widget per cell, and shows
+it through a small pool of entries (see ``VirtualTable`` in the app), so a
+table can hold hundreds of rows.
+"""
+import numpy as np
+
+MIN_CAPACITY = 8
+
+
+class TableModel:
+    """Rows x columns of cell text in a NumPy unicode array.
+
+    Capacity doubles as rows are added and the string width grows when a longer
+    value is stored.
+    """
+
+    def __init__(self, columns, rows=(), width=8):
+        self.columns = columns
+        self.data = np.full((max(len(rows), MIN_CAPACITY), columns), "", dtype=f"<U{width}")
+        self.n = 0
+        self.set_rows(rows)
+
+    def __len__(self):
+        return self.n
+
+    def get(self, r, c):
+        return str(self.data[r, c])
+
+    def set(self, r, c, text):
+        width = self.data.dtype.itemsize // 4
+        if len(text) > width:
+            self.data = self.data.astype(f"<U{max(len(text), 2 * width)}")
+        self.data[r, c] = text
+
+    def set_column(self, c, values):
+        """Replace column ``c`` of the first ``len(values)`` rows."""
+        width = self.data.dtype.itemsize // 4
+        longest = max(map(len, values), default=0)
+        if longest > width:
+            self.data = self.data.astype(f"<U{max(longest, 2 * width)}")
+        self.data[:len(values), c] = values
+
+    def resize(self, rows):
+        """Add blank rows or drop rows from the end."""
+        if rows > len(self.data):
+            grown = np.full((max(rows, 2 * len(self.data)), self.columns), "", dtype=self.data.dtype)
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        elif rows < self.n:
+            self.data[rows:self.n] = ""
+        self.n = rows
+
+    def set_rows(self, rows):
+        self.resize(len(rows))
+        for r, row in enumerate(rows):
+            for c, text in enumerate(row[:self.columns]):
+                self.set(r, c, str(text))
+
+    def rows(self):
+        return self.data[:self.n].tolist()
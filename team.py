@@ -0,0 +1,248 @@
+"""Cylinder catalog and team gas model.
+
+A ``Team`` holds N divers as parallel arrays (SAC, Emergency SAC, back-gas
+cylinder, fill pressure).  ``team_gas`` scales the plan's Bottom Gas and Gas
+Reserve (Emergency) rows by every diver's SAC and converts the volumes to PSI
+with factors the ``Catalog`` precomputes per cylinder, so a roster of any
+size is one vectorised pass.
+
+Each diver's reserve covers their own emergency ascent plus that of the
+hungriest buddy on the team (the sheet's x2 when everyone breathes the same),
+and turn pressures follow the rule of thirds on the smallest usable volume in
+the team, converted to each diver's own cylinder.  Pressures can be corrected
+for compressibility with a ``real_gas.ZTable`` for the back gas.
+"""
+import csv
+
+import numpy as np
+
+import gas_engine as engine
+import deco_engine
+from gas_engine import ATA, TIME
+
+TURN_FRACTION = 1 / 3
+
+
+class Cylinder:
+    def __init__(self, name, cuft, psi, tanks=1):
+        self.name = name
+        self.cuft = cuft      # whole set at rated pressure
+        self.psi = psi        # rated pressure
+        self.tanks = tanks    # 2 for doubles
+
+    @property
+    def psi_per_cuft(self):
+        return self.psi / self.cuft
+
+
+def _doubles(cylinder):
+    return Cylinder(f"Double {cylinder.name}", cylinder.cuft * 2, cylinder.psi, 2)
+
+
+SINGLES = [
+    Cylinder("AL30", 30.0, 3000),
+    Cylinder("AL40", 40.0, 3000),
+    Cylinder("AL63", 63.0, 3000),
+    Cylinder("AL80", 77.4, 3000),
+    Cylinder("HP80", 80.0, 3442),
+    Cylinder("HP100", 100.0, 3442),
+    Cylinder("HP120", 120.0, 3442),
+    Cylinder("LP85", 85.0, 2640),
+    Cylinder("LP95", 95.0, 2640),
+    Cylinder("LP108", 108.0, 2640),
+]
+DOUBLES = [_doubles(c) for c in SINGLES if c.cuft >= 63]
+
+
+class Catalog:
+    """Cylinders by name, with per-cylinder values as arrays for vectorised lookups.
+
+    Index -1 (an unknown name) reads NaN from every array.
+    """
+
+    def __init__(self, cylinders):
+        self.cylinders = list(cylinders)
+        self.index = {}
+        for i, c in enumerate(self.cylinders):
+            self.index[c.name.upper()] = i
+            if c.tanks == 2:
+                self.index[f"2X{c.name.split()[-1].upper()}"] = i   # "2xAL80"
+        self.cuft = np.array([c.cuft for c in self.cylinders] + [np.nan])
+        self.psi = np.array([float(c.psi) for c in self.cylinders] + [np.nan])
+        self.tanks = np.array([float(c.tanks) for c in self.cylinders] + [np.nan])
+        self.psi_per_cuft = self.psi / self.cuft
+        self.psi_per_tank_cuft = self.psi_per_cuft * self.tanks   # one cylinder of the set
+
+    def lookup(self, name):
+        return self.index.get(" ".join((name or "").split()).upper(), -1)
+
+    def __getitem__(self, name):
+        i = self.lookup(name)
+        if i < 0:
+            raise KeyError(f"Unknown cylinder {name!r}")
+        return self.cylinders[i]
+
+    def names(self):
+        return [c.name for c in self.cylinders]
+
+
+CATALOG = Catalog(SINGLES + DOUBLES)
+
+FIELDS = ["Name", "SAC", "Emergency SAC", "Cylinder", "Fill PSI"]
+OUTPUTS = ["Bottom Gas (CUFT)", "Reserve (CUFT)", "Total (CUFT)", "Total (PSI)",
+           "Rock Bottom (PSI)", "Rock Bottom Per Tank (PSI)", "Turn (PSI)"]
+
+
+class Team:
+    """Divers as parallel arrays; blank or unparsable numbers are NaN."""
+
+    def __init__(self, rows=(), catalog=CATALOG):
+        self.catalog = catalog
+        self.set_rows(rows)
+
+    def __len__(self):
+        return len(self.names)
+
+    def set_rows(self, rows):
+        """Rows of text in ``FIELDS`` order (as a roster file or table holds them)."""
+        rows = [list(row) + [""] * (len(FIELDS) - len(row)) for row in rows]
+        self.names = [row[0] for row in rows]
+        self.cylinder_names = [row[3] for row in rows]
+        self.sac = np.array([engine.to_float(row[1]) for row in rows], dtype=float)
+        self.emergency_sac = np.array([engine.to_float(row[2]) for row in rows], dtype=float)
+        self.cylinder = np.array([self.catalog.lookup(row[3]) for row in rows], dtype=int)
+        self.fill = np.array([engine.to_float(row[4]) for row in rows], dtype=float)
+
+    def set(self, i, field, text):
+        """Update one diver's field from its text."""
+        if field == "Name":
+            self.names[i] = text
+        elif field == "SAC":
+            self.sac[i] = engine.to_float(text)
+        elif field == "Emergency SAC":
+            self.emergency_sac[i] = engine.to_float(text)
+        elif field == "Cylinder":
+            self.cylinder_names[i] = text
+            self.cylinder[i] = self.catalog.lookup(text)
+        elif field == "Fill PSI":
+            self.fill[i] = engine.to_float(text)
+        else:
+            raise KeyError(field)
+
+    def rows(self):
+        def text(value):
+            return "" if value != value else f"{value:g}"
+        return [[name, text(sac), text(esac), cylinder, text(fill)]
+                for name, sac, esac, cylinder, fill in zip(self.names, self.sac.tolist(), self.emergency_sac.tolist(),
+                                                           self.cylinder_names, self.fill.tolist())]
+
+
+def read_roster(file_path, catalog=CATALOG):
+    """Roster CSV with a header row naming ``FIELDS`` (in any order; missing columns are blank)."""
+    with open(file_path, newline="") as f:
+        try:
+            rows = [[(record.get(field) or "").strip() for field in FIELDS] for record in csv.DictReader(f)]
+        except csv.Error as exc:
+            raise ValueError(f"{file_path}: {exc}") from None
+    return Team(rows, catalog)
+
+
+def write_roster(file_path, team):
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(team.rows())
+
+
+def plan_factors(plan):
+    """(sum of ATA x Time over the Bottom Gas rows, the same over Emergency Rows 1-2).
+
+    Multiplying by a SAC gives that diver's volume; NaN when the rows are blank.
+    """
+    arrays = engine.plans_to_arrays([engine.recompute_plan(plan)])
+    bottom = arrays[engine.BOTTOM_GAS][0]
+    emergency = arrays[engine.EMERGENCY][0, :2]
+    factors = []
+    for rows in (bottom, emergency):
+        values = np.round(rows[:, ATA], 2) * rows[:, TIME]
+        factors.append(np.nan if np.isnan(values).all() else float(np.nansum(values)))
+    return tuple(factors)
+
+
+def _hungriest_buddy(values):
+    # For each diver the largest value among the others (their own when alone)
+    if len(values) < 2:
+        return values.copy()
+    filled = np.where(np.isnan(values), -np.inf, values)
+    order = np.argsort(filled)
+    first, second = filled[order[-1]], filled[order[-2]]
+    buddy = np.full(len(values), first)
+    buddy[order[-1]] = second
+    return np.where(np.isinf(buddy), np.nan, buddy)
+
+
+def plan_mix(plan):
+    """The plan's bottom gas (first mix in Gas Mix; Air when blank)."""
+    return deco_engine.parse_gas_list(engine.normalize_plan(plan)[engine.GENERAL_INFO][1] or "Air")[0]
+
+
+def _fill_psi(team):
+    return np.where(np.isnan(team.fill), team.catalog.psi[team.cylinder], team.fill)
+
+
+def team_gas(team, factors, turn_fraction=TURN_FRACTION, z_table=None):
+    """Gas for every diver from ``plan_factors``; returns {output: array} keyed by ``OUTPUTS``.
+
+    With a ``real_gas.ZTable`` for the back gas, pressures are corrected for
+    compressibility (the linear factors give ideal-equivalent PSI).
+    """
+    bottom_factor, emergency_factor = factors
+    catalog, cylinder = team.catalog, team.cylinder
+    psi_per_cuft = catalog.psi_per_cuft[cylinder]
+    to_psi = (lambda ideal: ideal) if z_table is None else z_table.real_psi
+    fill = _fill_psi(team)
+    ideal_fill = fill if z_table is None else z_table.ideal_psi(fill)
+
+    bottom = team.sac * bottom_factor
+    emergency = team.emergency_sac * emergency_factor
+    reserve = emergency + _hungriest_buddy(emergency)
+    total = bottom + reserve
+
+    # Rule of thirds on the smallest usable volume (above rock bottom) in the team
+    usable = ideal_fill / psi_per_cuft - reserve
+    turn_volume = np.nanmin(usable) * turn_fraction if np.isfinite(usable).any() else np.nan
+    return {
+        "Bottom Gas (CUFT)": bottom,
+        "Reserve (CUFT)": reserve,
+        "Total (CUFT)": total,
+        "Total (PSI)": to_psi(total * psi_per_cuft),
+        "Rock Bottom (PSI)": to_psi(reserve * psi_per_cuft),
+        "Rock Bottom Per Tank (PSI)": to_psi(reserve * catalog.psi_per_tank_cuft[cylinder]),
+        "Turn (PSI)": to_psi(ideal_fill - turn_volume * psi_per_cuft),
+    }
+
+
+def short_of_gas(team, results):
+    """Divers whose fill pressure is below their Total (PSI)."""
+    return _fill_psi(team) < results["Total (PSI)"]
+
+
+def format_outputs(results):
+    """Columns of display text: CUFT to 1 decimal, PSI to whole numbers, blank for NaN."""
+    columns = []
+    for name in OUTPUTS:
+        spec = ".0f" if "PSI" in name else ".1f"
+        columns.append(["" if v != v else format(v, spec) for v in results[name].tolist()])
+    return columns
+
+
+def fill_plan(plan, results, i=0):
+    """Write diver ``i``'s totals into Total Back Gas Req (CUFT/PSI) and Rock Bottom (Total/Per Tank)."""
+    plan = engine.normalize_plan(plan)
+    cuft, psi, rock, per_tank = (engine.format_value(results[name][i], d) for name, d in (
+        ("Total (CUFT)", 1), ("Total (PSI)", 0), ("Rock Bottom (PSI)", 0), ("Rock Bottom Per Tank (PSI)", 0)))
+    if cuft:
+        plan[engine.GENERAL_INFO][4] = f"{cuft}/{psi}" if psi else cuft
+    if rock:
+        plan[engine.RESERVE][2] = f"{rock}/{per_tank}"
+    return plan
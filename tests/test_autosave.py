@@ -0,0 +1,124 @@
+"""autosave: journal recovery after torn or corrupt lines, and the writer's debounce."""
+import time
+
+import pytest
+
+import autosave
+import gas_engine as engine
+import plan_schema
+from autosave import Autosaver, encode_record
+
+KEY = (engine.GENERAL_INFO, 0)
+
+
+def example_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][0] = "130"
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["130", "", ".6", "20"]
+    return plan
+
+
+def write_journal(path, *records, tail=""):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(encode_record(record) for record in records)
+        f.write(tail)
+
+
+def cells(*changes):
+    return {"cells": [[list(key), text] for key, text in changes]}
+
+
+def test_recover_replays_snapshot_and_cells(tmp_path):
+    path = tmp_path / "journal"
+    write_journal(path, {"plan": example_plan()}, cells((KEY, "140")),
+                  cells(((engine.BOTTOM_GAS, 0, engine.TIME), "25"), (KEY, "150")))
+    plan = autosave.recover(path)
+    expected = example_plan()
+    expected[engine.GENERAL_INFO][0] = "150"
+    expected[engine.BOTTOM_GAS][0][engine.TIME] = "25"
+    assert plan == engine.normalize_plan(expected)
+
+
+def test_recover_missing_or_empty_journal(tmp_path):
+    assert autosave.recover(tmp_path / "missing") is None
+    write_journal(tmp_path / "journal", cells((KEY, "140")))
+    assert autosave.recover(tmp_path / "journal") is None
+
+
+def test_recover_stops_at_truncated_line(tmp_path):
+    path = tmp_path / "journal"
+    torn = encode_record(cells((KEY, "999")))
+    write_journal(path, {"plan": example_plan()}, cells((KEY, "140")), tail=torn[:-5])
+    assert autosave.recover(path)[engine.GENERAL_INFO][0] == "140"
+
+
+def test_recover_stops_at_bad_crc(tmp_path):
+    path = tmp_path / "journal"
+    bad = encode_record(cells((KEY, "999"))).replace("999", "998")
+    write_journal(path, {"plan": example_plan()}, cells((KEY, "140")),
+                  tail=bad + encode_record(cells((KEY, "150"))))
+    assert autosave.recover(path)[engine.GENERAL_INFO][0] == "140"
+
+
+def test_recover_ignores_cells_outside_plan(tmp_path):
+    path = tmp_path / "journal"
+    write_journal(path, {"plan": example_plan()},
+                  cells(((engine.BOTTOM_GAS, 40, 0), "1"), (("Nowhere", 0), "1"), (KEY, "140")))
+    assert autosave.recover(path)[engine.GENERAL_INFO][0] == "140"
+
+
+def test_recover_rejects_malformed_plan(tmp_path):
+    path = tmp_path / "journal"
+    write_journal(path, {"plan": {engine.BOTTOM_GAS: "not a table"}})
+    with pytest.raises(plan_schema.PlanFormatError):
+        autosave.recover(path)
+
+
+def test_autosaver_round_trip(tmp_path):
+    path = tmp_path / "journal"
+    saver = Autosaver(path, throttle=0.01)
+    saver.snapshot(example_plan())
+    saver.record([(KEY, "140")])
+    saver.close()
+    assert saver.error is None
+    assert autosave.recover(path)[engine.GENERAL_INFO][0] == "140"
+
+
+def test_autosaver_compacts(tmp_path):
+    path = tmp_path / "journal"
+    saver = Autosaver(path, throttle=0, compact_every=2)
+    saver.snapshot(example_plan())
+    for depth in range(140, 145):
+        saver.record([(KEY, str(depth))])
+        time.sleep(0.05)
+    saver.close()
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) <= 3
+    assert autosave.recover(path)[engine.GENERAL_INFO][0] == "144"
+
+
+def test_typing_burst_is_one_fsync(tmp_path):
+    # Keystrokes every 20 ms for longer than the throttle: the timer restarts on each one
+    saver = Autosaver(tmp_path / "journal", throttle=0.1, max_delay=10)
+    saver.snapshot(example_plan())
+    time.sleep(0.3)
+    assert saver.fsyncs == 1
+    for depth in range(140, 155):
+        saver.record([(KEY, str(depth))])
+        time.sleep(0.02)
+    assert saver.fsyncs == 1
+    time.sleep(0.3)
+    assert saver.fsyncs == 2
+    saver.close()
+    assert autosave.recover(tmp_path / "journal")[engine.GENERAL_INFO][0] == "154"
+
+
+def test_continuous_typing_still_saved(tmp_path):
+    saver = Autosaver(tmp_path / "journal", throttle=0.1, max_delay=0.15)
+    saver.snapshot(example_plan())
+    time.sleep(0.3)
+    for depth in range(140, 160):
+        saver.record([(KEY, str(depth))])
+        time.sleep(0.02)
+    assert saver.fsyncs >= 2
+    saver.close()
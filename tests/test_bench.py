@@ -0,0 +1,56 @@
+"""Benchmark suite plumbing: results file, baseline comparison and exit codes."""
+import importlib.util
+import json
+import os
+
+import pytest
+
+BENCH_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "bench.py")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench", BENCH_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_compare_flags_slowdowns(bench):
+    baseline = {"results": {"a": {"seconds": 1.0, "peak_bytes": 100}, "b": {"seconds": 2.0}}}
+    results = {"a": {"seconds": 1.1, "peak_bytes": 130}, "b": {"seconds": 1.0}, "c": {"seconds": 5.0}}
+    rows = {(name, metric): (ratio, regressed) for name, metric, old, new, ratio, regressed
+            in bench.compare(results, baseline, tolerance=0.15)}
+    assert rows[("a", "seconds")] == (pytest.approx(1.1), False)
+    assert rows[("a", "peak_bytes")] == (pytest.approx(1.3), True)
+    assert rows[("b", "seconds")] == (0.5, False)
+    assert ("c", "seconds") not in rows
+
+
+def test_run_records_errors(bench, monkeypatch):
+    def broken(sizes):
+        raise RuntimeError("boom")
+    monkeypatch.setitem(bench.BENCHMARKS, "broken", broken)
+    assert bench.run(["broken"], bench.SIZES["quick"]) == {"broken": {"error": "RuntimeError: boom"}}
+
+
+def test_entry_writes_shows_coalescing(bench):
+    result = bench.bench_entry_writes(dict(bench.SIZES["quick"], repeat=1))
+    assert result["keys"] == 16
+    assert result["burst_writes_per_key"] < result["typed_writes_per_key"] <= result["direct_writes_per_key"]
+
+
+def test_main_writes_results_and_compares(bench, tmp_path, capsys):
+    out = tmp_path / "new.json"
+    assert bench.main(["cell_graph_edit", "--quick", "-o", str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert set(report["meta"]) >= {"commit", "python", "numpy", "sizes"}
+    assert report["results"]["cell_graph_edit"]["seconds"] > 0
+    # A baseline far faster than anything achievable is a regression
+    report["results"]["cell_graph_edit"]["seconds"] = 1e-12
+    old = tmp_path / "old.json"
+    old.write_text(json.dumps(report))
+    assert bench.main(["cell_graph_edit", "--quick", "-o", str(out), "--baseline", str(old)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        bench.main(["no_such_benchmark"])
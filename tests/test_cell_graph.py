@@ -0,0 +1,89 @@
+"""CellGraph propagation: only downstream cells, each at most once, stopping at unchanged text."""
+import pytest
+
+import gas_engine as engine
+from cell_graph import CellGraph, plan_graph
+
+
+def counting_graph():
+    # a -> b -> c, and a, d -> e; calls records every formula evaluation
+    graph, calls = CellGraph(), []
+    for key in "abcde":
+        graph.add_cell(key)
+
+    def formula(name, fn):
+        def run(*values):
+            calls.append(name)
+            return fn(*values)
+        return run
+    graph.add_formula("b", ["a"], formula("b", lambda a: engine.format_value(a * 2, 0)))
+    graph.add_formula("c", ["b"], formula("c", lambda b: engine.format_value(b + 1, 0)))
+    graph.add_formula("e", ["a", "d"], formula("e", lambda a, d: engine.format_value(a + d, 0)))
+    return graph, calls
+
+
+def test_set_updates_downstream_in_order():
+    graph, calls = counting_graph()
+    graph.set("d", "1")
+    assert calls == ["e"]
+    calls.clear()
+    assert dict(graph.set("a", "2")) == {"b": "4", "c": "5", "e": "3"}
+    assert calls.index("b") < calls.index("c")
+
+
+def test_unchanged_text_stops_propagation():
+    graph, calls = counting_graph()
+    graph.set("a", "2")
+    calls.clear()
+    assert graph.set("a", "2") == []
+    assert calls == []
+    # b is the same after reformatting, so c is not re-evaluated
+    assert graph.set("a", "2.0") == []
+    assert sorted(calls) == ["b", "e"]
+
+
+def test_update_evaluates_each_formula_once():
+    graph, calls = counting_graph()
+    changes = graph.update({"a": "1", "d": "2"})
+    assert sorted(calls) == ["b", "c", "e"]
+    assert dict(changes) == {"b": "2", "c": "3", "e": "3"}
+
+
+def test_none_keeps_text():
+    graph = CellGraph()
+    graph.add_cell("a")
+    graph.add_cell("b", "kept")
+    graph.add_formula("b", ["a"], lambda a: None if a != a else "set")
+    assert graph.set("a", "x") == []
+    assert graph.text["b"] == "kept"
+    assert graph.set("a", "1") == [("b", "set")]
+
+
+def test_cycle_is_rejected():
+    graph = CellGraph()
+    graph.add_cell("a")
+    graph.add_cell("b")
+    graph.add_formula("a", ["b"], lambda b: "")
+    graph.add_formula("b", ["a"], lambda a: "")
+    with pytest.raises(ValueError):
+        graph.order()
+
+
+def test_keystroke_touches_only_affected_cells():
+    graph = plan_graph()
+    graph.recompute()
+    changes = dict(graph.set((engine.BOTTOM_GAS, 0, engine.DEPTH), "130"))
+    assert set(changes) == {(engine.BOTTOM_GAS, 0, engine.ATA), (engine.BOTTOM_GAS, 0, engine.PPO2)}
+    changes = dict(graph.set((engine.BOTTOM_GAS, 0, engine.SAC), ".6"))
+    assert changes == {}
+    changes = dict(graph.set((engine.BOTTOM_GAS, 0, engine.TIME), "20"))
+    assert changes[(engine.BOTTOM_GAS, 0, engine.GAS)] == "59.28"
+    assert all(key[0] in (engine.BOTTOM_GAS, engine.GENERAL_INFO) for key in changes)
+
+
+def test_recompute_returns_only_changed_cells():
+    graph = plan_graph()
+    first = dict(graph.recompute())
+    # The default deco ATAs are typed to one decimal and come back computed
+    assert first[(engine.DECO_GAS, 0, engine.ATA)] == "3.12"
+    assert graph.recompute() == []
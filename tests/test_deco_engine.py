@@ -0,0 +1,80 @@
+"""ZHL-16C with gradient factors: known schedules and what every schedule must satisfy."""
+import pytest
+
+import deco_engine
+import environment
+from deco_engine import Ascent, Tissues
+
+TRIMIX = deco_engine.parse_gas_list("21/35 + EAN50 + O2")
+EAN50, O2 = TRIMIX[1], TRIMIX[2]
+
+
+def test_known_trimix_schedule():
+    # 150 ft for 25 min on 21/35, EAN50 and O2, GF 30/80
+    schedule = deco_engine.plan_deco(150, 25, TRIMIX, 0.3, 0.8)
+    assert schedule.stops == [(70, 1, EAN50), (60, 1, EAN50), (50, 1, EAN50), (40, 1, EAN50),
+                              (30, 3, EAN50), (20, 12, O2)]
+    assert schedule.gas_switches == [(70, EAN50), (20, O2)]
+    assert schedule.first_stop == 70
+    assert schedule.runtime == pytest.approx(49)
+    assert schedule.units == "ft"
+
+
+def test_no_stop_dive():
+    schedule = deco_engine.plan_deco(60, 20, deco_engine.parse_gas_list("Air"), 0.3, 0.8)
+    assert schedule.stops == []
+    assert schedule.runtime == pytest.approx(22)   # 20 min + 2 min ascent at 30 ft/min
+
+
+def test_deco_gases_shorten_the_ascent():
+    back_gas_only = deco_engine.plan_deco(150, 25, TRIMIX[:1], 0.3, 0.8)
+    assert [stop[:2] for stop in back_gas_only.stops] == [(70, 1), (60, 1), (50, 2), (40, 4), (30, 7), (20, 71)]
+    assert back_gas_only.runtime > deco_engine.plan_deco(150, 25, TRIMIX, 0.3, 0.8).runtime
+
+
+def test_metric_schedule_uses_metric_stops():
+    env = environment.from_fields("", "", "m")
+    schedule = deco_engine.plan_deco(45, 25, TRIMIX, 0.3, 0.8, env)
+    assert [stop[:2] for stop in schedule.stops] == [(21, 1), (18, 1), (15, 1), (12, 1), (9, 2), (6, 12)]
+    assert schedule.units == "m"
+
+
+def test_altitude_adds_deco():
+    sea_level = deco_engine.plan_deco(150, 25, TRIMIX, 0.3, 0.8)
+    altitude = deco_engine.plan_deco(150, 25, TRIMIX, 0.3, 0.8, environment.from_fields("", "2000", ""))
+    assert altitude.runtime > sea_level.runtime
+
+
+@pytest.mark.parametrize("depth, minutes, gf", [(150, 25, (0.3, 0.8)), (200, 20, (0.5, 0.8)), (100, 40, (0.3, 0.7))])
+def test_schedule_is_safe_to_surface(depth, minutes, gf):
+    # Replaying the ascent's legs ends with the GF Hi ceiling at the surface
+    gf_lo, gf_hi = gf
+    ascent = Ascent.after_bottom(depth, minutes, TRIMIX[0])
+    gas_at = lambda d: deco_engine._best_gas(d, TRIMIX)
+    while ascent.depth > 0:
+        ascent.step(gas_at, gf_lo, gf_hi)
+    tissues = Ascent.after_bottom(depth, minutes, TRIMIX[0]).tissues
+    for start, end, leg_minutes, gas in ascent.legs:
+        tissues.segment(start, end, leg_minutes, gas)
+    assert tissues.ceiling(gf_hi) == 0
+    stops = ascent.schedule().stops
+    assert all(stop_depth % deco_engine.STOP_INTERVAL == 0 for stop_depth, _, _ in stops)
+    assert stops[-1][0] == deco_engine.LAST_STOP
+
+
+def test_surface_tissues_at_altitude_are_lower():
+    env = environment.from_fields("", "3000", "m")
+    assert (Tissues(env=env).n2 < Tissues().n2).all()
+
+
+@pytest.mark.parametrize("text, gas", [("Air", (0.21, 0.0)), ("EAN32", (0.32, 0.0)), ("O2", (1.0, 0.0)),
+                                       ("TMX 18/45", (0.18, 0.45)), ("50%", (0.5, 0.0))])
+def test_parse_gas(text, gas):
+    assert deco_engine.parse_gas(text) == pytest.approx(gas)
+
+
+def test_parse_errors():
+    with pytest.raises(ValueError):
+        deco_engine.parse_gas("21/90")
+    with pytest.raises(ValueError):
+        deco_engine.parse_gradient_factors("80/30")
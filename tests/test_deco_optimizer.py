@@ -0,0 +1,79 @@
+"""Deco optimizer: the memoised, pooled search must match plain plan_deco runs."""
+import pytest
+
+import deco_engine
+import deco_optimizer
+import environment
+import gas_engine as engine
+from deco_engine import parse_gas, parse_gas_list
+
+BOTTOM = parse_gas("21/35")
+GASES = parse_gas_list("EAN50, EAN80, O2")
+
+
+def schedule_key(schedule):
+    return schedule.stops, schedule.runtime
+
+
+def test_memoised_search_matches_plan_deco():
+    candidates = deco_optimizer.optimize(150, 25, BOTTOM, GASES, 0.3, 0.8, workers=1)
+    assert len(candidates) > 20
+    for candidate in candidates:
+        expected = deco_engine.plan_deco(150, 25, [BOTTOM] + [gas for _, gas in candidate.switches], 0.3, 0.8,
+                                         switches=list(candidate.switches))
+        assert schedule_key(candidate.schedule) == schedule_key(expected)
+    runtimes = [c.runtime for c in candidates]
+    assert runtimes == sorted(runtimes)
+
+
+def test_pool_gives_the_same_result():
+    kwargs = dict(max_gases=3, objective="gas")
+    single = deco_optimizer.optimize(200, 25, parse_gas("18/45"), parse_gas_list("35/25, EAN50, EAN80, O2"), 0.3, 0.8,
+                                     workers=1, **kwargs)
+    pooled = deco_optimizer.optimize(200, 25, parse_gas("18/45"), parse_gas_list("35/25, EAN50, EAN80, O2"), 0.3, 0.8,
+                                     workers=2, **kwargs)
+    assert len(single) >= deco_optimizer.POOL_MIN_PROFILES
+    assert [(c.switches, schedule_key(c.schedule)) for c in pooled] == \
+           [(c.switches, schedule_key(c.schedule)) for c in single]
+    assert [c.total_gas for c in pooled] == pytest.approx([c.total_gas for c in single])
+    totals = [c.total_gas for c in single]
+    assert totals == sorted(totals)
+
+
+def test_switch_plans_respect_mod_and_order():
+    plans = list(deco_optimizer.switch_plans(BOTTOM, GASES, 150, max_gases=2))
+    assert plans[0] == ()
+    for plan in plans:
+        depths = [depth for depth, _ in plan]
+        assert depths == sorted(depths, reverse=True) and len(set(depths)) == len(depths)
+        fo2s = [gas[0] for _, gas in plan]
+        assert fo2s == sorted(fo2s)
+        assert all(deco_engine.breathable(depth, gas[0]) for depth, gas in plan)
+    assert max(depth for plan in plans for depth, gas in plan if gas == parse_gas("O2")) == 20
+    metric = environment.from_fields("", "", "m")
+    assert deco_optimizer.switch_depths(parse_gas("EAN50"), 45, env=metric) == [21, 18, 15, 12, 9, 6]
+
+
+def test_cylinders():
+    assert deco_optimizer.parse_cylinders("AL40, Steel 50 50") == [("AL40", 40.0), ("Steel 50", 50.0)]
+    with pytest.raises(ValueError):
+        deco_optimizer.parse_cylinders("Mystery tank")
+    cylinders = [("AL80", 80.0), ("AL40", 40.0), ("AL30", 30.0)]
+    assert deco_optimizer.assign_cylinders({"a": 35, "b": 25}, cylinders) == {"a": ("AL40", 40.0), "b": ("AL30", 30.0)}
+    assert deco_optimizer.assign_cylinders({"a": 90}, cylinders) is None
+    candidates = deco_optimizer.optimize(150, 25, BOTTOM, GASES, 0.3, 0.8, cylinders=[("AL40", 40.0)], workers=1)
+    assert all(len(c.switches) <= 1 for c in candidates)
+    assert all(c.requirements[gas] <= 40 for c in candidates for _, gas in c.switches)
+
+
+def test_fill_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][:4] = ["150", "21/35", "25", "30/80"]
+    best = deco_optimizer.optimize_plan(plan, GASES, workers=1)[0]
+    filled = deco_optimizer.fill_plan(plan, best)
+    assert filled[engine.GENERAL_INFO][1] == "21/35 + " + ", ".join(
+        deco_engine.gas_name(gas) for _, gas in best.switches)
+    assert filled[engine.GENERAL_INFO][5] == f"{best.deco_gas:.1f}"
+    assert filled[engine.DECO_STOPS][0][0] == f"{best.schedule.stops[0][0]:g}"
+    with pytest.raises(ValueError):
+        deco_optimizer.optimize(150, 25, BOTTOM, GASES, 0.3, 0.8, objective="fastest")
@@ -0,0 +1,111 @@
+"""Dive-log calibration: SAC windows from synthetic dives, chunking, CSV and UDDF readers."""
+import numpy as np
+import pytest
+
+import dive_log
+import gas_engine as engine
+from dive_log import Calibrator, SacHistogram
+
+CUFT_PER_PSI = 154.8 / 3000
+
+
+def synthetic_dive(bottom_sac=0.6, deco_sac=0.45, step=10):
+    """(seconds, depth ft, pressure psi): 2 min descent, 24 min at 130 ft, 4 min ascent, 12 min at 20 ft."""
+    legs = [(120, 0, 130, bottom_sac), (1440, 130, 130, bottom_sac), (240, 130, 20, bottom_sac),
+            (720, 20, 20, deco_sac)]
+    seconds, depth, pressure = [0.0], [0.0], [3000.0]
+    for duration, start, end, sac in legs:
+        for t in range(step, duration + 1, step):
+            d = start + (end - start) * t / duration
+            ata = engine.depth_to_ata((depth[-1] + d) / 2)
+            pressure.append(pressure[-1] - sac * ata * step / 60 / CUFT_PER_PSI)
+            seconds.append(seconds[-1] + step)
+            depth.append(d)
+    return np.array(seconds), np.array(depth), np.array(pressure)
+
+
+def calibrate(chunks, window=dive_log.WINDOW_SECONDS):
+    calibrator = Calibrator(window)
+    calibrator.start_dive("A", CUFT_PER_PSI)
+    for chunk in chunks:
+        calibrator.add(*chunk)
+    return calibrator
+
+
+def test_bottom_deco_and_emergency_sac():
+    summary = calibrate([synthetic_dive()]).summary()["A"]
+    assert summary["dives"] == 1
+    assert summary["sac"] == pytest.approx(0.6, abs=0.01)
+    assert summary["deco_sac"] == pytest.approx(0.45, abs=0.01)
+    assert summary["emergency_sac"] == pytest.approx(0.6, abs=0.02)
+    # 2-minute windows over a 42-minute dive, minus the descent and surface windows
+    assert 15 <= summary["windows"] <= 21
+
+
+def test_chunk_boundaries_do_not_change_the_windows():
+    seconds, depth, pressure = synthetic_dive()
+    whole = calibrate([(seconds, depth, pressure)])
+    for size in (1, 7, 12, 100):
+        chunks = [(seconds[i:i + size], depth[i:i + size], pressure[i:i + size]) for i in range(0, len(seconds), size)]
+        chunked = calibrate(chunks)
+        for phase in dive_log.PHASES:
+            assert np.array_equal(chunked.divers["A"].histograms[phase].counts,
+                                  whole.divers["A"].histograms[phase].counts)
+
+
+def test_gas_switch_and_shallow_windows_are_skipped():
+    seconds = np.arange(0, 1200, 10.0)
+    depth = np.full(seconds.shape, 5.0)          # a surface swim
+    pressure = 3000 - seconds / 10
+    summary = calibrate([(seconds, depth, pressure)]).summary()["A"]
+    assert summary["windows"] == 0 and summary["sac"] != summary["sac"]
+    depth = np.full(seconds.shape, 60.0)
+    pressure = np.full(seconds.shape, 3000.0)   # no drop: switched to another cylinder
+    assert calibrate([(seconds, depth, pressure)]).summary()["A"]["windows"] == 0
+
+
+def test_histogram_merge():
+    a, b = SacHistogram(), SacHistogram()
+    a.add(np.array([0.5, 0.6]))
+    b.add(np.array([0.7, 9.0]))
+    a.merge(b)
+    assert a.n == 4 and a.mean == pytest.approx(2.7)
+    assert a.percentile(100) == pytest.approx(dive_log.SAC_MAX - dive_log.SAC_BIN / 2)
+
+
+def test_csv_metric_and_bar(tmp_path):
+    seconds, depth, pressure = synthetic_dive()
+    path = tmp_path / "log.csv"
+    lines = ["Dive #,Sample time (min),Sample depth (m),Sample pressure (bar)"]
+    for dive in (1, 2):
+        lines += [f"{dive},{t / 60:.6f},{d / dive_log.FEET_PER_METRE:.6f},{p / dive_log.PSI_PER_BAR:.6f}"
+                  for t, d, p in zip(seconds, depth, pressure)]
+    path.write_text("\n".join(lines))
+    summary = dive_log.calibrate([str(path)], cylinder="Double AL80")["log"]
+    assert summary["dives"] == 2
+    assert summary["sac"] == pytest.approx(0.6, abs=0.01)
+    with pytest.raises(ValueError):
+        dive_log.calibrate([str(path)], cylinder="Bogus")
+
+
+def test_uddf(tmp_path):
+    seconds, depth, pressure = synthetic_dive()
+    waypoints = "".join(
+        f"<waypoint><divetime>{t:g}</divetime><depth>{d / dive_log.FEET_PER_METRE:.6f}</depth>"
+        f"<tankpressure>{p * dive_log.PA_PER_PSI:.3f}</tankpressure></waypoint>"
+        for t, d, p in zip(seconds, depth, pressure))
+    path = tmp_path / "log.uddf"
+    path.write_text(f'<uddf xmlns="http://www.streit.cc/uddf/3.2/"><diver><owner><personal>'
+                    f'<firstname>Sam</firstname><lastname>Diver</lastname></personal></owner></diver>'
+                    f'<profiledata><repetitiongroup><dive><samples>{waypoints}</samples></dive>'
+                    f'</repetitiongroup></profiledata></uddf>')
+    summary = dive_log.calibrate([str(path)], cylinder="Double AL80")
+    assert list(summary) == ["Sam Diver"]
+    assert summary["Sam Diver"]["sac"] == pytest.approx(0.6, abs=0.01)
+
+
+def test_fill_plan():
+    plan = dive_log.fill_plan(engine.empty_plan(), {"sac": 0.55, "deco_sac": float("nan"), "emergency_sac": 1.1})
+    assert plan[engine.BOTTOM_GAS][0][engine.SAC] == "0.55"
+    assert plan[engine.EMERGENCY][1][engine.SAC] == "1.10"
+    assert plan[engine.DECO_GAS][0][engine.SAC] == engine.DEFAULT_DECO_SAC[0]
@@ -0,0 +1,103 @@
+"""gas_engine's batched evaluation and the GUI's cell graph must give the same sheet."""
+import random
+
+import pytest
+
+import gas_engine as engine
+from cell_graph import plan_graph
+
+MIXES = ["", "Air", "EAN32", "21/35 + EAN50 + O2", "18/45, EAN50; O2", "10/70 + O2", "bogus"]
+ENVIRONMENTS = [["", "", ""], ["Fresh", "", "ft"], ["salt", "1500", "m"], ["f", "3000", "feet"],
+                ["x", "", ""], ["", "abc", "m"]]
+
+
+def random_text(rng):
+    return rng.choice(["", "abc", str(rng.randint(0, 200)), f"{rng.uniform(0, 3):.2f}"])
+
+
+def random_plan(rng):
+    plan = engine.empty_plan(rng.randint(6, 15), rng.randint(1, 4))
+    for section in engine.SECTION_ORDER:
+        if section in engine.ENTRY_ROWS:
+            plan[section] = [random_text(rng) for _ in plan[section]]
+        else:
+            plan[section] = [[random_text(rng) for _ in row] for row in plan[section]]
+    plan[engine.GENERAL_INFO][1] = rng.choice(MIXES)
+    plan[engine.ENVIRONMENT] = list(rng.choice(ENVIRONMENTS))
+    return plan
+
+
+def graph_plan(graph, plan):
+    # The graph's cells laid out as a plan
+    out = engine.normalize_plan(plan)
+    for key, text in graph.text.items():
+        if len(key) == 2:
+            out[key[0]][key[1]] = text
+        else:
+            out[key[0]][key[1]][key[2]] = text
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_graph_recompute_matches_engine(seed):
+    rng = random.Random(seed)
+    plans = [random_plan(rng) for _ in range(40)]
+    for plan, expected in zip(plans, engine.recompute_plans(plans)):
+        graph = plan_graph(plan)
+        graph.recompute()
+        assert graph_plan(graph, plan) == expected
+
+
+def test_batch_matches_single_plans():
+    rng = random.Random(10)
+    plans = [random_plan(rng) for _ in range(40)]
+    assert engine.recompute_plans(plans) == [engine.recompute_plan(plan) for plan in plans]
+
+
+def test_incremental_edits_match_engine():
+    rng = random.Random(20)
+    for _ in range(10):
+        plan = engine.recompute_plan(random_plan(rng))
+        graph = plan_graph(plan)
+        inputs = [key for key in graph.text if key not in graph.formulas]
+        for _ in range(25):
+            key = rng.choice(inputs)
+            if key[0] == engine.ENVIRONMENT:
+                text = rng.choice(ENVIRONMENTS)[key[1]]
+            elif key == (engine.GENERAL_INFO, 1):
+                text = rng.choice(MIXES)
+            else:
+                text = random_text(rng)
+            graph.set(key, text)
+        current = graph_plan(graph, plan)
+        assert current == engine.recompute_plan(current)
+
+
+def test_default_sheet_values():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][0] = "130"
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.EMERGENCY][0][engine.SAC:engine.GAS] = ["1.2", "4"]
+    plan[engine.EMERGENCY][1][engine.SAC:engine.GAS] = ["1.2", "3"]
+    em = engine.recompute_plan(plan)[engine.EMERGENCY]
+    assert [row[engine.DEPTH] for row in em] == ["130", "100.0", "70"]
+    assert [row[engine.ATA] for row in em] == ["4.94", "4.03", "3.12"]
+    assert em[2][engine.GAS] == "38.2"
+
+
+def test_blank_depth_blanks_ata():
+    plan = engine.empty_plan()
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["130", "", ".6", "20"]
+    plan = engine.recompute_plan(plan)
+    assert plan[engine.BOTTOM_GAS][0][engine.ATA] == "4.94"
+    graph = plan_graph(plan)
+    graph.set((engine.BOTTOM_GAS, 0, engine.DEPTH), "")
+    graph.set((engine.DECO_GAS, 0, engine.DEPTH), "")
+    assert graph.text[(engine.BOTTOM_GAS, 0, engine.ATA)] == ""
+    assert graph.text[(engine.BOTTOM_GAS, 0, engine.GAS)] == ""
+    assert graph.text[(engine.DECO_GAS, 0, engine.ATA)] == ""
+    plan[engine.BOTTOM_GAS][0][engine.DEPTH] = ""
+    plan[engine.DECO_GAS][0][engine.DEPTH] = ""
+    plan = engine.recompute_plan(plan)
+    assert plan[engine.BOTTOM_GAS][0][engine.ATA] == ""
+    assert plan[engine.DECO_GAS][0][engine.ATA] == ""
@@ -0,0 +1,108 @@
+"""environment: parsing the Environment fields, depth -> pressure, and converting a plan's units."""
+import pytest
+
+import environment
+import gas_engine as engine
+from environment import FEET, FRESH, METRES, SALT, Environment
+
+
+@pytest.mark.parametrize("text, units", [("", FEET), ("ft", FEET), (" Feet ", FEET), ("imperial", FEET),
+                                         ("m", METRES), ("Metres", METRES), ("metric", METRES)])
+def test_parse_units(text, units):
+    assert environment.parse_units(text) == units
+
+
+@pytest.mark.parametrize("text, water", [("", SALT), ("Salt", SALT), ("sea", SALT), ("Fresh", FRESH), ("f", FRESH)])
+def test_parse_water(text, water):
+    assert environment.parse_water(text) == water
+
+
+@pytest.mark.parametrize("water, altitude, units", [("lake", "", ""), ("", "high", ""), ("", "", "yards"),
+                                                    ("", "7000", "m"), ("", "-2000", "ft")])
+def test_from_fields_rejects(water, altitude, units):
+    with pytest.raises(ValueError):
+        environment.from_fields(water, altitude, units)
+
+
+def test_from_fields_shares_instances():
+    assert environment.from_fields() is environment.DEFAULT
+    assert environment.from_fields("Fresh", "300", "m") is environment.from_fields("Fresh", "300", "m")
+    assert environment.from_fields("Fresh", "300", "m") == Environment(FRESH, 300, METRES)
+    assert environment.DEFAULT.key == (SALT, 0.0, FEET)
+
+
+def test_default_is_sheet_rule():
+    env = environment.DEFAULT
+    for depth in (0, 33, 130, 187.5):
+        assert env.depth_to_ata(depth) == pytest.approx(depth / 33 + 1)
+    assert env.sheet_ata(130) == 4.94
+    assert env.ata_to_depth(env.depth_to_ata(130)) == pytest.approx(130)
+
+
+def test_fresh_water_and_metres():
+    assert Environment(FRESH).depth_per_atm == pytest.approx(33 * 1.025)
+    metric = Environment(SALT, 0, METRES)
+    assert metric.depth_per_atm == pytest.approx(33 * 0.3048)
+    assert metric.sheet_ata(30) == 3.98
+    assert (metric.stop_interval, metric.last_stop, metric.ascent_rate) == (3, 6, 9)
+    # The same water column in feet and in metres is the same pressure
+    feet = Environment(FRESH, 1000, FEET)
+    metres = Environment(FRESH, 1000 * 0.3048, METRES)
+    assert metres.depth_to_ata(30) == pytest.approx(feet.depth_to_ata(30 / 0.3048))
+
+
+def test_altitude_lowers_surface_pressure():
+    assert environment.surface_ata(0) == 1
+    assert environment.surface_ata(1500) == pytest.approx(84.56 / 101.325, abs=1e-4)
+    env = Environment(SALT, 1500, METRES)
+    assert env.depth_to_ata(0) == pytest.approx(environment.surface_ata(1500))
+    assert env.depth_to_ata(10) < Environment(SALT, 0, METRES).depth_to_ata(10)
+
+
+def test_convert_depth():
+    assert environment.convert_depth(100, FEET, FEET) == 100
+    assert environment.convert_depth(100, FEET, METRES) == pytest.approx(30.48)
+    assert environment.convert_depth(30.48, METRES, FEET) == pytest.approx(100)
+
+
+def example_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][0] = "130"
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.ENVIRONMENT] = ["Fresh", "1000", "ft"]
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["130", "", ".6", "20"]
+    for r, depth in enumerate(["70", "60", "50", "40", "30", "20"]):
+        plan[engine.DECO_STOPS][r][0] = depth
+        plan[engine.DECO_GAS][r][engine.DEPTH] = depth
+    return plan
+
+
+def test_convert_plan_to_metres():
+    plan = engine.convert_depth_units(example_plan(), METRES)
+    assert plan[engine.ENVIRONMENT] == ["Fresh", "304.8", METRES]
+    assert plan[engine.GENERAL_INFO][0] == "39.6"
+    assert plan[engine.RESERVE][0] == "21.3"
+    assert plan[engine.BOTTOM_GAS][0][engine.DEPTH] == "39.6"
+    # Stops snap to 3 m
+    assert [row[0] for row in plan[engine.DECO_STOPS]] == ["21", "18", "15", "12", "9", "6"]
+    assert [row[engine.DEPTH] for row in plan[engine.DECO_GAS][:-1]] == ["21", "18", "15", "12", "9", "6"]
+    # Inputs other than depths are untouched
+    assert plan[engine.BOTTOM_GAS][0][engine.SAC:engine.GAS] == [".6", "20"]
+
+
+def test_convert_plan_round_trip():
+    original = example_plan()
+    back = engine.convert_depth_units(engine.convert_depth_units(original, METRES), FEET)
+    assert back[engine.GENERAL_INFO][0] == "129.9"
+    assert [row[0] for row in back[engine.DECO_STOPS]] == ["70", "60", "50", "40", "30", "20"]
+    assert back[engine.ENVIRONMENT][engine.ALTITUDE] == "1000"
+    # Converting to the units the plan already has changes nothing
+    assert engine.convert_depth_units(original, FEET) == engine.normalize_plan(original)
+
+
+def test_converted_plan_keeps_pressures():
+    feet = engine.recompute_plan(example_plan())
+    metres = engine.recompute_plan(engine.convert_depth_units(example_plan(), METRES))
+    assert metres[engine.BOTTOM_GAS][0][engine.ATA] == feet[engine.BOTTOM_GAS][0][engine.ATA]
+    assert float(metres[engine.BOTTOM_GAS][0][engine.GAS]) == pytest.approx(
+        float(feet[engine.BOTTOM_GAS][0][engine.GAS]), abs=0.2)
@@ -0,0 +1,91 @@
+"""oxygen: CNS % and OTU against the NOAA table and the OTU formula, and the O2 warnings."""
+import numpy as np
+import pytest
+
+import gas_engine as engine
+import oxygen
+
+
+@pytest.mark.parametrize("ppo2, limit", oxygen.NOAA_CNS_LIMITS)
+def test_cns_at_table_points(ppo2, limit):
+    cns, _ = oxygen.exposure(ppo2, limit)
+    assert cns == pytest.approx(100, abs=1e-9)
+
+
+def test_cns_interpolates_and_extrapolates():
+    # Halfway between 1.3 (180 min) and 1.4 (150 min) in rate
+    cns, _ = oxygen.exposure(1.35, 60)
+    assert cns == pytest.approx(60 * (100 / 180 + 100 / 150) / 2)
+    slope = (100 / 45 - 100 / 120) / 0.1
+    cns, _ = oxygen.exposure(1.7, 1)
+    assert cns == pytest.approx(100 / 45 + slope * 0.1)
+
+
+@pytest.mark.parametrize("ppo2", [0.55, 0.8, 1.0, 1.4, 1.6, 2.2])
+def test_otu_formula(ppo2):
+    _, otu = oxygen.exposure(ppo2, 30)
+    assert otu == pytest.approx(30 * ((ppo2 - 0.5) / 0.5) ** 0.83, rel=1e-3)
+
+
+def test_nothing_accrues_at_low_ppo2():
+    cns, otu = oxygen.exposure([0.0, 0.21, 0.5], [60, 60, 60])
+    assert cns.tolist() == [0, 0, 0]
+    assert otu.tolist() == [0, 0, 0]
+
+
+def test_exposure_keeps_nan_and_clamps_above_grid():
+    cns, otu = oxygen.exposure([np.nan, 1.4], [10, np.nan])
+    assert np.isnan(cns).all() and np.isnan(otu).all()
+    assert oxygen.exposure(5.0, 1) == oxygen.exposure(oxygen.PPO2_MAX, 1)
+
+
+def test_grid_is_monotonic():
+    assert oxygen.PPO2_GRID[0] == 0 and oxygen.PPO2_GRID[-1] == oxygen.PPO2_MAX
+    assert (np.diff(oxygen.CNS_RATE) >= 0).all()
+    assert (np.diff(oxygen.OTU_RATE) >= 0).all()
+
+
+def test_breathing_fo2_picks_richest_allowed_gas():
+    mixes = [0.21, 0.5, 1.0, np.nan]
+    # 2.2 ATA: EAN50 gives 1.1, O2 gives 2.2; 1.6 ATA: O2 is exactly the limit
+    fo2 = oxygen.breathing_fo2([mixes] * 4, [5.0, 3.2, 2.2, 1.6])
+    assert fo2.tolist() == [0.21, 0.5, 0.5, 1.0]
+    # The bottom gas is always allowed, even when over the limit
+    assert oxygen.breathing_fo2([0.5, 0.32], 4.0) == 0.5
+
+
+def test_max_ppo2_skips_segments_without_time():
+    assert oxygen.max_ppo2([1.2, 1.5, 1.3], [10, 0, 5]) == 1.3
+    assert np.isnan(oxygen.max_ppo2([1.2, 1.5], [0, np.nan]))
+
+
+@pytest.mark.parametrize("cns, otu, bottom, deco, expected", [
+    (10, 50, 1.2, 1.6, ""),
+    (10, 50, 1.44, 1.6, ""),
+    (10, 50, 1.46, 1.5, "bottom ppO2 1.46 over 1.4"),
+    (10, 50, 1.3, 1.66, "ppO2 1.66 over 1.6"),
+    (85, 50, np.nan, np.nan, "CNS 85%"),
+    (120, 320, 1.2, np.nan, "CNS 120% over 100%; OTU 320 over 300"),
+])
+def test_warnings(cns, otu, bottom, deco, expected):
+    assert oxygen.warnings(cns, otu, bottom, deco) == expected
+
+
+def test_plan_totals():
+    # 20 min on EAN32 at 99 ft (ppO2 1.28) and 10 min on O2 at 20 ft (1.61, within 1.6 to one decimal)
+    plan = engine.empty_plan(1, 1)
+    plan[engine.GENERAL_INFO][1] = "EAN32 + O2"
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["99", "", ".6", "20"]
+    plan[engine.DECO_STOPS][0] = ["20", "10"]
+    plan[engine.DECO_GAS][0][:engine.TIME] = ["20", "", ".6"]
+    plan = engine.recompute_plan(plan)
+    bottom, deco = plan[engine.BOTTOM_GAS][0], plan[engine.DECO_GAS][0]
+    assert (bottom[engine.PPO2], deco[engine.PPO2]) == ("1.28", "1.61")
+    cns = [float(bottom[engine.CNS]), float(deco[engine.CNS])]
+    otu = [float(bottom[engine.OTU]), float(deco[engine.OTU])]
+    assert cns[0] == pytest.approx(oxygen.exposure(1.28, 20)[0], abs=0.05)
+    assert otu[1] == pytest.approx(oxygen.exposure(1.61, 10)[1], abs=0.05)
+    info = plan[engine.GENERAL_INFO]
+    assert float(info[engine.CNS_TOTAL]) == pytest.approx(sum(cns), abs=0.1)
+    assert float(info[engine.OTU_TOTAL]) == pytest.approx(sum(otu), abs=0.1)
+    assert info[engine.O2_WARNINGS] == ""
@@ -0,0 +1,64 @@
+"""PDF rendering: progress, cancellation and lazy streaming of many plans."""
+import threading
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import gas_engine as engine
+import pdf_export
+
+
+def test_plan_tables_layout():
+    tables = pdf_export.plan_tables(engine.empty_plan())
+    assert [title for title, rows in tables] == engine.SECTION_ORDER
+    info = dict(tables)[engine.GENERAL_INFO]
+    assert info[1] == ["Max Depth", ""]
+    deco = dict(tables)[engine.DECO_GAS]
+    assert deco[0] == engine.GAS_HEADERS and deco[-1][engine.TIME] == engine.DECO_TOTAL_LABEL
+
+
+def test_write_pdf_reports_progress(tmp_path):
+    path = tmp_path / "plan.pdf"
+    calls = []
+    tables = pdf_export.plan_tables(engine.recompute_plan(engine.empty_plan()))
+    pdf_export.write_pdf(str(path), tables, progress=lambda done, total: calls.append((done, total)))
+    assert path.read_bytes().startswith(b"%PDF")
+    assert calls == [(i, len(tables)) for i in range(1, len(tables) + 1)]
+
+
+def test_cancel_removes_the_partial_file(tmp_path):
+    path = tmp_path / "plan.pdf"
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(pdf_export.ExportCancelled):
+        pdf_export.write_pdf(str(path), pdf_export.plan_tables(engine.empty_plan()), cancel=cancel)
+    assert not path.exists()
+
+
+def test_plans_are_consumed_lazily(tmp_path):
+    loaded = []
+
+    def plans():
+        for i in range(5):
+            loaded.append(i)
+            yield f"Plan {i}", engine.empty_plan()
+
+    seen = []
+
+    def progress(done, total):
+        # Sections of plan k are rendered before plan k + 1 is loaded
+        seen.append((done, len(loaded)))
+    pdf_export.write_plans_pdf(str(tmp_path / "all.pdf"), plans(), 5, progress=progress)
+    per_plan = len(engine.SECTION_ORDER)
+    assert len(seen) == 5 * per_plan
+    assert all(n_loaded <= (done - 1) // per_plan + 2 for done, n_loaded in seen)
+    assert loaded == list(range(5))
+
+
+def test_progress_counts_split_tables_once(tmp_path):
+    plan = engine.recompute_plan(engine.empty_plan(stops=120, bottom_rows=40))
+    tables = pdf_export.plan_tables(plan)
+    calls = []
+    pdf_export.write_pdf(str(tmp_path / "long.pdf"), tables, progress=lambda done, total: calls.append(done))
+    assert calls == list(range(1, len(tables) + 1))
@@ -0,0 +1,68 @@
+"""plan_batch: recomputed output per file, with every failure isolated to its own file."""
+import json
+import os
+
+import gas_engine as engine
+import plan_batch
+import plan_schema
+
+
+def write_plans(folder, count):
+    paths = []
+    for i in range(count):
+        plan = engine.empty_plan()
+        plan[engine.GENERAL_INFO][0] = str(100 + i)
+        plan[engine.BOTTOM_GAS][0][:engine.GAS] = [str(100 + i), "", ".7", "20"]
+        path = os.path.join(folder, f"plan{i}.json")
+        plan_schema.write_plan(path, plan)
+        paths.append(path)
+    return paths
+
+
+def test_recomputes_each_file(tmp_path):
+    paths = write_plans(tmp_path, 3)
+    out = tmp_path / "out"
+    results = plan_batch.run(paths, str(out), workers=1)
+    assert results == dict.fromkeys(paths)
+    plan = plan_schema.read_plan(out / "plan2.json")
+    assert plan[engine.BOTTOM_GAS][0][engine.ATA] == "4.09"
+    assert plan[engine.EMERGENCY][0][engine.DEPTH] == "102"
+
+
+def test_unreadable_file_fails_alone(tmp_path):
+    paths = write_plans(tmp_path, 3)
+    (tmp_path / "plan1.json").write_text("{not json")
+    results = plan_batch.process_batch(paths, str(tmp_path), str(tmp_path / "out"))
+    assert [path for path, error in results] == paths
+    assert results[0][1] is None and results[2][1] is None
+    assert results[1][1].startswith("PlanFormatError")
+
+
+def test_engine_failure_fails_only_its_file(tmp_path, monkeypatch):
+    paths = write_plans(tmp_path, 4)
+    recompute_plans = engine.recompute_plans
+
+    def fragile(plans):
+        if any(plan[engine.GENERAL_INFO][0] == "102" for plan in plans):
+            raise FloatingPointError("bad plan")
+        return recompute_plans(plans)
+    monkeypatch.setattr(engine, "recompute_plans", fragile)
+    results = dict(plan_batch.process_batch(paths, str(tmp_path), str(tmp_path / "out")))
+    assert results[paths[2]] == "FloatingPointError: bad plan"
+    assert [results[p] for p in paths if p != paths[2]] == [None, None, None]
+    assert sorted(os.listdir(tmp_path / "out")) == ["plan0.json", "plan1.json", "plan3.json"]
+    assert json.loads((tmp_path / "out" / "plan3.json").read_text())
+
+
+def test_rerun_skips_its_own_output(tmp_path, monkeypatch):
+    write_plans(tmp_path, 2)
+    (tmp_path / "nested").mkdir()
+    write_plans(tmp_path / "nested", 1)
+    monkeypatch.chdir(tmp_path)
+    assert plan_batch.main([".", "-q", "-j", "1"]) == 0
+    assert sorted(os.listdir(tmp_path / "batch_output")) == ["nested", "plan0.json", "plan1.json"]
+    found = plan_batch.find_plans(["."], exclude="batch_output")
+    assert found == [os.path.join("nested", "plan0.json"), "plan0.json", "plan1.json"]
+    assert plan_batch.main([".", "-q", "-j", "1"]) == 0
+    assert not (tmp_path / "batch_output" / "batch_output").exists()
+    assert len(plan_batch.find_plans(["."])) == 6
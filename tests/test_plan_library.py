@@ -0,0 +1,116 @@
+"""PlanLibrary: indexed search, upsert by source and the stored file format."""
+import json
+
+import pytest
+
+import gas_engine as engine
+import plan_schema
+from plan_library import PlanLibrary, parse_range
+
+
+def make_plan(depth, mix="21/35", time="20", gf="30/80", units=""):
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][:4] = [depth, mix, time, gf]
+    plan[engine.ENVIRONMENT][engine.DEPTH_UNITS] = units
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = [depth, "", ".7", time]
+    return plan
+
+
+@pytest.fixture
+def library():
+    library = PlanLibrary(":memory:")
+    yield library
+    library.close()
+
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+
+def test_search_filters(library):
+    library.add(make_plan("130"), "a")
+    library.add(make_plan("150", "18/45", "25", "40/85"), "b")
+    library.add(make_plan("100", "EAN32"), "c")
+    library.add(make_plan("45", units="m"), "metric")
+    assert names(library.search()) == ["c", "a", "metric", "b"]
+    assert names(library.search(max_depth=(120, 150))) == ["a", "metric", "b"]
+    assert names(library.search(max_depth=(40, 45), depth_units="m")) == ["metric"]
+    assert names(library.search(gas_mix="21/35")) == ["a", "metric"]
+    assert names(library.search(trimix=False)) == ["c"]
+    assert names(library.search(trimix=True, bottom_time=(25, 30))) == ["b"]
+    assert names(library.search(gf="40/85")) == ["b"]
+    assert names(library.search(limit=2)) == ["c", "a"]
+    row = library.search(gf="40/85")[0]
+    assert (row["max_depth"], row["gf_lo"], row["gf_hi"]) == (150, 40, 85)
+    assert library.search(max_depth=(45, 45), depth_units="m")[0]["depth_units"] == "m"
+
+
+def test_name_filter_is_literal(library):
+    for name in ("50%_deco", "50 deco", "50x_deco", "a\\b"):
+        library.add(make_plan("130"), name)
+    assert names(library.search(name="50%_deco")) == ["50%_deco"]
+    assert names(library.search(name="_deco")) == ["50%_deco", "50x_deco"]
+    assert names(library.search(name="a\\b")) == ["a\\b"]
+    assert len(library.search(name="deco")) == 3
+
+
+def test_same_source_is_updated_in_place(library):
+    first = library.add(make_plan("130"), "plan.json", source="/plans/plan.json")
+    other = library.add(make_plan("100"), "other.json", source="/plans/other.json")
+    again = library.add(make_plan("140"), "plan.json", source="/plans/plan.json")
+    assert again == first != other
+    assert library.count() == 2
+    assert library.load(first)[engine.GENERAL_INFO][0] == "140"
+    assert library.add(make_plan("90"), "unsaved") not in (first, other)
+    assert library.count() == 3
+
+
+def test_stored_as_versioned_document(library, tmp_path):
+    plan_id = library.add(make_plan("130"), "a")
+    data = json.loads(library.db.execute("SELECT data FROM plans").fetchone()["data"])
+    assert data["version"] == plan_schema.SCHEMA_VERSION
+    assert library.load(plan_id) == engine.normalize_plan(make_plan("130"))
+    library.delete(plan_id)
+    with pytest.raises(KeyError):
+        library.load(plan_id)
+
+
+def test_import_files(library, tmp_path):
+    good = tmp_path / "good.json"
+    plan_schema.write_plan(good, make_plan("130"))
+    bad = tmp_path / "bad.json"
+    bad.write_text("[]")
+    errors = library.import_files([str(good), str(bad)])
+    assert list(errors) == [str(bad)]
+    assert names(library.search()) == ["good.json"]
+    library.import_files([str(good)])
+    assert library.count() == 1
+
+
+def test_parse_range():
+    assert parse_range("") is None
+    assert parse_range("130") == (130, 130)
+    assert parse_range("140-120") == (120, 140)
+    with pytest.raises(ValueError):
+        parse_range("deep")
+
+
+def test_old_library_gets_depth_units(tmp_path):
+    # A library from before Depth Units: no depth_units column, Max Depth indexed as typed
+    path = str(tmp_path / "plans.db")
+    library = PlanLibrary(path)
+    library.add(make_plan("45", units="m"), "metric")
+    library.add(make_plan("130"), "feet")
+    library.db.execute("UPDATE plans SET max_depth = 45 WHERE name = 'metric'")
+    library.db.execute("ALTER TABLE plans DROP COLUMN depth_units")
+    library.db.commit()
+    library.close()
+    library = PlanLibrary(path)
+    try:
+        rows = {row["name"]: row for row in library.search()}
+        assert rows["metric"]["depth_units"] == "m"
+        assert rows["metric"]["max_depth"] == pytest.approx(45 / 0.3048)
+        assert (rows["feet"]["depth_units"], rows["feet"]["max_depth"]) == ("ft", 130)
+        assert names(library.search(max_depth=(40, 50), depth_units="m")) == ["metric"]
+    finally:
+        library.close()
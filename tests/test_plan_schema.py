@@ -0,0 +1,99 @@
+"""Plan files: every older version migrates to the current one without losing a field."""
+import json
+
+import pytest
+
+import gas_engine as engine
+import plan_schema
+from gas_engine import GAS, CNS, OTU
+
+
+def filled_plan():
+    plan = engine.empty_plan(8, 2)
+    plan[engine.GENERAL_INFO][:4] = ["130", "21/35 + EAN50 + O2", "20", "30/80"]
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.BOTTOM_GAS][0][:4] = ["130", "", ".7", "20"]
+    plan[engine.BOTTOM_GAS][1][:4] = ["100", "", ".7", "5"]
+    for row, (depth, minutes) in zip(plan[engine.DECO_STOPS], [(70, 1), (60, 1), (50, 2), (40, 2), (30, 4), (20, 12)]):
+        row[:] = [str(depth), str(minutes)]
+    for row, stop in zip(plan[engine.DECO_GAS], plan[engine.DECO_STOPS]):
+        row[engine.DEPTH] = stop[0]
+    return engine.recompute_plan(plan)
+
+
+def positional_v1(plan):
+    # The original file layout: no version, no Environment, 5-column gas rows
+    data = {section: values for section, values in plan.items() if section != engine.ENVIRONMENT}
+    data[engine.GENERAL_INFO] = plan[engine.GENERAL_INFO][:6]
+    for section in (engine.BOTTOM_GAS, engine.DECO_GAS):
+        data[section] = [row[:5] for row in plan[section]]
+    return data
+
+
+def test_current_round_trip():
+    plan = filled_plan()
+    plan[engine.ENVIRONMENT] = ["Fresh", "500", "ft"]
+    doc = plan_schema.to_document(plan)
+    assert doc["version"] == plan_schema.SCHEMA_VERSION == 4
+    assert plan_schema.from_document(json.loads(json.dumps(doc))) == plan
+
+
+def test_v1_positional_migrates():
+    plan = filled_plan()
+    loaded = plan_schema.from_document(json.loads(json.dumps(positional_v1(plan))))
+    assert engine.recompute_plan(loaded) == plan
+    assert loaded[engine.ENVIRONMENT] == ["", "", ""]
+    assert loaded[engine.DECO_GAS][-1][GAS] == plan[engine.DECO_GAS][-1][GAS]
+    # ... and saves as the current version
+    assert plan_schema.from_document(plan_schema.to_document(loaded)) == loaded
+
+
+def test_v2_deco_total_moves_to_deco_totals():
+    plan = filled_plan()
+    doc = plan_schema.to_document(plan)
+    v2 = {key: value for key, value in doc.items() if key not in ("environment", "deco_totals")}
+    v2["version"] = 2
+    v2["deco_gas_total"] = plan[engine.DECO_GAS][-1][GAS]
+    for key in ("bottom_gas", "deco_gas"):
+        v2[key] = [{name: row[name] for name in plan_schema.EMERGENCY_COLUMNS} for row in v2[key]]
+    for name in ("cns_total", "otu_total", "o2_warnings"):
+        del v2["general_info"][name]
+    loaded = plan_schema.from_document(v2)
+    assert loaded[engine.DECO_GAS][-1][GAS] == plan[engine.DECO_GAS][-1][GAS]
+    assert loaded[engine.DECO_GAS][-1][CNS] == loaded[engine.DECO_GAS][-1][OTU] == ""
+    assert engine.recompute_plan(loaded) == plan
+
+
+def test_v3_has_no_environment():
+    plan = filled_plan()
+    v3 = dict(plan_schema.to_document(plan), version=3)
+    del v3["environment"]
+    assert plan_schema.from_document(v3) == plan
+
+
+def test_missing_fields_keep_defaults():
+    plan = plan_schema.loads('{"format": "tec-gas-plan", "version": 4, "general_info": {"max_depth": 130}}')
+    assert plan[engine.GENERAL_INFO][0] == "130"
+    assert plan[engine.DECO_GAS] == engine.empty_plan()[engine.DECO_GAS]
+
+
+def test_newer_version_is_rejected():
+    with pytest.raises(plan_schema.PlanFormatError, match="newer version"):
+        plan_schema.from_document({"format": "tec-gas-plan", "version": plan_schema.SCHEMA_VERSION + 1})
+
+
+def test_every_problem_is_reported():
+    doc = {"format": "tec-gas-plan", "version": 4,
+           "general_info": {"max_depth": [130], "depht": "1"},
+           "bottom_gas": [{"depht": "130"}, "row"],
+           "extra": {}}
+    with pytest.raises(plan_schema.PlanFormatError) as info:
+        plan_schema.from_document(doc)
+    assert len(info.value.errors) == 5
+
+
+def test_v1_rows_longer_than_the_table_are_errors():
+    data = positional_v1(filled_plan())
+    data[engine.EMERGENCY][0] = data[engine.EMERGENCY][0] + ["x", "y", "z"]
+    with pytest.raises(plan_schema.PlanFormatError, match="columns"):
+        plan_schema.from_document(data)
@@ -0,0 +1,153 @@
+"""plan_service: the response cache and the error statuses, without a socket."""
+import asyncio
+import json
+
+import pytest
+
+import gas_engine as engine
+import plan_schema
+import plan_service
+from plan_service import HTTPError, LRUCache, PlanService
+
+
+def example_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][0] = "130"
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["130", "", ".6", "20"]
+    return plan
+
+
+def body(plan):
+    return json.dumps(plan_schema.to_document(plan)).encode()
+
+
+def run(requests, workers=1, cache_size=plan_service.CACHE_SIZE):
+    # (method, path, body) requests handled in order by one service; returns the service and the results
+    async def go():
+        service = PlanService(workers, cache_size)
+        try:
+            return service, [await service.handle(*request) for request in requests]
+        finally:
+            service.close()
+    return asyncio.run(go())
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+
+def test_plan_key_ignores_derived_cells():
+    plan = example_plan()
+    stale = engine.recompute_plan(plan)
+    stale[engine.BOTTOM_GAS][0][engine.GAS] = "999"
+    stale[engine.RESERVE][1] = "1"
+    assert plan_service.plan_key(stale) == plan_service.plan_key(plan)
+    plan[engine.BOTTOM_GAS][0][engine.TIME] = "25"
+    assert plan_service.plan_key(stale) != plan_service.plan_key(plan)
+
+
+def test_compute_returns_recomputed_plan():
+    _, [(status, content_type, payload)] = run([("POST", "/compute", body(example_plan()))])
+    assert (status, content_type) == (200, plan_service.JSON_TYPE)
+    plan = plan_schema.from_document(json.loads(payload)["plan"])
+    assert plan == engine.recompute_plan(example_plan())
+    assert plan[engine.BOTTOM_GAS][0][engine.ATA] == "4.94"
+
+
+def test_compute_cache_hits_on_same_inputs():
+    plan = example_plan()
+    stale = engine.recompute_plan(plan)
+    stale[engine.BOTTOM_GAS][0][engine.GAS] = "999"
+    changed = example_plan()
+    changed[engine.BOTTOM_GAS][0][engine.TIME] = "25"
+    service, results = run([("POST", "/compute", body(plan)),
+                            ("POST", "/compute", body(stale)),
+                            ("POST", "/compute", body(changed))])
+    assert results[0] == results[1] != results[2]
+    assert service.cache.stats()["hits"] == 1
+    assert service.cache.stats()["misses"] == 2
+    assert service.cache.stats()["size"] == 2
+
+
+def test_concurrent_requests_share_one_computation(monkeypatch):
+    calls = []
+    compute = plan_service.compute_response
+    monkeypatch.setattr(plan_service, "compute_response", lambda plan: calls.append(1) or compute(plan))
+
+    async def go():
+        service = PlanService(1)
+        try:
+            request = ("POST", "/compute", body(example_plan()))
+            return await asyncio.gather(*(service.handle(*request) for _ in range(5)))
+        finally:
+            service.close()
+    results = asyncio.run(go())
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_deco_schedule_cached_by_inputs():
+    plan = example_plan()
+    plan[engine.GENERAL_INFO][1:4] = ["21/35 + EAN50", "25", "30/80"]
+    changed = engine.recompute_plan(plan)
+    changed[engine.BOTTOM_GAS][0][engine.SAC] = ".7"
+    service, results = run([("POST", "/deco", body(plan)), ("POST", "/deco", body(changed))])
+    first, second = (json.loads(payload) for _, _, payload in results)
+    assert first["schedule"] == second["schedule"]
+    assert first["schedule"]["stops"]
+    assert first["plan"] != second["plan"]
+    # The second request misses the deco response cache but hits the schedule cache
+    assert service.cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("payload", [b"{not json", b"null", b"[1, 2]", b'{"version": 99}'])
+def test_bad_plan_is_400(payload):
+    with pytest.raises(HTTPError) as info:
+        run([("POST", "/compute", payload)])
+    assert info.value.status == 400
+
+
+def test_deco_without_inputs_is_400():
+    service = None
+    with pytest.raises(HTTPError) as info:
+        service, _ = run([("POST", "/deco", body(engine.empty_plan()))])
+    assert info.value.status == 400
+    assert service is None
+
+
+def test_errors_are_not_cached():
+    async def go():
+        service = PlanService(1)
+        try:
+            for _ in range(2):
+                with pytest.raises(HTTPError):
+                    await service.handle("POST", "/deco", body(engine.empty_plan()))
+            return service.cache.stats()
+        finally:
+            service.close()
+    assert asyncio.run(go())["size"] == 0
+
+
+@pytest.mark.parametrize("method, path, status", [("GET", "/nowhere", 404), ("GET", "/compute", 405),
+                                                  ("POST", "/health", 405)])
+def test_routing_errors(method, path, status):
+    with pytest.raises(HTTPError) as info:
+        run([(method, path, b"")])
+    assert info.value.status == status
+
+
+def test_health_reports_cache():
+    _, results = run([("POST", "/compute", body(example_plan())), ("GET", "/health", b"")])
+    status, _, payload = results[1]
+    health = json.loads(payload)
+    assert status == 200
+    assert health["status"] == "ok" and health["requests"] == 2
+    assert health["cache"]["size"] == 1
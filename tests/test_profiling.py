@@ -0,0 +1,58 @@
+"""Profiler: pass-through while disabled, histograms and report while enabled."""
+import json
+
+import pytest
+
+from profiling import COUNT_BUCKETS, LATENCY_BUCKETS, Histogram, Profiler
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    fn = profiler.wrap("fn", lambda x: x + 1)
+    assert fn(1) == 2 and fn.__wrapped__(1) == 2
+    profiler.count("cell changes per keystroke", 3)
+    with profiler.phase("phase"):
+        pass
+    assert profiler.to_dict() == {"timings": {}, "counts": {}}
+
+
+def test_enabled_profiler_times_calls_phases_and_errors():
+    profiler = Profiler(enabled=True)
+
+    def fail():
+        raise KeyError("x")
+    wrapped = profiler.wrap("fail", fail)
+    with pytest.raises(KeyError):
+        wrapped()
+    with profiler.phase("load"):
+        pass
+    profiler.count("cell changes per keystroke", 2)
+    profiler.count("cell changes per keystroke", 7)
+    data = profiler.to_dict()
+    assert data["timings"]["fail"]["count"] == 1
+    assert data["timings"]["load"]["count"] == 1
+    counts = data["counts"]["cell changes per keystroke"]
+    assert (counts["count"], counts["mean"], counts["max"]) == (2, 4.5, 7)
+    assert counts["buckets"]["<=2"] == 1 and counts["buckets"]["<=8"] == 1
+    report = profiler.report()
+    assert "fail" in report and "cell changes per keystroke" in report
+    profiler.reset()
+    assert profiler.to_dict() == {"timings": {}, "counts": {}}
+
+
+def test_histogram_percentiles():
+    h = Histogram(COUNT_BUCKETS)
+    for value in [1] * 90 + [5] * 9 + [100]:
+        h.add(value)
+    assert h.percentile(50) == 1
+    assert h.percentile(95) == 6      # bucket upper bound
+    assert h.percentile(100) == 100   # overflow bucket reports the max
+    assert Histogram(LATENCY_BUCKETS).percentile(50) == 0.0
+
+
+def test_dump(tmp_path):
+    profiler = Profiler(enabled=True)
+    profiler.record("flush", 0.002)
+    path = tmp_path / "profile.json"
+    profiler.dump(path)
+    assert json.loads(path.read_text())["timings"]["flush"]["buckets"]["<=0.0025"] == 1
@@ -0,0 +1,64 @@
+"""Real-gas Z tables: plausible Z values, inverse lookups and the memory/disk cache."""
+import math
+
+import numpy as np
+import pytest
+
+import real_gas
+from real_gas import ZTable
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    real_gas._tables.clear()
+    yield
+    real_gas._tables.clear()
+
+
+def test_z_values_near_3000_psi():
+    # Helium is well above ideal, oxygen below, air and nitrogen close to it (20 C, ~207 bar)
+    z = {name: ZTable.build(*gas).z_at(3000)
+         for name, gas in {"He": (0, 1), "O2": (1, 0), "N2": (0, 0), "Air": (0.21, 0)}.items()}
+    assert z["He"] == pytest.approx(1.10, abs=0.02)
+    assert z["O2"] == pytest.approx(0.93, abs=0.02)
+    assert z["N2"] == pytest.approx(1.035, abs=0.02)
+    assert z["Air"] == pytest.approx(1.02, abs=0.025)
+    assert ZTable.build(0.21, 0).z_at(0) == pytest.approx(1, abs=0.002)
+    # Trimix sits between its components
+    assert z["Air"] < ZTable.build(0.18, 0.45).z_at(3000) < z["He"]
+
+
+def test_real_and_ideal_psi_are_inverse():
+    table = ZTable.build(0.18, 0.45)
+    psi = np.array([0, 500, 3000, 3442, 5990])
+    assert table.ideal_psi(table.real_psi(psi)) == pytest.approx(psi, abs=1e-6)
+    assert table.real_psi(0) == 0
+    # Helium-rich gas needs more pressure for the same amount of gas
+    assert table.real_psi(3000) > 3000
+    assert math.isnan(table.real_psi(float("nan")))
+    beyond = table.real_psi(7000)
+    assert beyond > table.real_psi(6000)
+
+
+def test_tables_are_cached_in_memory_and_on_disk(tmp_path, monkeypatch):
+    first = real_gas.get_table((0.21, 0.35), cache_dir=str(tmp_path))
+    assert real_gas.get_table((0.21, 0.35), cache_dir=str(tmp_path)) is first
+    files = list(tmp_path.glob("*.npz"))
+    assert len(files) == 1
+    real_gas._tables.clear()
+
+    def no_build(*args):
+        raise AssertionError("table should come from the disk cache")
+    monkeypatch.setattr(ZTable, "build", no_build)
+    loaded = real_gas.get_table((0.21, 0.35), cache_dir=str(tmp_path))
+    assert np.array_equal(loaded.z, first.z)
+
+
+def test_unreadable_cache_file_is_rebuilt(tmp_path):
+    table = real_gas.get_table((0.32, 0), cache_dir=str(tmp_path))
+    path, = tmp_path.glob("*.npz")
+    path.write_bytes(b"not an npz file")
+    real_gas._tables.clear()
+    assert np.array_equal(real_gas.get_table((0.32, 0), cache_dir=str(tmp_path)).z, table.z)
+    with np.load(path) as data:
+        assert np.array_equal(data["z"], table.z)
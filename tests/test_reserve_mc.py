@@ -0,0 +1,78 @@
+"""Monte Carlo reserve: seeded runs reproduce, histograms merge and percentiles track the samples."""
+import numpy as np
+import pytest
+
+import gas_engine as engine
+import reserve_mc
+from reserve_mc import Distribution, Histograms, ReserveModel
+
+
+def model(**kwargs):
+    return ReserveModel((4.94, 4.03), (1.2, 1.2), (4, 3), **kwargs)
+
+
+def test_seeded_runs_reproduce_regardless_of_workers():
+    one = reserve_mc.run(model(), samples=50000, chunk_size=4096, seed=7)
+    again = reserve_mc.run(model(), samples=50000, chunk_size=4096, seed=7)
+    pooled = reserve_mc.run(model(), samples=50000, chunk_size=4096, seed=7, workers=2)
+    assert one.summary() == again.summary()
+    for name in reserve_mc.OUTPUTS:
+        assert np.array_equal(one.counts[name], pooled.counts[name])
+        assert one.sums[name] == pytest.approx(pooled.sums[name])
+    assert one.n == pooled.n == 50000
+    assert reserve_mc.run(model(), samples=50000, chunk_size=4096, seed=8).summary() != one.summary()
+
+
+def test_merge_equals_one_histogram():
+    rng = np.random.default_rng(1)
+    a, b = model().sample(rng, 1000), model().sample(rng, 500)
+    merged = Histograms()
+    merged.add(a)
+    other = Histograms()
+    other.add(b)
+    merged.merge(other)
+    both = Histograms()
+    both.add({name: np.concatenate([a[name], b[name]]) for name in reserve_mc.OUTPUTS})
+    assert merged.n == both.n == 1500
+    for name in reserve_mc.OUTPUTS:
+        assert np.array_equal(merged.counts[name], both.counts[name])
+        assert merged.mins[name] == both.mins[name] and merged.maxs[name] == both.maxs[name]
+        assert merged.sums[name] == pytest.approx(both.sums[name])
+
+
+def test_percentiles_match_the_samples():
+    samples = model().sample(np.random.default_rng(2), 200000)
+    hist = Histograms()
+    hist.add(samples)
+    summary = hist.summary()["total_per_diver"]
+    for q in reserve_mc.PERCENTILES:
+        assert summary[f"p{q}"] == pytest.approx(np.percentile(samples["total_per_diver"], q), rel=2e-3)
+    assert summary["mean"] == pytest.approx(samples["total_per_diver"].mean())
+
+
+def test_fixed_distributions_give_the_sheet_reserve():
+    fixed = model(sac_factor=Distribution("fixed", 1), ascent_delay=Distribution("fixed", 0),
+                  stop_overrun=Distribution("fixed", 0), cylinder_cuft=100, cylinder_psi=3000)
+    summary = reserve_mc.run(fixed, samples=10, seed=0).summary()
+    total = 4.94 * 1.2 * 4 + 4.03 * 1.2 * 3
+    assert summary["total_per_diver"]["min"] == summary["total_per_diver"]["max"] == pytest.approx(total)
+    assert summary["rock_bottom_psi"]["mean"] == pytest.approx(total * 2 * 30)
+
+
+def test_from_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][0], plan[engine.RESERVE][0] = "130", "70"
+    plan[engine.EMERGENCY][0][engine.SAC:engine.GAS] = ["1.2", "4"]
+    with pytest.raises(ValueError):
+        ReserveModel.from_plan(plan)
+    plan[engine.EMERGENCY][1][engine.SAC:engine.GAS] = ["1.2", "3"]
+    built = ReserveModel.from_plan(plan)
+    assert built.atas == (4.94, 4.03) and built.times == (4, 3)
+
+
+def test_distribution_parsing():
+    assert str(Distribution.parse("Normal 1 0.15")) == "normal 1 0.15"
+    for text in ("", "normal 1", "gamma 1 2", "uniform a b"):
+        with pytest.raises(ValueError):
+            Distribution.parse(text)
+    assert Distribution("normal", -5, 0.1).sample(np.random.default_rng(0), 10).min() == 0
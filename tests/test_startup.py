@@ -0,0 +1,25 @@
+"""Loading the GUI module must not pull in the modules it imports on first use."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("customtkinter")
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Tec_Gas_AutoCalc_V0.9.py")
+LAZY = ["reportlab", "pdf_export", "plan_library", "sqlite3", "plan_batch", "plan_service",
+        "reserve_mc", "deco_optimizer", "team", "dive_log", "real_gas", "autosave"]
+
+SCRIPT = f"""
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("gas_planning_app", {APP_FILE!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps(sorted(name for name in {LAZY!r} if name in sys.modules)))
+"""
+
+
+def test_module_import_leaves_heavy_modules_lazy():
+    # A fresh interpreter, since the test session may already have imported them
+    result = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,60 @@
+"""sweep_grid must agree with recomputing the plan at each grid point."""
+import numpy as np
+import pytest
+
+import gas_engine as engine
+import sweep
+
+
+def base_plan(water="", units=""):
+    plan = engine.empty_plan(bottom_rows=2)
+    plan[engine.GENERAL_INFO][:3] = ["130", "21/35 + EAN50", "20"]
+    plan[engine.ENVIRONMENT] = [water, "", units]
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.EMERGENCY][0][engine.SAC:engine.GAS] = ["1.2", "4"]
+    plan[engine.EMERGENCY][1][engine.SAC:engine.GAS] = ["1.2", "3"]
+    plan[engine.BOTTOM_GAS][1][:engine.GAS] = ["100", "", ".7", "5"]
+    return plan
+
+
+def point_values(plan, depth, time, sac):
+    plan = engine.normalize_plan(plan)
+    plan[engine.GENERAL_INFO][0], plan[engine.GENERAL_INFO][2] = f"{depth:g}", f"{time:g}"
+    plan[engine.BOTTOM_GAS][0][engine.DEPTH] = f"{depth:g}"
+    plan[engine.BOTTOM_GAS][0][engine.SAC] = f"{sac:g}"
+    plan[engine.BOTTOM_GAS][0][engine.TIME] = f"{time:g}"
+    plan = engine.recompute_plan(plan)
+    bottom = sum(engine.to_float(row[engine.GAS]) for row in plan[engine.BOTTOM_GAS])
+    emergency = engine.to_float(plan[engine.EMERGENCY][2][engine.GAS])
+    two_divers = engine.to_float(plan[engine.RESERVE][1])
+    return bottom, emergency, two_divers, bottom + two_divers
+
+
+@pytest.mark.parametrize("water, units", [("", ""), ("fresh", "m")])
+def test_grid_matches_per_point_evaluate(water, units):
+    plan = base_plan(water, units)
+    depths, times, sacs = sweep.axis(90, 150, 20), sweep.axis(10, 30, 10), sweep.axis(0.5, 0.7, 0.1)
+    result = sweep.sweep_grid(plan, depths, times, sacs)
+    assert result.bottom_gas.shape == (4, 3, 3)
+    for i, depth in enumerate(depths):
+        for j, time in enumerate(times):
+            for k, sac in enumerate(sacs):
+                expected = point_values(plan, depth, time, sac)
+                got = (result.bottom_gas[i, j, k], result.emergency[i, j, k],
+                       result.two_divers[i, j, k], result.total_back_gas[i, j, k])
+                assert got == pytest.approx(expected, abs=1e-9)
+
+
+def test_slice_rows():
+    result = sweep.sweep_grid(base_plan(), [100, 110], [20], [0.6])
+    assert result.slice_rows("emergency", 0) == [["Depth \\ Time", "20"], ["100", "32.2"], ["110", "34.2"]]
+
+
+def test_axis_and_limits():
+    assert sweep.axis(100, 120, 10).tolist() == [100, 110, 120]
+    with pytest.raises(ValueError):
+        sweep.axis(100, 120, 0)
+    with pytest.raises(ValueError):
+        sweep.axis(120, 100, 10)
+    with pytest.raises(ValueError):
+        sweep.sweep_grid(base_plan(), np.zeros(1000), np.zeros(1000), np.zeros(11))
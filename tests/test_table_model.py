@@ -0,0 +1,53 @@
+"""TableModel: growable row storage and string width for the virtualized tables."""
+from table_model import MIN_CAPACITY, TableModel
+
+
+def test_rows_round_trip():
+    rows = [["70", "1"], ["60", ""], ["50", "2"]]
+    model = TableModel(2, rows)
+    assert len(model) == 3 and model.rows() == rows
+    assert len(model.data) == MIN_CAPACITY
+
+
+def test_long_text_widens_storage():
+    model = TableModel(2, [["", ""]], width=4)
+    model.set(0, 1, "a long value")
+    assert model.get(0, 1) == "a long value"
+    model.set_column(0, ["x" * 30])
+    assert model.rows() == [["x" * 30, "a long value"]]
+
+
+def test_resize_grows_capacity_and_blanks_dropped_rows():
+    model = TableModel(2, [["1", "2"]])
+    model.resize(500)
+    assert len(model) == 500 and len(model.data) >= 500
+    assert model.rows()[0] == ["1", "2"] and model.rows()[-1] == ["", ""]
+    model.set(499, 0, "last")
+    model.resize(1)
+    model.resize(500)
+    # Rows dropped and added again come back blank
+    assert model.get(499, 0) == ""
+
+
+def test_set_rows_replaces_everything_and_truncates_columns():
+    model = TableModel(2, [["1", "2"]] * 10)
+    model.set_rows([["a", "b", "extra"], [3, 4]])
+    assert model.rows() == [["a", "b"], ["3", "4"]]
+
+
+def test_plans_grow_and_shrink_with_the_deco_total_last():
+    import gas_engine as engine
+    plan = engine.empty_plan()
+    plan[engine.DECO_GAS][-1][engine.GAS] = "99"
+    grown = engine.normalize_plan(plan, stops=20, bottom_rows=3)
+    assert len(grown[engine.DECO_STOPS]) == 20 and len(grown[engine.DECO_GAS]) == 21
+    assert len(grown[engine.BOTTOM_GAS]) == 3
+    assert grown[engine.DECO_GAS][-1][engine.TIME] == engine.DECO_TOTAL_LABEL
+    assert grown[engine.DECO_GAS][-1][engine.GAS] == "99"
+    assert grown[engine.DECO_GAS][19][engine.SAC] == engine.DEFAULT_DECO_SAC[-1]
+    assert engine.table_sizes(grown) == (3, 20)
+    shrunk = engine.normalize_plan(grown, stops=6, bottom_rows=1)
+    assert engine.table_sizes(shrunk) == (1, 6)
+    assert shrunk[engine.DECO_GAS][-1][engine.GAS] == "99"
+    long_plan = engine.recompute_plan(grown)
+    assert len(long_plan[engine.DECO_GAS]) == 21
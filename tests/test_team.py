@@ -0,0 +1,77 @@
+"""Team gas model: matches the sheet for identical divers and the hand calculation otherwise."""
+import math
+
+import numpy as np
+import pytest
+
+import gas_engine as engine
+import team
+from team import CATALOG, Team
+
+
+def sheet_plan():
+    plan = engine.empty_plan()
+    plan[engine.GENERAL_INFO][:2] = ["130", "21/35"]
+    plan[engine.RESERVE][0] = "70"
+    plan[engine.EMERGENCY][0][engine.SAC:engine.GAS] = ["1.2", "4"]
+    plan[engine.EMERGENCY][1][engine.SAC:engine.GAS] = ["1.2", "3"]
+    plan[engine.BOTTOM_GAS][0][:engine.GAS] = ["130", "", ".6", "20"]
+    return plan
+
+
+def test_identical_divers_match_the_sheet():
+    plan = sheet_plan()
+    sheet = engine.recompute_plan(plan)
+    roster = Team([["A", ".6", "1.2", "Double AL80", ""], ["B", ".6", "1.2", "2xAL80", ""]])
+    results = team.team_gas(roster, team.plan_factors(plan))
+    assert results["Bottom Gas (CUFT)"] == pytest.approx([float(sheet[engine.BOTTOM_GAS][0][engine.GAS])] * 2)
+    assert results["Reserve (CUFT)"] == pytest.approx([float(sheet[engine.RESERVE][1])] * 2, abs=0.1)
+
+
+def test_mixed_team_by_hand():
+    bottom_factor, emergency_factor = 98.8, 33.84
+    roster = Team([["A", ".5", "1", "AL80", "3000"], ["B", ".8", "1.5", "HP100", ""], ["C", "", "", "Bogus", ""]])
+    results = team.team_gas(roster, (bottom_factor, emergency_factor))
+    emergency = np.array([1, 1.5]) * emergency_factor
+    reserve = emergency + emergency[::-1]   # each one's own plus the other's
+    assert results["Bottom Gas (CUFT)"][:2] == pytest.approx(np.array([.5, .8]) * bottom_factor)
+    assert results["Reserve (CUFT)"][:2] == pytest.approx(reserve)
+    psi_per_cuft = np.array([3000 / 77.4, 3442 / 100])
+    assert results["Total (PSI)"][:2] == pytest.approx((np.array([.5, .8]) * bottom_factor + reserve) * psi_per_cuft)
+    usable = np.array([3000, 3442]) / psi_per_cuft - reserve
+    turn = np.array([3000, 3442]) - usable.min() / 3 * psi_per_cuft
+    assert results["Turn (PSI)"][:2] == pytest.approx(turn)
+    # The unknown cylinder and blank SACs give blanks, not errors
+    assert all(math.isnan(results[name][2]) for name in team.OUTPUTS)
+    assert team.format_outputs(results)[0] == [f"{v:.1f}" for v in results["Bottom Gas (CUFT)"][:2]] + [""]
+
+
+def test_catalog_lookup():
+    assert CATALOG["al80"].cuft == 77.4
+    assert CATALOG["2xlp85"] is CATALOG["Double LP85"]
+    assert CATALOG["Double LP85"].tanks == 2
+    assert CATALOG.lookup("nothing") == -1
+    with pytest.raises(KeyError):
+        CATALOG["nothing"]
+
+
+def test_roster_round_trip(tmp_path):
+    path = tmp_path / "team.csv"
+    roster = Team([["A", ".6", "1.2", "AL80", "3000"], ["B", "0.7", "", "HP100", ""]])
+    team.write_roster(path, roster)
+    assert team.read_roster(path).rows() == [["A", "0.6", "1.2", "AL80", "3000"], ["B", "0.7", "", "HP100", ""]]
+    path.write_text("Cylinder,Name\nAL40,C\n")
+    assert team.read_roster(path).rows() == [["C", "", "", "AL40", ""]]
+    roster.set(1, "Emergency SAC", "1.1")
+    assert roster.rows()[1][2] == "1.1"
+    with pytest.raises(KeyError):
+        roster.set(0, "Weight", "1")
+
+
+def test_fill_plan():
+    roster = Team([["A", ".6", "1.2", "Double AL80", ""]])
+    results = team.team_gas(roster, team.plan_factors(sheet_plan()))
+    plan = team.fill_plan(sheet_plan(), results)
+    cuft, psi = plan[engine.GENERAL_INFO][4].split("/")
+    assert float(cuft) == pytest.approx(results["Total (CUFT)"][0], abs=0.05)
+    assert plan[engine.RESERVE][2].count("/") == 1
@@ -0,0 +1,93 @@
+"""UpdateScheduler: one flush per idle cycle, last value wins, unchanged entries skipped."""
+from ui_scheduler import UpdateScheduler
+
+
+class Entry:
+    def __init__(self, text="", state="normal"):
+        self.text = text
+        self.state = state
+        self.writes = 0
+
+    def get(self):
+        return self.text
+
+    def cget(self, option):
+        return self.state
+
+    def configure(self, state):
+        self.state = state
+
+    def delete(self, first, last=None):
+        assert self.state == "normal"
+        self.text = ""
+
+    def insert(self, index, text):
+        assert self.state == "normal"
+        self.text = text
+        self.writes += 1
+
+
+class Root:
+    def __init__(self):
+        self.jobs = {}
+        self.delays = []
+
+    def after_idle(self, fn):
+        self.jobs[len(self.jobs) + 1] = fn
+        return len(self.jobs)
+
+    def after(self, ms, fn):
+        self.delays.append(ms)
+        return self.after_idle(fn)
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def idle(self):
+        jobs, self.jobs = self.jobs, {}
+        for fn in jobs.values():
+            fn()
+
+
+def test_writes_are_coalesced_until_idle():
+    root, entry = Root(), Entry()
+    updates = UpdateScheduler(root)
+    for text in ("1", "13", "130"):
+        updates.write(entry, text)
+    assert entry.text == "" and len(root.jobs) == 1
+    root.idle()
+    assert entry.text == "130" and entry.writes == 1
+    assert updates.stats() == {"requested": 3, "written": 1, "skipped": 0, "flushes": 1}
+
+
+def test_unchanged_entries_are_skipped():
+    root, same, other = Root(), Entry("4.94"), Entry("1")
+    updates = UpdateScheduler(root)
+    updates.write(same, "4.94")
+    updates.write(other, "2")
+    root.idle()
+    assert same.writes == 0 and other.text == "2"
+    assert updates.skipped == 1 and updates.written == 1
+
+
+def test_readonly_entries_are_unlocked_for_the_write():
+    root, entry = Root(), Entry("1", state="readonly")
+    updates = UpdateScheduler(root)
+    updates.write(entry, "2")
+    root.idle()
+    assert entry.text == "2" and entry.state == "readonly"
+
+
+def test_flush_and_cancel():
+    root, entry = Root(), Entry()
+    updates = UpdateScheduler(root, delay_ms=50)
+    updates.write(entry, "1")
+    assert root.delays == [50]
+    updates.flush()
+    assert entry.text == "1" and root.jobs == {}
+    updates.write(entry, "2")
+    updates.cancel()
+    root.idle()
+    assert entry.text == "1" and updates.pending == {}
+    updates.reset_stats()
+    assert updates.stats() == {"requested": 0, "written": 0, "skipped": 0, "flushes": 0}
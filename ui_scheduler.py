@@ -0,0 +1,73 @@
+"""Coalesced widget writes for the planning sheet.
+
+Handlers queue entry text through ``UpdateScheduler.write`` instead of calling
+``delete``/``insert`` directly.  Pending writes are flushed once per Tk idle
+cycle, the last value queued for an entry wins, and entries that already show
+that text are left alone, so a pasted value or a held key costs one redraw per
+cell instead of one per keystroke.
+"""
+
+
+class UpdateScheduler:
+    def __init__(self, root, delay_ms=0):
+        self.root = root
+        self.delay_ms = delay_ms
+        self.pending = {}
+        self._job = None
+        # Counters for measuring redraws (see stats())
+        self.requested = 0
+        self.written = 0
+        self.skipped = 0
+        self.flushes = 0
+
+    def write(self, entry, text):
+        self.requested += 1
+        self.pending[entry] = text
+        if self._job is None:
+            if self.delay_ms:
+                self._job = self.root.after(self.delay_ms, self.flush)
+            else:
+                self._job = self.root.after_idle(self.flush)
+
+    def cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self.pending.clear()
+
+    def flush(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        self.flushes += 1
+        for entry, text in pending.items():
+            if entry.get() == text:
+                self.skipped += 1
+                continue
+            write_entry(entry, text)
+            self.written += 1
+
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "written": self.written,
+            "skipped": self.skipped,
+            "flushes": self.flushes,
+        }
+
+    def reset_stats(self):
+        self.requested = self.written = self.skipped = self.flushes = 0
+
+
+def write_entry(entry, text):
+    # Read-only entries have to be unlocked for the write
+    readonly = entry.cget("state") == "readonly"
+    if readonly:
+        entry.configure(state="normal")
+    entry.delete(0, "end")
+    entry.insert(0, text)
+    if readonly:
+        entry.configure(state="readonly")